@@ -1,59 +1,188 @@
-from flask import Flask, request, jsonify
+import base64
+import binascii
+import contextlib
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from flask import Flask, request, jsonify, stream_with_context
 from flask_cors import CORS
-import mysql.connector
+from banco import estatisticas_pool, get_connection
+from busca_transcricoes import LIMITE_PADRAO, busca_disponivel, buscar_transcricoes
+from cache import CacheLRU
+from rollups import intervalo_em_dias, rollups_disponiveis, versao_carteira
+from transcricoes_compactadas import descompactar_transcricao
 from datetime import datetime
 from collections import defaultdict
 
 app = Flask(__name__)
 CORS(app)
 
-DB_CONFIG = {
-    'host': '10.100.10.57',
-    'port': 3306,
-    'user': 'user_automacao',
-    'password': 'G5T82ZWMr',
-    'database': 'vonix',
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci',
-}
-
 def get_db():
-    return mysql.connector.connect(**DB_CONFIG)
+    return get_connection()
+
+@contextlib.contextmanager
+def cursor_db(**opcoes):
+    """
+    Cursor numa conexão emprestada do pool. Cursor e conexão são fechados
+    mesmo quando a consulta falha: uma conexão do pool que não é fechada
+    nunca volta para ele.
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor(**opcoes)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+# Cache das respostas da API, por endpoint (caminho, que inclui o agent_id) e
+# inicio/fim/carteira/ids. Além do TTL, as respostas de uma carteira são
+# descartadas quando a versão dela em dashboard_versoes muda, ou seja, quando
+# o pipeline grava avaliações novas (mesmo em outro processo). A versão é
+# consultada no banco no máximo a cada INTERVALO_VERSAO_CACHE segundos.
+CACHE_RESPOSTAS = CacheLRU(
+    int(os.getenv('DASHBOARD_CACHE_TAMANHO', '512')),
+    ttl=float(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+)
+INTERVALO_VERSAO_CACHE = float(os.getenv('DASHBOARD_CACHE_INTERVALO_VERSAO', '2'))
+_VERSOES_CARTEIRA = {}
+_LOCK_VERSOES = threading.Lock()
+_ESTATISTICAS_CACHE = {'invalidacoes': 0}
+
+def invalidar_cache_dashboard(carteira=None):
+    """Descarta as respostas em cache da carteira (ou de todas)."""
+    if carteira is None:
+        CACHE_RESPOSTAS.invalidar()
+    else:
+        CACHE_RESPOSTAS.invalidar(filtro=lambda chave: chave[3] == carteira)
+    with _LOCK_VERSOES:
+        _ESTATISTICAS_CACHE['invalidacoes'] += 1
+
+def _verificar_versao_carteira(carteira):
+    agora = time.monotonic()
+    with _LOCK_VERSOES:
+        conhecida = carteira in _VERSOES_CARTEIRA
+        versao, verificado_em = _VERSOES_CARTEIRA.get(carteira, (None, 0.0))
+        if agora - verificado_em < INTERVALO_VERSAO_CACHE:
+            return
+        # Marca antes de consultar, para que requisições simultâneas não repitam a consulta
+        _VERSOES_CARTEIRA[carteira] = (versao, agora)
+    with cursor_db() as cursor:
+        nova = versao_carteira(cursor, carteira)
+    with _LOCK_VERSOES:
+        _VERSOES_CARTEIRA[carteira] = (nova, agora)
+    if conhecida and nova != versao:
+        invalidar_cache_dashboard(carteira)
+
+def cache_resposta(funcao):
+    """Guarda o corpo JSON das respostas 200 do endpoint em CACHE_RESPOSTAS."""
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        carteira = request.args.get('carteira', 'AGUAS')
+        _verificar_versao_carteira(carteira)
+        chave = (request.path, request.args.get('inicio'), request.args.get('fim'), carteira,
+                 request.args.get('ids'))
+        corpo = CACHE_RESPOSTAS.buscar(chave, None)
+        if corpo is not None:
+            resposta = app.response_class(corpo, mimetype='application/json')
+            resposta.headers['X-Cache'] = 'HIT'
+            return resposta
+        resposta = funcao(*args, **kwargs)
+        if resposta.status_code == 200:
+            CACHE_RESPOSTAS.guardar(chave, resposta.get_data())
+        resposta.headers['X-Cache'] = 'MISS'
+        return resposta
+    return envoltorio
+
+# Paginação do histórico, em avaliações por página
+LIMITE_PADRAO_HISTORICO = 100
+LIMITE_MAXIMO_HISTORICO = 1000
+# Linhas lidas do banco por vez no histórico em NDJSON
+TAMANHO_BLOCO_HISTORICO = 500
+
+# Respostas de /api/transcricao menores que isto (bytes) não são comprimidas
+TAMANHO_MINIMO_GZIP = 1024
+
+# Com DASHBOARD_CONSULTA_UNICA=0, /api/agente/<id>/detalhes volta a fazer uma
+# consulta por bloco da resposta (comparação em benchmarks.py detalhes)
+CONSULTA_UNICA_DETALHES = os.getenv('DASHBOARD_CONSULTA_UNICA', '1') != '0'
+
+def _usar_rollups(cursor, inicio, fim):
+    """
+    Retorna (dia_inicio, dia_fim) quando o intervalo pode ser respondido pelos
+    agregados diários (rollups.py); None para consultar as tabelas brutas.
+    """
+    dias = intervalo_em_dias(inicio, fim)
+    if dias and rollups_disponiveis(cursor):
+        return dias
+    return None
 
 @app.route('/api/dashboard')
+@cache_resposta
 def dashboard():
     inicio = request.args.get('inicio')
     fim = request.args.get('fim')
     carteira = request.args.get('carteira', 'AGUAS')
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    # Pontuação média e quantidade de ligações
-    cursor.execute(f"""
-        SELECT AVG(pontuacao) as media, COUNT(*) as qtd
-        FROM avaliacoes
-        WHERE data_ligacao >= %s AND data_ligacao < %s AND carteira = %s
-    """, (inicio, fim, carteira))
-    dash = cursor.fetchone()
-    # Item com maior não conformidade
-    cursor.execute(f"""
-        SELECT categoria, COUNT(*) as nc
-        FROM itens_avaliados ia
-        JOIN avaliacoes av ON av.id = ia.avaliacao_id
-        WHERE ia.resultado = 'NAO CONFORME' AND av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
-        GROUP BY categoria
-        ORDER BY nc DESC LIMIT 1
-    """, (inicio, fim, carteira))
-    item_nc = cursor.fetchone()
-    # Evolução da nota média
-    cursor.execute(f"""
-        SELECT DATE(data_ligacao) as dia, AVG(pontuacao) as media
-        FROM avaliacoes
-        WHERE data_ligacao >= %s AND data_ligacao < %s AND carteira = %s
-        GROUP BY dia ORDER BY dia
-    """, (inicio, fim, carteira))
-    evolucao = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with cursor_db(dictionary=True) as cursor:
+        dias = _usar_rollups(cursor, inicio, fim)
+        if dias:
+            # Pontuação média e quantidade de ligações
+            cursor.execute("""
+                SELECT SUM(soma_pontuacao) / SUM(qtd) as media, COALESCE(SUM(qtd), 0) as qtd
+                FROM rollup_avaliacoes_dia
+                WHERE dia >= %s AND dia < %s AND carteira = %s
+            """, (dias[0], dias[1], carteira))
+            dash = cursor.fetchone()
+            # Item com maior não conformidade
+            cursor.execute("""
+                SELECT categoria, SUM(nao_conforme) as nc
+                FROM rollup_itens_dia
+                WHERE dia >= %s AND dia < %s AND carteira = %s
+                GROUP BY categoria
+                HAVING nc > 0
+                ORDER BY nc DESC LIMIT 1
+            """, (dias[0], dias[1], carteira))
+            item_nc = cursor.fetchone()
+            # Evolução da nota média
+            cursor.execute("""
+                SELECT dia, SUM(soma_pontuacao) / SUM(qtd) as media
+                FROM rollup_avaliacoes_dia
+                WHERE dia >= %s AND dia < %s AND carteira = %s
+                GROUP BY dia ORDER BY dia
+            """, (dias[0], dias[1], carteira))
+            evolucao = cursor.fetchall()
+        else:
+            # Pontuação média e quantidade de ligações
+            cursor.execute(f"""
+                SELECT AVG(pontuacao) as media, COUNT(*) as qtd
+                FROM avaliacoes
+                WHERE data_ligacao >= %s AND data_ligacao < %s AND carteira = %s
+            """, (inicio, fim, carteira))
+            dash = cursor.fetchone()
+            # Item com maior não conformidade
+            cursor.execute(f"""
+                SELECT categoria, COUNT(*) as nc
+                FROM itens_avaliados ia
+                JOIN avaliacoes av ON av.id = ia.avaliacao_id
+                WHERE ia.resultado = 'NAO CONFORME' AND av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
+                GROUP BY categoria
+                ORDER BY nc DESC LIMIT 1
+            """, (inicio, fim, carteira))
+            item_nc = cursor.fetchone()
+            # Evolução da nota média
+            cursor.execute(f"""
+                SELECT DATE(data_ligacao) as dia, AVG(pontuacao) as media
+                FROM avaliacoes
+                WHERE data_ligacao >= %s AND data_ligacao < %s AND carteira = %s
+                GROUP BY dia ORDER BY dia
+            """, (inicio, fim, carteira))
+            evolucao = cursor.fetchall()
     return jsonify({
         'media': dash['media'],
         'qtd': dash['qtd'],
@@ -62,32 +191,77 @@ def dashboard():
     })
 
 @app.route('/api/agentes')
+@cache_resposta
 def agentes():
     inicio = request.args.get('inicio')
     fim = request.args.get('fim')
     carteira = request.args.get('carteira', 'AGUAS')
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(f"""
-        SELECT av.agent_id, ag.name, AVG(av.pontuacao) as media, COUNT(*) as qtd
-        FROM avaliacoes av
-        JOIN agents ag ON av.agent_id = ag.id
-        WHERE av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
-        GROUP BY av.agent_id, ag.name
-        ORDER BY media DESC
-    """, (inicio, fim, carteira))
-    agentes = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with cursor_db(dictionary=True) as cursor:
+        dias = _usar_rollups(cursor, inicio, fim)
+        if dias:
+            cursor.execute("""
+                SELECT r.agent_id, ag.name, SUM(r.soma_pontuacao) / SUM(r.qtd) as media, SUM(r.qtd) as qtd
+                FROM rollup_avaliacoes_dia r
+                JOIN agents ag ON r.agent_id = ag.id
+                WHERE r.dia >= %s AND r.dia < %s AND r.carteira = %s
+                GROUP BY r.agent_id, ag.name
+                ORDER BY media DESC
+            """, (dias[0], dias[1], carteira))
+        else:
+            cursor.execute(f"""
+                SELECT av.agent_id, ag.name, AVG(av.pontuacao) as media, COUNT(*) as qtd
+                FROM avaliacoes av
+                JOIN agents ag ON av.agent_id = ag.id
+                WHERE av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
+                GROUP BY av.agent_id, ag.name
+                ORDER BY media DESC
+            """, (inicio, fim, carteira))
+        agentes = cursor.fetchall()
     return jsonify(agentes)
 
-@app.route('/api/agente/<int:agent_id>/detalhes')
-def detalhes_agente(agent_id):
-    inicio = request.args.get('inicio')
-    fim = request.args.get('fim')
-    carteira = request.args.get('carteira', 'AGUAS')
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
+def _detalhes_consultas_separadas(cursor, agent_id, inicio, fim, carteira, dias):
+    """Detalhes do agente com uma consulta para cada parte da resposta."""
+    if dias:
+        parametros = (agent_id, dias[0], dias[1], carteira)
+        # Dados gerais
+        cursor.execute("""
+            SELECT ag.name, SUM(r.soma_pontuacao) / SUM(r.qtd) as media, COALESCE(SUM(r.qtd), 0) as qtd
+            FROM rollup_avaliacoes_dia r
+            JOIN agents ag ON r.agent_id = ag.id
+            WHERE r.agent_id = %s AND r.dia >= %s AND r.dia < %s AND r.carteira = %s
+        """, parametros)
+        dados = cursor.fetchone()
+        # Radar dos itens
+        cursor.execute("""
+            SELECT categoria, SUM(conforme) / SUM(total) as taxa_conforme
+            FROM rollup_itens_dia
+            WHERE agent_id = %s AND dia >= %s AND dia < %s AND carteira = %s
+            GROUP BY categoria
+        """, parametros)
+        radar = cursor.fetchall()
+        # Evolução da nota média
+        cursor.execute("""
+            SELECT dia, SUM(soma_pontuacao) / SUM(qtd) as media
+            FROM rollup_avaliacoes_dia
+            WHERE agent_id = %s AND dia >= %s AND dia < %s AND carteira = %s
+            GROUP BY dia ORDER BY dia
+        """, parametros)
+        evolucao = cursor.fetchall()
+        # Evolução dos itens
+        cursor.execute("""
+            SELECT categoria, dia, SUM(conforme) as conforme, SUM(nao_conforme) as nao_conforme
+            FROM rollup_itens_dia
+            WHERE agent_id = %s AND dia >= %s AND dia < %s AND carteira = %s
+            GROUP BY categoria, dia
+            ORDER BY categoria, dia
+        """, parametros)
+        evolucao_itens = cursor.fetchall()
+        return {
+            'dados': dados,
+            'radar': radar,
+            'evolucao': evolucao,
+            'evolucao_itens': evolucao_itens
+        }
     # Dados gerais
     cursor.execute(f"""
         SELECT ag.name, AVG(av.pontuacao) as media, COUNT(*) as qtd
@@ -125,43 +299,322 @@ def detalhes_agente(agent_id):
         ORDER BY categoria, dia
     """, (agent_id, inicio, fim, carteira))
     evolucao_itens = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify({
+    return {
         'dados': dados,
         'radar': radar,
         'evolucao': evolucao,
         'evolucao_itens': evolucao_itens
-    })
+    }
+
+def _detalhes_agentes(cursor, agent_ids, inicio, fim, carteira, dias):
+    """
+    Detalhes de vários agentes numa única ida ao banco: uma consulta traz as
+    somas por agente e dia das avaliações (tipo 'A') e as somas por agente,
+    dia e categoria dos itens (tipo 'I'), e os quatro blocos da resposta de
+    cada agente são montados a partir delas.
+
+    Retorna {agent_id: detalhes}. Com `agent_ids` None, inclui todos os
+    agentes avaliados na carteira no período; caso contrário, todos os ids
+    pedidos (vazios quando não há avaliações). Avaliações gravadas sem agente
+    ficam de fora, como em /api/agentes.
+    """
+    if agent_ids is not None and not agent_ids:
+        return {}
+    filtro_agentes = ""
+    if agent_ids is not None:
+        filtro_agentes = f" AND {{}}agent_id IN ({', '.join(['%s'] * len(agent_ids))})"
+    if dias:
+        parametros = (dias[0], dias[1], carteira) + tuple(agent_ids or ())
+        cursor.execute(f"""
+            SELECT 'A' as tipo, r.agent_id, r.dia, NULL as categoria, MAX(ag.name) as name,
+                SUM(r.qtd) as qtd, SUM(r.soma_pontuacao) as soma, NULL as conforme, NULL as nao_conforme
+            FROM rollup_avaliacoes_dia r
+            JOIN agents ag ON r.agent_id = ag.id
+            WHERE r.dia >= %s AND r.dia < %s AND r.carteira = %s{filtro_agentes.format('r.')}
+            GROUP BY r.agent_id, r.dia
+            UNION ALL
+            SELECT 'I', agent_id, dia, categoria, NULL, SUM(total), NULL, SUM(conforme), SUM(nao_conforme)
+            FROM rollup_itens_dia
+            WHERE dia >= %s AND dia < %s AND carteira = %s{filtro_agentes.format('')}
+            GROUP BY agent_id, dia, categoria
+        """, parametros * 2)
+    else:
+        parametros = (inicio, fim, carteira) + tuple(agent_ids or ())
+        cursor.execute(f"""
+            SELECT 'A' as tipo, av.agent_id, DATE(av.data_ligacao) as dia, NULL as categoria, MAX(ag.name) as name,
+                COUNT(*) as qtd, SUM(av.pontuacao) as soma, NULL as conforme, NULL as nao_conforme
+            FROM avaliacoes av
+            JOIN agents ag ON av.agent_id = ag.id
+            WHERE av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
+                AND av.agent_id IS NOT NULL{filtro_agentes.format('av.')}
+            GROUP BY av.agent_id, dia
+            UNION ALL
+            SELECT 'I', av.agent_id, DATE(av.data_ligacao) as dia, ia.categoria, NULL, COUNT(*), NULL,
+                SUM(CASE WHEN ia.resultado = 'CONFORME' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN ia.resultado = 'NAO CONFORME' THEN 1 ELSE 0 END)
+            FROM itens_avaliados ia
+            JOIN avaliacoes av ON av.id = ia.avaliacao_id
+            WHERE av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
+                AND av.agent_id IS NOT NULL{filtro_agentes.format('av.')}
+            GROUP BY av.agent_id, dia, ia.categoria
+        """, parametros * 2)
+    # agent_id -> nome, qtd, soma, evolucao, evolucao_itens, radar (categoria -> [conforme, total])
+    acumulados = {agent_id: [None, 0, 0, [], [], {}] for agent_id in agent_ids or ()}
+    for linha in cursor.fetchall():
+        acumulado = acumulados.setdefault(int(linha['agent_id']), [None, 0, 0, [], [], {}])
+        if linha['tipo'] == 'A':
+            acumulado[0] = linha['name']
+            acumulado[1] += int(linha['qtd'])
+            acumulado[2] += linha['soma']
+            acumulado[3].append({'dia': linha['dia'], 'media': linha['soma'] / int(linha['qtd'])})
+        else:
+            acumulado[4].append({'categoria': linha['categoria'], 'dia': linha['dia'],
+                                 'conforme': linha['conforme'], 'nao_conforme': linha['nao_conforme']})
+            categoria = acumulado[5].setdefault(linha['categoria'], [0, 0])
+            categoria[0] += linha['conforme']
+            categoria[1] += int(linha['qtd'])
+    detalhes = {}
+    for agent_id, (nome, qtd, soma, evolucao, evolucao_itens, radar) in acumulados.items():
+        # Sem filtro de ids, só entram os agentes com avaliações (como em /api/agentes)
+        if agent_ids is None and not qtd:
+            continue
+        evolucao.sort(key=lambda e: e['dia'])
+        evolucao_itens.sort(key=lambda e: (e['categoria'], e['dia']))
+        detalhes[agent_id] = {
+            'dados': {'name': nome, 'media': soma / qtd if qtd else None, 'qtd': qtd},
+            'radar': [{'categoria': categoria, 'taxa_conforme': conforme / total}
+                      for categoria, (conforme, total) in sorted(radar.items())],
+            'evolucao': evolucao,
+            'evolucao_itens': evolucao_itens
+        }
+    return detalhes
+
+def _detalhes_consulta_unica(cursor, agent_id, inicio, fim, carteira, dias):
+    """Detalhes de um agente numa única ida ao banco (ver _detalhes_agentes)."""
+    return _detalhes_agentes(cursor, [agent_id], inicio, fim, carteira, dias)[agent_id]
+
+@app.route('/api/agente/<int:agent_id>/detalhes')
+@cache_resposta
+def detalhes_agente(agent_id):
+    inicio = request.args.get('inicio')
+    fim = request.args.get('fim')
+    carteira = request.args.get('carteira', 'AGUAS')
+    with cursor_db(dictionary=True) as cursor:
+        dias = _usar_rollups(cursor, inicio, fim)
+        consultar = _detalhes_consulta_unica if CONSULTA_UNICA_DETALHES else _detalhes_consultas_separadas
+        detalhes = consultar(cursor, agent_id, inicio, fim, carteira, dias)
+    return jsonify(detalhes)
+
+@app.route('/api/agentes/detalhes')
+@cache_resposta
+def detalhes_agentes():
+    """
+    Detalhes de vários agentes numa só resposta, {agent_id: detalhes}, no
+    formato de /api/agente/<id>/detalhes. `ids` é a lista de agentes
+    separada por vírgulas; sem ela, retorna todos os agentes da carteira.
+    """
+    inicio = request.args.get('inicio')
+    fim = request.args.get('fim')
+    carteira = request.args.get('carteira', 'AGUAS')
+    ids = request.args.get('ids')
+    try:
+        agent_ids = list(dict.fromkeys(int(i) for i in ids.split(',') if i.strip())) if ids else None
+    except ValueError:
+        return jsonify({'erro': f"ids inválidos: {ids}"}), 400
+    with cursor_db(dictionary=True) as cursor:
+        dias = _usar_rollups(cursor, inicio, fim)
+        if CONSULTA_UNICA_DETALHES:
+            detalhes = _detalhes_agentes(cursor, agent_ids, inicio, fim, carteira, dias)
+        else:
+            if agent_ids is None:
+                cursor.execute("""
+                    SELECT DISTINCT av.agent_id FROM avaliacoes av
+                    JOIN agents ag ON av.agent_id = ag.id
+                    WHERE av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
+                """, (inicio, fim, carteira))
+                agent_ids = [linha['agent_id'] for linha in cursor.fetchall()]
+            detalhes = {agent_id: _detalhes_consultas_separadas(cursor, agent_id, inicio, fim, carteira, dias)
+                        for agent_id in agent_ids}
+    return jsonify({str(agent_id): valor for agent_id, valor in detalhes.items()})
+
+def _codificar_cursor_historico(linha):
+    """Token opaco com a posição (data_ligacao, avaliacao_id) da última avaliação da página."""
+    posicao = json.dumps([str(linha['data_ligacao']), linha['avaliacao_id']])
+    return base64.urlsafe_b64encode(posicao.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decodificar_cursor_historico(token):
+    """Retorna (data_ligacao, avaliacao_id) do token, ou levanta ValueError."""
+    try:
+        posicao = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        data_ligacao, avaliacao_id = posicao
+        return str(data_ligacao), int(avaliacao_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"cursor inválido: {token}") from e
+
+def _consulta_historico(agent_id, inicio, fim, carteira, apos=None, limite=None):
+    """
+    SQL e parâmetros do histórico, na ordem (data_ligacao DESC, avaliacao_id).
+    Com `apos` (posição de _decodificar_cursor_historico), começa na avaliação
+    seguinte; com `limite`, traz só essa quantidade de avaliações, com todos
+    os seus itens. Avaliações sem itens (gravadas com erro) não aparecem no
+    histórico e também não contam no limite.
+    """
+    filtro = "av.agent_id = %s AND av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s"
+    parametros = [agent_id, inicio, fim, carteira]
+    if apos:
+        filtro += " AND (av.data_ligacao < %s OR (av.data_ligacao = %s AND av.id > %s))"
+        parametros += [apos[0], apos[0], apos[1]]
+    colunas = "av.id as avaliacao_id, av.data_ligacao, av.pontuacao, av.status_avaliacao, ia.categoria, ia.resultado, ia.descricao"
+    ordem = "ORDER BY av.data_ligacao DESC, av.id, ia.categoria"
+    if limite is None:
+        sql = f"""
+            SELECT {colunas}
+            FROM avaliacoes av
+            JOIN itens_avaliados ia ON av.id = ia.avaliacao_id
+            WHERE {filtro}
+            {ordem}
+        """
+    else:
+        sql = f"""
+            SELECT {colunas}
+            FROM (
+                SELECT av.id, av.data_ligacao, av.pontuacao, av.status_avaliacao
+                FROM avaliacoes av
+                WHERE {filtro}
+                    AND EXISTS (SELECT 1 FROM itens_avaliados ia2 WHERE ia2.avaliacao_id = av.id)
+                ORDER BY av.data_ligacao DESC, av.id
+                LIMIT %s
+            ) av
+            JOIN itens_avaliados ia ON av.id = ia.avaliacao_id
+            {ordem}
+        """
+        parametros.append(limite)
+    return sql, parametros
+
+def _transmitir_historico(sql, parametros):
+    """Gera uma linha NDJSON por item, lida do banco em blocos por um cursor sem buffer."""
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(sql, parametros)
+        while True:
+            linhas = cursor.fetchmany(TAMANHO_BLOCO_HISTORICO)
+            if not linhas:
+                break
+            yield ''.join(app.json.dumps(linha) + '\n' for linha in linhas)
+    finally:
+        # Se o cliente desconectar no meio, o resultado ainda pendente precisa ser
+        # lido até o fim: senão cursor.close() falha com "Unread result found" e a
+        # conexão volta ao pool no meio de uma consulta
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            cursor.close()
+        finally:
+            conn.close()
 
 @app.route('/api/agente/<int:agent_id>/historico')
 def historico_agente(agent_id):
+    """
+    Sem parâmetros extras, retorna a lista completa, como antes. Com `limite`
+    (avaliações por página) e/ou `cursor`, retorna uma página e o cursor da
+    seguinte ({'historico': [...], 'proximo_cursor': token ou null}). Com
+    `formato=ndjson`, transmite uma linha por item à medida que o banco as
+    entrega, do `cursor` (se informado) até o fim do período.
+    """
     inicio = request.args.get('inicio')
     fim = request.args.get('fim')
     carteira = request.args.get('carteira', 'AGUAS')
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(f"""
-        SELECT av.id as avaliacao_id, av.data_ligacao, av.pontuacao, av.status_avaliacao, ia.categoria, ia.resultado, ia.descricao
-        FROM avaliacoes av
-        JOIN itens_avaliados ia ON av.id = ia.avaliacao_id
-        WHERE av.agent_id = %s AND av.data_ligacao >= %s AND av.data_ligacao < %s AND av.carteira = %s
-        ORDER BY av.data_ligacao DESC, av.id, ia.categoria
-    """, (agent_id, inicio, fim, carteira))
-    historico = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify(historico)
+    token = request.args.get('cursor')
+    limite = request.args.get('limite', type=int)
+    try:
+        apos = _decodificar_cursor_historico(token) if token else None
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    if request.args.get('formato') == 'ndjson':
+        sql, parametros = _consulta_historico(agent_id, inicio, fim, carteira, apos)
+        return app.response_class(stream_with_context(_transmitir_historico(sql, parametros)),
+                                  mimetype='application/x-ndjson')
+
+    if token and not limite:
+        limite = LIMITE_PADRAO_HISTORICO
+    if limite is not None:
+        limite = max(1, min(limite, LIMITE_MAXIMO_HISTORICO))
+
+    # Uma avaliação a mais indica se há próxima página
+    sql, parametros = _consulta_historico(agent_id, inicio, fim, carteira, apos, limite and limite + 1)
+    with cursor_db(dictionary=True) as cursor:
+        cursor.execute(sql, parametros)
+        historico = cursor.fetchall()
+    if limite is None:
+        return jsonify(historico)
+    ids = list(dict.fromkeys(linha['avaliacao_id'] for linha in historico))
+    proximo_cursor = None
+    if len(ids) > limite:
+        historico = [linha for linha in historico if linha['avaliacao_id'] != ids[-1]]
+        proximo_cursor = _codificar_cursor_historico(historico[-1])
+    return jsonify({'historico': historico, 'proximo_cursor': proximo_cursor})
 
 @app.route('/api/transcricao/<int:avaliacao_id>')
 def transcricao(avaliacao_id):
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT conteudo FROM transcricoes WHERE avaliacao_id = %s", (avaliacao_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return jsonify({'conteudo': row['conteudo'] if row else ''})
+    """
+    Responde com ETag (hash do valor gravado) e gzip quando o cliente aceita;
+    se o If-None-Match coincidir, devolve 304 sem descompactar o texto.
+    """
+    with cursor_db(dictionary=True) as cursor:
+        cursor.execute("SELECT conteudo FROM transcricoes WHERE avaliacao_id = %s", (avaliacao_id,))
+        row = cursor.fetchone()
+    armazenado = row['conteudo'] if row else ''
+    if isinstance(armazenado, str):
+        armazenado = armazenado.encode('utf-8')
+    usar_gzip = 'gzip' in request.accept_encodings
+    # A versão gzip é outra representação e precisa de outra ETag
+    etag = hashlib.sha1(armazenado).hexdigest()[:20] + ('-gz' if usar_gzip else '')
+    if request.if_none_match.contains(etag):
+        resposta = app.response_class(status=304)
+    else:
+        corpo = app.json.dumps({'conteudo': descompactar_transcricao(armazenado)}).encode('utf-8')
+        if usar_gzip and len(corpo) >= TAMANHO_MINIMO_GZIP:
+            corpo = gzip.compress(corpo, compresslevel=6)
+            resposta = app.response_class(corpo, mimetype='application/json')
+            resposta.headers['Content-Encoding'] = 'gzip'
+        else:
+            resposta = app.response_class(corpo, mimetype='application/json')
+    resposta.set_etag(etag)
+    resposta.headers['Vary'] = 'Accept-Encoding'
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+@app.route('/api/busca')
+def busca():
+    """
+    Busca nas transcrições: `q` com palavras, "frases" e -termos excluídos
+    (ver busca_transcricoes), filtrada por carteira e, opcionalmente,
+    agent_id, inicio e fim. Retorna as avaliações ranqueadas, com um trecho.
+    """
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return jsonify({'erro': 'informe o parâmetro q'}), 400
+    with cursor_db(dictionary=True) as cursor:
+        if not busca_disponivel(cursor):
+            return jsonify({'erro': 'índice de busca não criado (python busca_transcricoes.py reconstruir)'}), 503
+        resultados = buscar_transcricoes(
+            cursor, consulta, request.args.get('carteira', 'AGUAS'),
+            agent_id=request.args.get('agent_id', type=int),
+            inicio=request.args.get('inicio'), fim=request.args.get('fim'),
+            limite=request.args.get('limite', LIMITE_PADRAO, type=int))
+    return jsonify(resultados)
+
+@app.route('/api/status/banco')
+def status_banco():
+    return jsonify(estatisticas_pool())
+
+@app.route('/api/status/cache')
+def status_cache():
+    estatisticas = CACHE_RESPOSTAS.estatisticas()
+    with _LOCK_VERSOES:
+        estatisticas['invalidacoes'] = _ESTATISTICAS_CACHE['invalidacoes']
+    return jsonify(estatisticas)
 
 if __name__ == '__main__':
     app.run(debug=True)
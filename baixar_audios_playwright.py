@@ -1,7 +1,16 @@
+import json
 import os
+import re
+import sys
 import time
 import csv
-import mysql.connector
+import threading
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote
+
+import httpx
+from banco import get_connection
 from playwright.sync_api import sync_playwright
 from datetime import datetime, timedelta
 
@@ -11,35 +20,39 @@ DOWNLOAD_URL = 'https://portesmarinho.vonixcc.com.br/recordings/{}'
 USERNAME = 'kayro'
 PASSWORD = '@Kl.#306'
 
+# Modo de download: 'playwright' (navegador, um áudio por vez) ou 'http'
+# (login único no Playwright e downloads paralelos com os cookies da sessão)
+MODO_DOWNLOAD = os.getenv('MODO_DOWNLOAD', 'playwright')
+MAX_DOWNLOADS_SIMULTANEOS = int(os.getenv('MAX_DOWNLOADS_SIMULTANEOS', '8'))
+TIMEOUT_DOWNLOAD = 120  # segundos
+TAMANHO_BLOCO_DOWNLOAD = 64 * 1024
+
 # Pasta base onde os áudios serão salvos
 BASE_PASTA = r'C:\Users\wanderley.terra\Documents\Audios_monitoria'
 
-# Configuração do banco de dados
-DB_CONFIG = {
-    'host': '10.100.10.57',
-    'port': 3306,
-    'user': 'user_automacao',
-    'password': 'G5T82ZWMr',
-    'database': 'vonix',
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci',
-}
-
 # Configurações para as carteiras. Agora as pastas "Águas Guariroba" e "Vuon"
-# ficam no mesmo nível dentro de BASE_PASTA.
+# ficam no mesmo nível dentro de BASE_PASTA. As consultas recebem a marca
+# d'água da carteira (start_time três vezes e call_id) e o tamanho da página;
+# por isso os '%' literais dos LIKE aparecem como '%%'. O "start_time >= %s"
+# repetido permite ao banco posicionar o índice de start_time direto na marca,
+# o que a condição com OR sozinha não permite.
 CONFIG_CARTEIRAS = [
     {
         "nome": "aguas_guariroba",
         "sql_query": '''
 SELECT call_id, queue_id, start_time, answer_time, hangup_time, call_secs
 FROM vonix.calls AS c
-WHERE queue_id LIKE '%aguas%'
-    AND queue_id NOT LIKE 'aguasguariroba%'
-    AND status LIKE 'Completada%'
-    AND start_time >= '2025-07-30 00:00:00'
+WHERE queue_id LIKE '%%aguas%%'
+    AND queue_id NOT LIKE 'aguasguariroba%%'
+    AND status LIKE 'Completada%%'
     AND call_secs > 60
-ORDER BY start_time DESC
+    AND start_time >= %s
+    AND (start_time > %s OR (start_time = %s AND call_id > %s))
+ORDER BY start_time, call_id
+LIMIT %s
 ''',
+        "fila_contem": "aguas",
+        "fila_nao_comeca_com": "aguasguariroba",
         "pasta_destino": os.path.join(BASE_PASTA, "Águas Guariroba")
     },
     {
@@ -47,12 +60,15 @@ ORDER BY start_time DESC
         "sql_query": '''
 SELECT call_id, queue_id, start_time, answer_time, hangup_time, call_secs
 FROM vonix.calls AS c
-WHERE queue_id LIKE '%vuon%'
-    AND status LIKE 'Completada%'
-    AND start_time >= '2025-07-30 00:00:00'
+WHERE queue_id LIKE '%%vuon%%'
+    AND status LIKE 'Completada%%'
     AND call_secs > 60
-ORDER BY start_time DESC
+    AND start_time >= %s
+    AND (start_time > %s OR (start_time = %s AND call_id > %s))
+ORDER BY start_time, call_id
+LIMIT %s
 ''',
+        "fila_contem": "vuon",
         "pasta_destino": os.path.join(BASE_PASTA, "Vuon")
     },
     {
@@ -60,82 +76,495 @@ ORDER BY start_time DESC
         "sql_query": '''
 SELECT call_id, queue_id, start_time, answer_time, hangup_time, call_secs
 FROM vonix.calls AS c
-WHERE queue_id LIKE '%unimed%'
-    AND status LIKE 'Completada%'
-    AND start_time >= '2025-07-30 00:00:00'
+WHERE queue_id LIKE '%%unimed%%'
+    AND status LIKE 'Completada%%'
     AND call_secs > 60
-ORDER BY start_time DESC
+    AND start_time >= %s
+    AND (start_time > %s OR (start_time = %s AND call_id > %s))
+ORDER BY start_time, call_id
+LIMIT %s
 ''',
+        "fila_contem": "unimed",
         "pasta_destino": os.path.join(BASE_PASTA, "Unimed")
     }
 ]
 
-def buscar_call_ids_do_banco(sql_query):
-    call_ids = []
+# Consulta única para todas as carteiras: uma só varredura de vonix.calls; cada
+# linha é distribuída às carteiras pelo queue_id (classificar_fila), com os
+# mesmos critérios de "fila_contem"/"fila_nao_comeca_com" das consultas acima.
+SQL_TODAS_CARTEIRAS = '''
+SELECT call_id, queue_id, start_time, answer_time, hangup_time, call_secs
+FROM vonix.calls AS c
+WHERE (queue_id LIKE '%%aguas%%' OR queue_id LIKE '%%vuon%%' OR queue_id LIKE '%%unimed%%')
+    AND status LIKE 'Completada%%'
+    AND call_secs > 60
+    AND start_time >= %s
+    AND (start_time > %s OR (start_time = %s AND call_id > %s))
+ORDER BY start_time, call_id
+LIMIT %s
+'''
+VARREDURA_UNICA = os.getenv('VARREDURA_UNICA', '1') != '0'
+_CARTEIRAS_POR_FILA = {}
+
+def classificar_fila(queue_id):
+    """
+    Retorna os nomes das carteiras a que a fila pertence (como os LIKE das
+    consultas, sem diferenciar maiúsculas). O resultado fica memorizado por
+    queue_id, já que há poucas filas distintas.
+    """
+    carteiras = _CARTEIRAS_POR_FILA.get(queue_id)
+    if carteiras is None:
+        fila = (queue_id or '').lower()
+        carteiras = tuple(
+            config['nome'] for config in CONFIG_CARTEIRAS
+            if config['fila_contem'] in fila
+            and not (config.get('fila_nao_comeca_com') and fila.startswith(config['fila_nao_comeca_com']))
+        )
+        _CARTEIRAS_POR_FILA[queue_id] = carteiras
+    return carteiras
+
+# Marca d'água por carteira: a última chamada (start_time, call_id) já
+# selecionada, para que cada execução leia apenas as chamadas novas
+ARQUIVO_MARCA_DAGUA = 'marca_dagua.json'
+INICIO_PADRAO = '2025-07-30 00:00:00'  # Usado quando a carteira ainda não tem marca d'água
+TAMANHO_PAGINA_CHAMADAS = int(os.getenv('TAMANHO_PAGINA_CHAMADAS', '500'))
+MAX_TENTATIVAS_DOWNLOAD = 3  # Execuções em que um call_id com falha é tentado de novo
+# A chamada entra em vonix.calls ao terminar: uma ligação longa pode aparecer
+# depois de outras que começaram mais tarde. Cada execução relê esta margem
+# antes da marca d'água; o manifesto evita baixar de novo o que já foi baixado.
+MARGEM_RELEITURA = timedelta(hours=2)
+
+def carregar_marca_dagua(pasta_destino):
+    caminho = os.path.join(pasta_destino, ARQUIVO_MARCA_DAGUA)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            marca = json.load(f)
+    except (OSError, ValueError):
+        marca = {}
+    marca.setdefault('start_time', INICIO_PADRAO)
+    marca.setdefault('call_id', '')
+    marca.setdefault('pendentes', {})
+    return marca
+
+def salvar_marca_dagua(pasta_destino, marca):
+    caminho = os.path.join(pasta_destino, ARQUIVO_MARCA_DAGUA)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(marca, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+def buscar_chamadas_do_banco(sql_query, marca, limite=None, conn=None):
+    """
+    Retorna [(call_id, queue_id, start_time), ...] das chamadas posteriores à
+    marca d'água, em ordem crescente, no máximo `limite` por vez. As linhas são
+    lidas de um cursor sem buffer, sem carregar o resultado inteiro de uma vez.
+    Erros de banco são propagados: uma falha não pode ser confundida com uma
+    página vazia, que encerraria a leitura como se não houvesse chamadas novas.
+    """
+    if limite is None:
+        limite = TAMANHO_PAGINA_CHAMADAS
+    chamadas = []
+    conexao_propria = conn is None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        rows = cursor.fetchall()
-        for row in rows:
-            call_ids.append(row[0])
-        cursor.close()
-        conn.close()
-        print(f"{len(call_ids)} call_ids encontrados no banco.")
-    except Exception as e:
-        print(f"Erro ao consultar banco: {e}")
-    return call_ids
-
-def salvar_mapeamento_call_ids(mapeamento, pasta_destino):
-    arquivo_mapeamento = os.path.join(pasta_destino, 'mapeamento_call_ids.csv')
-    with open(arquivo_mapeamento, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['nome_arquivo', 'call_id'])
-        for nome_arquivo, call_id in mapeamento.items():
+        if conexao_propria:
+            conn = get_connection()
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql_query, (marca['start_time'], marca['start_time'], marca['start_time'], marca['call_id'], limite))
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for row in rows:
+                start_time = row[2]
+                if isinstance(start_time, datetime):
+                    start_time = start_time.strftime('%Y-%m-%d %H:%M:%S')
+                chamadas.append((str(row[0]), row[1], str(start_time)))
+    finally:
+        # Uma conexão do pool que não é fechada nunca volta para ele
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conexao_propria and conn is not None:
+            conn.close()
+    return chamadas
+
+def _ler_todas_as_paginas(sql_query, inicio, conn=None):
+    """Percorre todas as páginas da consulta a partir de `inicio`; retorna as linhas lidas."""
+    cursor = {'start_time': inicio, 'call_id': ''}
+    linhas = []
+    while True:
+        chamadas = buscar_chamadas_do_banco(sql_query, cursor, conn=conn)
+        linhas.extend(chamadas)
+        if len(chamadas) < TAMANHO_PAGINA_CHAMADAS:
+            return linhas
+        cursor = {'start_time': chamadas[-1][2], 'call_id': chamadas[-1][0]}
+
+def comparar_tempo_consultas(inicio=INICIO_PADRAO, conn=None):
+    """
+    Mede a leitura das chamadas desde `inicio` com uma consulta por carteira x
+    a consulta única com classificação por fila, e confere se ambas selecionam
+    as mesmas chamadas para cada carteira.
+    """
+    t0 = time.perf_counter()
+    por_carteira = {config['nome']: {linha[0] for linha in _ler_todas_as_paginas(config['sql_query'], inicio, conn)}
+                    for config in CONFIG_CARTEIRAS}
+    t_separadas = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    unica = {config['nome']: set() for config in CONFIG_CARTEIRAS}
+    for call_id, queue_id, _ in _ler_todas_as_paginas(SQL_TODAS_CARTEIRAS, inicio, conn):
+        for nome in classificar_fila(queue_id):
+            unica[nome].add(call_id)
+    t_unica = time.perf_counter() - t0
+    
+    status = 'OK' if unica == por_carteira else 'DIVERGENTE'
+    print(f"Consultas por carteira ({len(CONFIG_CARTEIRAS)}): {t_separadas:.2f}s | consulta única: {t_unica:.2f}s | "
+          f"{t_separadas / t_unica if t_unica else 0:.1f}x | {sum(len(v) for v in unica.values())} chamadas | seleção {status}")
+    return t_separadas, t_unica
+
+# Manifesto dos downloads: o mesmo mapeamento_call_ids.csv lido por
+# transcrever_audios, mas só recebe linhas novas (uma por áudio baixado)
+ARQUIVO_MANIFESTO = 'mapeamento_call_ids.csv'
+_LOCK_MANIFESTO = threading.Lock()
+
+def carregar_manifesto(pasta_destino):
+    """Retorna {nome_arquivo: call_id} dos downloads já registrados na pasta."""
+    caminho = os.path.join(pasta_destino, ARQUIVO_MANIFESTO)
+    mapeamento = {}
+    if not os.path.exists(caminho):
+        return mapeamento
+    with open(caminho, 'r', newline='') as f:
+        conteudo = f.read()
+    for row in csv.DictReader(conteudo.splitlines()):
+        # Uma linha cortada por uma interrupção no meio da escrita é ignorada
+        if row.get('nome_arquivo') and row.get('call_id'):
+            mapeamento[row['nome_arquivo']] = row['call_id']
+    if conteudo and not conteudo.endswith('\n'):
+        with open(caminho, 'a', newline='') as f:
+            f.write('\n')
+    return mapeamento
+
+def registrar_no_manifesto(pasta_destino, nome_arquivo, call_id):
+    """Acrescenta um download ao manifesto e força a gravação em disco (checkpoint)."""
+    caminho = os.path.join(pasta_destino, ARQUIVO_MANIFESTO)
+    with _LOCK_MANIFESTO:
+        novo = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        with open(caminho, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if novo:
+                writer.writerow(['nome_arquivo', 'call_id'])
             writer.writerow([nome_arquivo, call_id])
-    print(f"Mapeamento salvo em: {arquivo_mapeamento}")
+            f.flush()
+            os.fsync(f.fileno())
 
-def baixar_audios_com_playwright(call_ids, pasta_destino):
+def _arquivos_ja_baixados(pasta_destino):
+    """Nomes dos áudios já presentes na pasta ou em Audios_transcritos."""
+    nomes = set()
+    for pasta in (pasta_destino, os.path.join(pasta_destino, 'Audios_transcritos')):
+        if os.path.isdir(pasta):
+            nomes.update(os.listdir(pasta))
+    return nomes
+
+def filtrar_call_ids_pendentes(call_ids, pasta_destino):
+    """
+    Remove os call_ids já registrados no manifesto, para que uma nova
+    execução continue de onde a anterior parou.
+    """
+    ja_baixados = set(str(call_id) for call_id in carregar_manifesto(pasta_destino).values())
+    pendentes = [call_id for call_id in call_ids if str(call_id) not in ja_baixados]
+    print(f"{len(call_ids) - len(pendentes)} call_ids já baixados (manifesto); {len(pendentes)} pendentes.")
+    return pendentes
+
+def _fazer_login(page):
+    page.goto(LOGIN_URL)
+    page.fill('#username', USERNAME)
+    page.fill('#password', PASSWORD)
+    page.click('xpath=//*[@id="wrapper"]/div/form/dl/dd[3]/input')
+    time.sleep(2)  # Aguarda 2 segundos após o login
+    print('Login realizado com Playwright.')
+
+def obter_cookies_sessao(headless=True):
+    """Faz o login uma única vez no Playwright e exporta os cookies da sessão."""
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        context = browser.new_context()
+        page = context.new_page()
+        _fazer_login(page)
+        cookies = context.cookies()
+        browser.close()
+    print(f"{len(cookies)} cookies de sessão exportados.")
+    return cookies
+
+@contextmanager
+def sessao_playwright(headless=False):
+    """
+    Abre o navegador, faz o login e entrega a página pronta para downloads;
+    a mesma página é reutilizada por todas as carteiras e páginas da execução.
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        try:
+            context = browser.new_context(accept_downloads=True)
+            page = context.new_page()
+            _fazer_login(page)
+            yield page
+        finally:
+            browser.close()
+
+def _nome_arquivo_resposta(resposta, call_id):
+    """Nome sugerido pelo servidor (Content-Disposition), como o suggested_filename do Playwright."""
+    disposicao = resposta.headers.get('content-disposition', '')
+    m = re.search(r"filename\*=(?:UTF-8'')?([^;]+)", disposicao, re.IGNORECASE)
+    if not m:
+        m = re.search(r'filename="?([^";]+)"?', disposicao, re.IGNORECASE)
+    if m:
+        return os.path.basename(unquote(m.group(1).strip().strip('"')))
+    return f"{call_id}.mp3"
+
+def _baixar_gravacao(cliente, url_download, call_id, pasta_destino, existentes=frozenset()):
+    """
+    Baixa uma gravação gravando o corpo em disco aos blocos; retorna
+    (nome_arquivo, caminho). Se o arquivo já existe localmente (nome em
+    `existentes`), a conexão é encerrada após os cabeçalhos, sem baixar o corpo.
+    """
+    with cliente.stream('GET', url_download.format(call_id)) as resposta:
+        if resposta.is_redirect:
+            raise RuntimeError(f"Sessão inválida ou expirada (redirecionado para {resposta.headers.get('location')})")
+        resposta.raise_for_status()
+        if resposta.headers.get('content-type', '').startswith('text/html'):
+            raise RuntimeError("Resposta em HTML em vez de áudio (sessão expirada?)")
+        nome_arquivo = _nome_arquivo_resposta(resposta, call_id)
+        caminho_arquivo = os.path.join(pasta_destino, nome_arquivo)
+        if nome_arquivo in existentes:
+            return nome_arquivo, None
+        temporario = caminho_arquivo + '.part'
+        try:
+            with open(temporario, 'wb') as f:
+                for bloco in resposta.iter_bytes(TAMANHO_BLOCO_DOWNLOAD):
+                    f.write(bloco)
+            os.replace(temporario, caminho_arquivo)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+    return nome_arquivo, caminho_arquivo
+
+def baixar_audios_http(call_ids, pasta_destino, cookies=None, url_download=DOWNLOAD_URL, max_concorrencia=None):
+    """
+    Baixa as gravações em paralelo com um cliente HTTP (conexões keep-alive
+    reaproveitadas), usando os cookies de uma sessão já autenticada. Sem
+    `cookies`, faz o login com obter_cookies_sessao().
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+    call_ids = filtrar_call_ids_pendentes(call_ids, pasta_destino)
+    if not call_ids:
+        return {}
+    existentes = _arquivos_ja_baixados(pasta_destino)
+    if cookies is None:
+        cookies = obter_cookies_sessao()
+    if max_concorrencia is None:
+        max_concorrencia = MAX_DOWNLOADS_SIMULTANEOS
+    
+    jar = httpx.Cookies()
+    for cookie in cookies:
+        jar.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+    limites = httpx.Limits(max_connections=max_concorrencia, max_keepalive_connections=max_concorrencia)
+    
+    mapeamento = {}
+    inicio = time.time()
+    with httpx.Client(cookies=jar, limits=limites, timeout=TIMEOUT_DOWNLOAD, follow_redirects=False) as cliente:
+        with ThreadPoolExecutor(max_workers=max_concorrencia) as executor:
+            futuros = {
+                executor.submit(_baixar_gravacao, cliente, url_download, call_id, pasta_destino, existentes): call_id
+                for call_id in call_ids
+            }
+            for futuro in as_completed(futuros):
+                call_id = futuros[futuro]
+                try:
+                    nome_arquivo, caminho_arquivo = futuro.result()
+                except Exception as e:
+                    print(f"Falha ao baixar {call_id}: {e}")
+                    continue
+                registrar_no_manifesto(pasta_destino, nome_arquivo, call_id)
+                mapeamento[nome_arquivo] = call_id
+                if caminho_arquivo is None:
+                    print(f"Áudio já existente, download ignorado: {nome_arquivo} (call_id: {call_id})")
+                else:
+                    print(f"Áudio salvo: {caminho_arquivo} (call_id: {call_id})")
+    print(f"{len(mapeamento)}/{len(call_ids)} áudios baixados em {time.time() - inicio:.1f}s "
+          f"({max_concorrencia} downloads simultâneos).")
+    return mapeamento
+
+def baixar_audios_com_playwright(call_ids, pasta_destino, page=None):
+    """
+    Baixa os áudios pelo navegador, um por vez. Com `page` (de
+    sessao_playwright) usa a sessão já aberta; sem ela, abre uma só para
+    esta chamada.
+    """
     # Cria a pasta de destino, se não existir
     if not os.path.exists(pasta_destino):
         os.makedirs(pasta_destino)
     
-    mapeamento = {}    
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        # Login
-        page.goto(LOGIN_URL)
-        page.fill('#username', USERNAME)
-        page.fill('#password', PASSWORD)
-        page.click('xpath=//*[@id="wrapper"]/div/form/dl/dd[3]/input')
-        time.sleep(2)  # Aguarda 2 segundos após o login
-        print('Login realizado com Playwright.')
-        # Baixar cada áudio
-        for call_id in call_ids:
-            url = DOWNLOAD_URL.format(call_id)
-            try:
-                with page.expect_download() as download_info:
-                    page.evaluate(f"window.location.href = '{url}'")
-                download = download_info.value
-                nome_arquivo = download.suggested_filename
-                caminho_arquivo = os.path.join(pasta_destino, nome_arquivo)
-                download.save_as(caminho_arquivo)
+    call_ids = filtrar_call_ids_pendentes(call_ids, pasta_destino)
+    if not call_ids:
+        return {}
+    if page is None:
+        with sessao_playwright() as page:
+            return _baixar_na_pagina(page, call_ids, pasta_destino)
+    return _baixar_na_pagina(page, call_ids, pasta_destino)
+
+def _baixar_na_pagina(page, call_ids, pasta_destino):
+    existentes = _arquivos_ja_baixados(pasta_destino)
+    mapeamento = {}
+    # Baixar cada áudio
+    for call_id in call_ids:
+        url = DOWNLOAD_URL.format(call_id)
+        try:
+            with page.expect_download() as download_info:
+                page.evaluate(f"window.location.href = '{url}'")
+            download = download_info.value
+            nome_arquivo = download.suggested_filename
+            if nome_arquivo in existentes:
+                download.cancel()
+                registrar_no_manifesto(pasta_destino, nome_arquivo, call_id)
                 mapeamento[nome_arquivo] = call_id
-                print(f"Áudio salvo: {caminho_arquivo} (call_id: {call_id})")
-            except Exception as e:
-                print(f"Falha ao baixar {call_id}: {e}")
-        browser.close()
-    
-    salvar_mapeamento_call_ids(mapeamento, pasta_destino)
+                print(f"Áudio já existente, download ignorado: {nome_arquivo} (call_id: {call_id})")
+                continue
+            caminho_arquivo = os.path.join(pasta_destino, nome_arquivo)
+            download.save_as(caminho_arquivo)
+            registrar_no_manifesto(pasta_destino, nome_arquivo, call_id)
+            mapeamento[nome_arquivo] = call_id
+            print(f"Áudio salvo: {caminho_arquivo} (call_id: {call_id})")
+        except Exception as e:
+            print(f"Falha ao baixar {call_id}: {e}")
+    return mapeamento
+
+def _baixar(call_ids, pasta_destino, cookies=None, page=None):
+    if MODO_DOWNLOAD == 'http':
+        return baixar_audios_http(call_ids, pasta_destino, cookies=cookies)
+    return baixar_audios_com_playwright(call_ids, pasta_destino, page=page)
+
+def _tentar_pendentes(config, marca, cookies=None, page=None):
+    """Tenta de novo os call_ids que falharam em execuções anteriores."""
+    if not marca['pendentes']:
+        return
+    pasta_destino = config['pasta_destino']
+    _baixar(list(marca['pendentes']), pasta_destino, cookies, page)
+    baixados = set(carregar_manifesto(pasta_destino).values())
+    for call_id in list(marca['pendentes']):
+        if call_id in baixados:
+            del marca['pendentes'][call_id]
+        elif marca['pendentes'][call_id] >= MAX_TENTATIVAS_DOWNLOAD:
+            print(f"call_id {call_id} descartado após {MAX_TENTATIVAS_DOWNLOAD} tentativas.")
+            del marca['pendentes'][call_id]
+        else:
+            marca['pendentes'][call_id] += 1
+    salvar_marca_dagua(pasta_destino, marca)
+
+def _baixar_pagina(config, marca, chamadas, cookies=None, page=None):
+    """Baixa uma página de chamadas da carteira e avança a marca d'água até a última delas."""
+    pasta_destino = config['pasta_destino']
+    call_ids = [call_id for call_id, _, _ in chamadas]
+    _baixar(call_ids, pasta_destino, cookies, page)
+    baixados = set(carregar_manifesto(pasta_destino).values())
+    for call_id in call_ids:
+        if call_id not in baixados:
+            marca['pendentes'].setdefault(call_id, 1)
+    ultima = (chamadas[-1][2], chamadas[-1][0])
+    if ultima > (marca['start_time'], marca['call_id']):
+        marca['start_time'], marca['call_id'] = ultima
+    salvar_marca_dagua(pasta_destino, marca)
+
+def _inicio_leitura(marca):
+    inicio = datetime.strptime(marca['start_time'], '%Y-%m-%d %H:%M:%S') - MARGEM_RELEITURA
+    return inicio.strftime('%Y-%m-%d %H:%M:%S')
+
+def _preparar_carteira(config, cookies=None, page=None):
+    os.makedirs(config['pasta_destino'], exist_ok=True)
+    marca = carregar_marca_dagua(config['pasta_destino'])
+    print(f"[{config['nome']}] Marca d'água: {marca['start_time']} (call_id {marca['call_id'] or '-'}), "
+          f"{len(marca['pendentes'])} pendentes.")
+    _tentar_pendentes(config, marca, cookies, page)
+    return marca
+
+def baixar_carteira_incremental(config, cookies=None, page=None):
+    """
+    Baixa as chamadas novas da carteira, página a página a partir da marca
+    d'água, que avança (e é gravada) ao fim de cada página. Os call_ids que
+    falharem ficam em `pendentes` e são tentados de novo nas próximas
+    execuções, até MAX_TENTATIVAS_DOWNLOAD vezes.
+
+    `cookies` (modo http) ou `page` (modo playwright, de sessao_playwright)
+    reaproveitam um único login; sem eles, cada página faz o próprio login.
+    """
+    marca = _preparar_carteira(config, cookies, page)
+    cursor = {'start_time': _inicio_leitura(marca), 'call_id': ''}
+    total = 0
+    while True:
+        chamadas = buscar_chamadas_do_banco(config['sql_query'], cursor)
+        if not chamadas:
+            break
+        total += len(chamadas)
+        _baixar_pagina(config, marca, chamadas, cookies, page)
+        cursor = {'start_time': chamadas[-1][2], 'call_id': chamadas[-1][0]}
+        if len(chamadas) < TAMANHO_PAGINA_CHAMADAS:
+            break
+    print(f"{total} chamadas lidas na carteira {config['nome']} (incluindo a margem de releitura).")
+
+def baixar_carteiras_varredura_unica(configs=None, cookies=None, page=None):
+    """
+    Como baixar_carteira_incremental, mas para todas as carteiras com uma só
+    consulta paginada (SQL_TODAS_CARTEIRAS): cada página é dividida entre as
+    carteiras por classificar_fila, e cada carteira só recebe as chamadas a
+    partir da própria marca d'água (menos a margem de releitura).
+    """
+    configs = configs or CONFIG_CARTEIRAS
+    marcas = {config['nome']: _preparar_carteira(config, cookies, page) for config in configs}
+    inicios = {nome: _inicio_leitura(marca) for nome, marca in marcas.items()}
+    cursor = {'start_time': min(inicios.values()), 'call_id': ''}
+    totais = {nome: 0 for nome in marcas}
+    while True:
+        chamadas = buscar_chamadas_do_banco(SQL_TODAS_CARTEIRAS, cursor)
+        if not chamadas:
+            break
+        por_carteira = {nome: [] for nome in marcas}
+        for chamada in chamadas:
+            for nome in classificar_fila(chamada[1]):
+                if nome in por_carteira and chamada[2] >= inicios[nome]:
+                    por_carteira[nome].append(chamada)
+        for config in configs:
+            selecionadas = por_carteira[config['nome']]
+            if selecionadas:
+                totais[config['nome']] += len(selecionadas)
+                _baixar_pagina(config, marcas[config['nome']], selecionadas, cookies, page)
+        cursor = {'start_time': chamadas[-1][2], 'call_id': chamadas[-1][0]}
+        if len(chamadas) < TAMANHO_PAGINA_CHAMADAS:
+            break
+    for nome, total in totais.items():
+        print(f"{total} chamadas lidas na carteira {nome} (incluindo a margem de releitura).")
 
 if __name__ == '__main__':
-    # Para cada carteira, busca os call_ids e baixa os áudios na pasta específica
-    for config in CONFIG_CARTEIRAS:
-        print(f"\nProcessando carteira: {config['nome']}")
-        call_ids = buscar_call_ids_do_banco(config['sql_query'])
-        if not call_ids:
-            print(f"Nenhum call_id encontrado para a carteira {config['nome']}.")
+    if '--comparar-consultas' in sys.argv:
+        comparar_tempo_consultas()
+        sys.exit(0)
+    # O login é feito uma única vez para todas as carteiras: no modo HTTP os
+    # cookies da sessão são exportados; no Playwright a mesma página é reutilizada
+    with ExitStack() as pilha:
+        cookies = page = None
+        if MODO_DOWNLOAD == 'http':
+            cookies = obter_cookies_sessao()
+        else:
+            page = pilha.enter_context(sessao_playwright())
+        if VARREDURA_UNICA:
+            baixar_carteiras_varredura_unica(cookies=cookies, page=page)
         else:
-            baixar_audios_com_playwright(call_ids, config['pasta_destino'])
\ No newline at end of file
+            # Para cada carteira, busca as chamadas novas e baixa os áudios na pasta específica
+            for config in CONFIG_CARTEIRAS:
+                print(f"\nProcessando carteira: {config['nome']}")
+                try:
+                    baixar_carteira_incremental(config, cookies=cookies, page=page)
+                except Exception as e:
+                    # A marca d'água fica na última página concluída; a próxima execução continua dali
+                    print(f"Erro ao processar a carteira {config['nome']}: {e}")
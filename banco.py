@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+
+from mysql.connector import pooling
+from mysql.connector import Error as MySQLError
+from mysql.connector.errors import PoolError
+
+# Configuração do banco de dados (compartilhada por pipeline, downloader e dashboard)
+DB_CONFIG = {
+    'host': '10.100.10.57',
+    'port': 3306,
+    'user': 'user_automacao',
+    'password': 'G5T82ZWMr',
+    'database': 'vonix',
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci',
+}
+
+# Tamanho do pool (limite do mysql-connector: 32) e tempo máximo de espera
+# por uma conexão livre quando todas estão em uso
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# connection_id muda a cada reconexão: só os ids mais recentes ficam nas estatísticas
+MAX_CONEXOES_ESTATISTICAS = 4 * DB_POOL_SIZE
+
+_POOL = None
+_LOCK_POOL = threading.Lock()
+_LOCK_ESTATISTICAS = threading.Lock()
+_ESTATISTICAS = {
+    'emprestimos': 0,
+    'esperas': 0,
+    'falhas_health_check': 0,
+    'reuso_por_conexao': {},
+}
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        with _LOCK_POOL:
+            if _POOL is None:
+                _POOL = pooling.MySQLConnectionPool(
+                    pool_name='monitoria',
+                    pool_size=DB_POOL_SIZE,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+                print(f"Pool de conexões MySQL criado com {DB_POOL_SIZE} conexões.")
+    return _POOL
+
+
+def _registrar_emprestimo(conn):
+    with _LOCK_ESTATISTICAS:
+        _ESTATISTICAS['emprestimos'] += 1
+        reuso = _ESTATISTICAS['reuso_por_conexao']
+        chave = getattr(conn, 'connection_id', None)
+        if chave not in reuso and len(reuso) >= MAX_CONEXOES_ESTATISTICAS:
+            del reuso[next(iter(reuso))]  # A mais antiga (provavelmente já reconectada)
+        reuso[chave] = reuso.get(chave, 0) + 1
+
+
+def get_connection():
+    """
+    Empresta uma conexão do pool compartilhado. `conn.close()` devolve a
+    conexão ao pool em vez de encerrá-la.
+
+    Antes de entregar, a conexão passa por um ping (com reconexão); se nem a
+    reconexão funcionar, o banco está fora e o erro é propagado. Se o pool
+    estiver esgotado, aguarda até DB_POOL_TIMEOUT segundos por uma livre.
+    """
+    pool = _get_pool()
+    limite = time.monotonic() + DB_POOL_TIMEOUT
+    esperou = False
+    while True:
+        try:
+            conn = pool.get_connection()
+        except PoolError:
+            if time.monotonic() >= limite:
+                raise
+            if not esperou:
+                esperou = True
+                with _LOCK_ESTATISTICAS:
+                    _ESTATISTICAS['esperas'] += 1
+            time.sleep(0.05)
+            continue
+
+        try:
+            conn.ping(reconnect=True, attempts=2, delay=0)
+        except MySQLError as e:
+            with _LOCK_ESTATISTICAS:
+                _ESTATISTICAS['falhas_health_check'] += 1
+            print(f"Conexão do pool falhou no health check: {e}")
+            conn.close()
+            raise
+
+        _registrar_emprestimo(conn)
+        return conn
+
+
+def estatisticas_pool() -> dict:
+    """
+    Retorna contadores de uso do pool e quantas vezes cada conexão foi
+    reutilizada (só as MAX_CONEXOES_ESTATISTICAS conexões mais recentes).
+    """
+    with _LOCK_ESTATISTICAS:
+        return {
+            'tamanho_pool': DB_POOL_SIZE,
+            'emprestimos': _ESTATISTICAS['emprestimos'],
+            'esperas': _ESTATISTICAS['esperas'],
+            'falhas_health_check': _ESTATISTICAS['falhas_health_check'],
+            'reuso_por_conexao': dict(_ESTATISTICAS['reuso_por_conexao']),
+        }
@@ -0,0 +1,116 @@
+"""
+Substituto local da Batch API da OpenAI, para testar o modo de avaliação em
+lote (process_transcription_folder_batch) sem rede e sem custo.
+
+Implementa apenas o que o pipeline usa: client.files.create/content e
+client.batches.create/retrieve. Cada requisição do JSONL é respondida pela
+função `responder(body) -> str`, que recebe o corpo do chat.completions e
+retorna o conteúdo da mensagem do assistente (ou levanta exceção para simular
+um erro naquela requisição).
+
+Exemplo:
+    cliente = ClienteBatchLocal(lambda body: '{"itens": {}}')
+    process_transcription_folder_batch(pasta, prompt, client=cliente, intervalo_polling=0)
+"""
+import itertools
+import json
+import time
+from types import SimpleNamespace
+
+
+class _ArquivosLocais:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def create(self, file, purpose):
+        conteudo = file.read()
+        if isinstance(conteudo, bytes):
+            conteudo = conteudo.decode('utf-8')
+        return self._cliente._novo_arquivo(conteudo, purpose)
+
+    def content(self, file_id):
+        return SimpleNamespace(text=self._cliente._arquivos[file_id])
+
+
+class _LotesLocais:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def create(self, input_file_id, endpoint, completion_window, **kwargs):
+        lote_id = f"batch_local_{next(self._cliente._contador)}"
+        self._cliente._lotes[lote_id] = {
+            'id': lote_id,
+            'status': 'validating',
+            'input_file_id': input_file_id,
+            'endpoint': endpoint,
+            'output_file_id': None,
+            'error_file_id': None,
+        }
+        return SimpleNamespace(**self._cliente._lotes[lote_id])
+
+    def retrieve(self, batch_id):
+        lote = self._cliente._lotes[batch_id]
+        # Avança um estado por consulta, como um lote real sendo processado
+        if lote['status'] == 'validating':
+            lote['status'] = 'in_progress'
+        elif lote['status'] == 'in_progress':
+            self._cliente._processar(lote)
+        return SimpleNamespace(**lote)
+
+
+class ClienteBatchLocal:
+    def __init__(self, responder, modelo='modelo-local'):
+        self.responder = responder
+        self.modelo = modelo
+        self.files = _ArquivosLocais(self)
+        self.batches = _LotesLocais(self)
+        self._arquivos = {}
+        self._lotes = {}
+        self._contador = itertools.count(1)
+
+    def _novo_arquivo(self, conteudo, purpose):
+        file_id = f"file_local_{next(self._contador)}"
+        self._arquivos[file_id] = conteudo
+        return SimpleNamespace(id=file_id, purpose=purpose, bytes=len(conteudo.encode('utf-8')))
+
+    def _processar(self, lote):
+        saidas, erros = [], []
+        for linha in self._arquivos[lote['input_file_id']].splitlines():
+            if not linha.strip():
+                continue
+            requisicao = json.loads(linha)
+            try:
+                conteudo = self.responder(requisicao['body'])
+            except Exception as e:
+                erros.append({
+                    'id': f"req_{next(self._contador)}",
+                    'custom_id': requisicao['custom_id'],
+                    'response': None,
+                    'error': {'code': 'erro_local', 'message': str(e)},
+                })
+                continue
+            saidas.append({
+                'id': f"req_{next(self._contador)}",
+                'custom_id': requisicao['custom_id'],
+                'response': {
+                    'status_code': 200,
+                    'body': {
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': requisicao['body'].get('model', self.modelo),
+                        'choices': [{
+                            'index': 0,
+                            'message': {'role': 'assistant', 'content': conteudo},
+                            'finish_reason': 'stop',
+                        }],
+                    },
+                },
+                'error': None,
+            })
+        if saidas:
+            lote['output_file_id'] = self._novo_arquivo(
+                '\n'.join(json.dumps(s, ensure_ascii=False) for s in saidas), 'batch_output').id
+        if erros:
+            lote['error_file_id'] = self._novo_arquivo(
+                '\n'.join(json.dumps(e, ensure_ascii=False) for e in erros), 'batch_output').id
+        lote['status'] = 'completed'
@@ -0,0 +1,368 @@
+"""
+Micro-benchmarks das otimizações do pipeline de monitoria.
+
+Uso:
+    python benchmarks.py            # roda todos
+    python benchmarks.py correcoes  # roda apenas o benchmark indicado
+
+Os benchmarks usam dados sintéticos e não acessam banco nem API (o de
+downloads usa o servidor local de gravacoes_local).
+"""
+import contextlib
+import io
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from correcoes import CorretorTranscricao, carregar_correcoes
+from diarizacao import FALANTE_DESCONHECIDO, assign_speakers_to_segments
+
+PALAVRAS_FILLER = (
+    'bom dia senhor tudo bem com o senhor estou ligando referente ao débito '
+    'em aberto o valor atualizado fica em reais com desconto para pagamento '
+    'até amanhã às dezoito horas posso enviar o boleto no whatsapp'
+).split()
+
+
+def _cronometrar(func, *args, repeticoes=5):
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+# ─── CORREÇÃO DE TERMOS ────────────────────────────────────────────────────────
+def _cadeia_legada(correcoes):
+    """
+    Reproduz a cadeia antiga: um re.sub por variação, termo a termo
+    (tests/test_correcoes.py confere que equivale às funções originais).
+    """
+    def corrigir(texto):
+        for correto, variantes in correcoes.items():
+            for padrao in variantes:
+                texto = re.sub(padrao, correto, texto, flags=re.IGNORECASE)
+        return texto
+    return corrigir
+
+
+def _gerar_transcricao(correcoes, n_palavras, seed=42):
+    rng = random.Random(seed)
+    variantes = [v for lista in correcoes.values() for v in lista]
+    palavras = []
+    while len(palavras) < n_palavras:
+        palavras.extend(rng.choices(PALAVRAS_FILLER, k=rng.randint(15, 40)))
+        # Às vezes duas variações coladas ("cartão vuan card"), que se sobrepõem
+        for variante in rng.sample(variantes, 2 if rng.random() < 0.2 else 1):
+            palavras.append(variante.upper() if rng.random() < 0.3 else variante)
+    return ' '.join(palavras)
+
+
+def benchmark_correcoes():
+    correcoes = carregar_correcoes()
+    legado = _cadeia_legada(correcoes)
+    corretor = CorretorTranscricao(correcoes)
+
+    print('\n=== Correção de termos: cadeia de re.sub x só as variações presentes ===')
+    for n_palavras in (1_000, 10_000, 50_000):
+        texto = _gerar_transcricao(correcoes, n_palavras)
+        t_legado, saida_legado = _cronometrar(legado, texto)
+        t_novo, saida_nova = _cronometrar(corretor.corrigir, texto)
+        status = 'OK' if saida_legado == saida_nova else 'DIVERGENTE'
+        print(f"{n_palavras:>7} palavras: legado {t_legado * 1000:8.2f} ms | "
+              f"corretor {t_novo * 1000:8.2f} ms | {t_legado / t_novo:5.1f}x | saída {status}")
+
+
+# ─── ATRIBUIÇÃO DE FALANTES ────────────────────────────────────────────────────
+class _Trecho:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class _DiarizacaoSintetica:
+    """Imita pyannote.core.Annotation.itertracks para os benchmarks."""
+
+    def __init__(self, trechos):
+        self.trechos = trechos
+
+    def itertracks(self, yield_label=False):
+        for i, (start, end, speaker) in enumerate(self.trechos):
+            yield _Trecho(start, end), i, speaker
+
+
+def _gerar_ligacao(duracao_seg, seed=7):
+    rng = random.Random(seed)
+    trechos, t = [], 0.0
+    while t < duracao_seg:
+        fim = t + rng.uniform(0.5, 8.0)
+        trechos.append((round(t, 3), round(fim, 3), rng.choice(['SPEAKER_00', 'SPEAKER_01'])))
+        t = fim + rng.uniform(-0.3, 1.5)  # sobreposições e silêncios
+    segmentos, t = [], 0.0
+    while t < duracao_seg:
+        fim = t + rng.uniform(1.0, 6.0)
+        segmentos.append({'start': round(t, 3), 'end': round(fim, 3), 'text': ''})
+        t = fim + rng.uniform(0.0, 2.0)
+    return segmentos, _DiarizacaoSintetica(trechos)
+
+
+def _atribuicao_legada(segmentos, diarizacao):
+    """Comparação de todos contra todos, como o antigo assign_speaker_to_segment."""
+    resultado = []
+    for segment in segmentos:
+        max_overlap = 0.0
+        speaker_assigned = FALANTE_DESCONHECIDO
+        for d_segment, _, speaker in diarizacao.itertracks(yield_label=True):
+            overlap = max(0, min(segment['end'], d_segment.end) - max(segment['start'], d_segment.start))
+            if overlap > max_overlap:
+                max_overlap = overlap
+                speaker_assigned = speaker
+        resultado.append(speaker_assigned)
+    return resultado
+
+
+def benchmark_falantes():
+    print('\n=== Atribuição de falantes: todos contra todos x varredura ordenada ===')
+    for minutos in (5, 30, 60):
+        segmentos, diarizacao = _gerar_ligacao(minutos * 60)
+        t_legado, saida_legado = _cronometrar(_atribuicao_legada, segmentos, diarizacao, repeticoes=3)
+        t_novo, saida_nova = _cronometrar(assign_speakers_to_segments, segmentos, diarizacao, repeticoes=3)
+        status = 'OK' if saida_legado == saida_nova else 'DIVERGENTE'
+        print(f"{minutos:>3} min ({len(segmentos)} segmentos, {len(diarizacao.trechos)} trechos): "
+              f"legado {t_legado * 1000:8.2f} ms | varredura {t_novo * 1000:6.2f} ms | "
+              f"{t_legado / t_novo:6.1f}x | saída {status}")
+
+
+# ─── TEMPO DE IMPORTAÇÃO ───────────────────────────────────────────────────────
+def benchmark_importacao():
+    print('\n=== Tempo de importação de transcrever_audios ===')
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    codigo = (
+        'import time; inicio = time.perf_counter(); import transcrever_audios; '
+        'print(time.perf_counter() - inicio)'
+    )
+    # Sem OPENAI_API_KEY, para confirmar que a importação não exige a chave
+    env = {k: v for k, v in os.environ.items() if k != 'OPENAI_API_KEY'}
+    tempos = []
+    for _ in range(3):
+        proc = subprocess.run([sys.executable, '-c', codigo], cwd=pasta, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"Falha ao importar: {proc.stderr.strip().splitlines()[-1]}")
+            return
+        *saida, tempo = proc.stdout.strip().splitlines()
+        if saida:
+            print(f"Saída inesperada na importação: {saida}")
+        tempos.append(float(tempo))
+    print(f"import transcrever_audios: {min(tempos) * 1000:.1f} ms (melhor de 3, processo novo)")
+
+
+# ─── DOWNLOAD DE GRAVAÇÕES ─────────────────────────────────────────────────────
+def benchmark_downloads():
+    from baixar_audios_playwright import baixar_audios_http
+    from gravacoes_local import ServidorGravacoesLocal
+
+    print('\n=== Download de gravações: sequencial x paralelo (servidor local, 50 ms por arquivo) ===')
+    gravacoes = {str(i): (f"20250730_1000{i:02d}_Agente_1_Fila_aguas.mp3", os.urandom(256 * 1024)) for i in range(60)}
+    with ServidorGravacoesLocal(gravacoes, latencia=0.05) as servidor:
+        for concorrencia in (1, 4, 8, 16):
+            conexoes_antes = servidor.conexoes
+            with tempfile.TemporaryDirectory() as pasta, contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                baixados = baixar_audios_http(list(gravacoes), pasta, cookies=servidor.cookies,
+                                              url_download=servidor.url_download, max_concorrencia=concorrencia)
+                duracao = time.perf_counter() - inicio
+            print(f"{concorrencia:>3} simultâneos: {duracao:6.2f} s | {len(baixados)} arquivos | "
+                  f"{servidor.conexoes - conexoes_antes} conexões TCP")
+
+
+# ─── SELEÇÃO DE CHAMADAS ───────────────────────────────────────────────────────
+class _CursorSQLite:
+    """
+    Adapta o cursor do sqlite3 aos parâmetros %s e ao dictionary=True do
+    mysql-connector. `latencia` simula o tempo de ida e volta de cada consulta.
+    """
+
+    def __init__(self, conn, dicionario=False, latencia=0.0):
+        self._cursor = conn.cursor()
+        self._dicionario = dicionario
+        self._latencia = latencia
+
+    def execute(self, sql, parametros=()):
+        if self._latencia:
+            time.sleep(self._latencia)
+        self._cursor.execute(sql.replace('%s', '?').replace('%%', '%'), parametros)
+
+    def _linha(self, linha):
+        if linha is None or not self._dicionario:
+            return linha
+        return {coluna[0]: valor for coluna, valor in zip(self._cursor.description, linha)}
+
+    def fetchone(self):
+        return self._linha(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._linha(linha) for linha in self._cursor.fetchall()]
+
+    def fetchmany(self, n):
+        return [self._linha(linha) for linha in self._cursor.fetchmany(n)]
+
+    def close(self):
+        self._cursor.close()
+
+
+class _ConexaoSQLite:
+    def __init__(self, conn, latencia=0.0):
+        self._conn = conn
+        self._latencia = latencia
+
+    def cursor(self, buffered=None, dictionary=False):
+        return _CursorSQLite(self._conn, dictionary, self._latencia)
+
+    def close(self):
+        pass
+
+
+def benchmark_consultas():
+    import sqlite3
+    from baixar_audios_playwright import comparar_tempo_consultas
+
+    print('\n=== Seleção de chamadas: uma consulta por carteira x varredura única (SQLite) ===')
+    rng = random.Random(3)
+    filas = ['fila_aguas_cobranca', 'aguasguariroba_receptivo', 'vuon_cartao', 'unimed_mensalidade',
+             'suporte_interno', 'cobranca_geral', 'retencao', 'ouvidoria']
+    conn = sqlite3.connect(':memory:')
+    conn.execute("ATTACH ':memory:' AS vonix")
+    conn.execute('CREATE TABLE vonix.calls (call_id TEXT, queue_id TEXT, start_time TEXT, answer_time TEXT, '
+                 'hangup_time TEXT, call_secs INTEGER, status TEXT)')
+    conn.execute('CREATE INDEX vonix.idx_calls_start ON calls (start_time, call_id)')
+    inicio = time.mktime((2025, 7, 30, 0, 0, 0, 0, 0, -1))
+    linhas = []
+    for i in range(200_000):
+        instante = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(inicio + i * 15))
+        linhas.append((f"{1753840000 + i}.{i}", rng.choice(filas), instante, None, None,
+                       rng.randint(5, 900), rng.choice(['Completada', 'Completada', 'Abandonada'])))
+    conn.executemany('INSERT INTO vonix.calls VALUES (?, ?, ?, ?, ?, ?, ?)', linhas)
+    conn.commit()
+    comparar_tempo_consultas(conn=_ConexaoSQLite(conn))
+
+
+def _banco_avaliacoes(n_avaliacoes, n_agentes=40, seed=5):
+    """Banco SQLite em memória com avaliacoes/itens_avaliados sintéticos de agosto de 2025."""
+    import sqlite3
+
+    rng = random.Random(seed)
+    categorias = ['Abordagem', 'Identificação', 'Sondagem', 'Negociação', 'Script',
+                  'Cordialidade', 'Tom de voz', 'Encerramento']
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE agents (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE avaliacoes (id INTEGER PRIMARY KEY, call_id TEXT, agent_id INTEGER, data_ligacao TEXT,
+                                 status_avaliacao TEXT, pontuacao REAL, carteira TEXT);
+        CREATE INDEX idx_avaliacoes_agente ON avaliacoes (agent_id, carteira, data_ligacao);
+        CREATE TABLE itens_avaliados (id INTEGER PRIMARY KEY, avaliacao_id INTEGER, categoria TEXT,
+                                      descricao TEXT, resultado TEXT);
+        CREATE INDEX idx_itens_avaliacao ON itens_avaliados (avaliacao_id);
+    """)
+    conn.executemany('INSERT INTO agents VALUES (?, ?)', [(a, f'Agente {a}') for a in range(1, n_agentes + 1)])
+    avaliacoes, itens = [], []
+    for i in range(1, n_avaliacoes + 1):
+        pontuacao = round(rng.uniform(40, 100), 2)
+        data = f"2025-08-{rng.randint(1, 31):02d} {rng.randint(8, 19):02d}:{rng.randint(0, 59):02d}:00"
+        avaliacoes.append((i, str(i), rng.randint(1, n_agentes), data,
+                           'APROVADA' if pontuacao >= 70 else 'REPROVADA', pontuacao,
+                           rng.choice(['AGUAS', 'VUON', 'UNIMED'])))
+        itens.extend((i, categoria, f'Observação sobre {categoria.lower()}',
+                      rng.choice(['CONFORME', 'CONFORME', 'NAO CONFORME', 'N/A'])) for categoria in categorias)
+    conn.executemany('INSERT INTO avaliacoes VALUES (?, ?, ?, ?, ?, ?, ?)', avaliacoes)
+    conn.executemany('INSERT INTO itens_avaliados (avaliacao_id, categoria, descricao, resultado) '
+                     'VALUES (?, ?, ?, ?)', itens)
+    conn.commit()
+    return conn
+
+
+def _arredondar(valor):
+    if isinstance(valor, float):
+        return round(valor, 6)
+    if isinstance(valor, dict):
+        return {chave: _arredondar(v) for chave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_arredondar(v) for v in valor]
+    return valor
+
+
+def benchmark_detalhes():
+    from app_dashboard import _detalhes_consulta_unica, _detalhes_consultas_separadas
+
+    print('\n=== Detalhes do agente: quatro consultas x consulta única (SQLite, 60 mil avaliações) ===')
+    banco = _banco_avaliacoes(60_000)
+    parametros = ('2025-08-01', '2025-09-01', 'AGUAS', None)
+    for latencia in (0.0, 0.001):
+        conexao = _ConexaoSQLite(banco, latencia)
+
+        def consultar(funcao):
+            cursor = conexao.cursor(dictionary=True)
+            return [funcao(cursor, agente, *parametros) for agente in range(1, 41)]
+
+        t_separadas, separadas = _cronometrar(consultar, _detalhes_consultas_separadas, repeticoes=3)
+        t_unica, unica = _cronometrar(consultar, _detalhes_consulta_unica, repeticoes=3)
+        # A consulta única ordena o radar por categoria; a separada não garante ordem
+        for resposta in separadas:
+            resposta['radar'].sort(key=lambda r: r['categoria'])
+        iguais = _arredondar(separadas) == _arredondar(unica)
+        print(f"ida e volta de {latencia * 1000:.0f} ms: quatro consultas {t_separadas / 40 * 1000:6.2f} ms | "
+              f"consulta única {t_unica / 40 * 1000:6.2f} ms por agente "
+              f"({t_separadas / t_unica:.1f}x) | {'mesmas respostas' if iguais else 'RESPOSTAS DIFERENTES'}")
+
+
+def benchmark_detalhes_em_lote():
+    import app_dashboard
+    import rollups
+
+    print('\n=== Detalhes de todos os agentes: /api/agentes + N x /detalhes x /api/agentes/detalhes (SQLite) ===')
+    banco = _banco_avaliacoes(60_000)
+    # SQLite não tem information_schema: o dashboard consulta as tabelas brutas
+    rollups._DISPONIVEIS.update(valor=False, verificado_em=float('inf'))
+    app_dashboard.INTERVALO_VERSAO_CACHE = float('inf')
+    cliente = app_dashboard.app.test_client()
+    filtro = 'inicio=2025-08-01&fim=2025-09-01&carteira=AGUAS'
+    for latencia in (0.0, 0.001):
+        app_dashboard.get_db = lambda: _ConexaoSQLite(banco, latencia)
+
+        def por_agente():
+            app_dashboard.CACHE_RESPOSTAS.invalidar()
+            agentes = cliente.get(f'/api/agentes?{filtro}').get_json()
+            return {str(a['agent_id']): cliente.get(f"/api/agente/{a['agent_id']}/detalhes?{filtro}").get_json()
+                    for a in agentes}
+
+        def em_lote():
+            app_dashboard.CACHE_RESPOSTAS.invalidar()
+            return cliente.get(f'/api/agentes/detalhes?{filtro}').get_json()
+
+        t_por_agente, individuais = _cronometrar(por_agente, repeticoes=3)
+        t_lote, lote = _cronometrar(em_lote, repeticoes=3)
+        print(f"ida e volta de {latencia * 1000:.0f} ms: {len(individuais) + 1} requisições {t_por_agente * 1000:7.1f} ms | "
+              f"uma requisição {t_lote * 1000:7.1f} ms ({t_por_agente / t_lote:.1f}x) | "
+              f"{'mesmas respostas' if individuais == lote else 'RESPOSTAS DIFERENTES'}")
+
+
+BENCHMARKS = {
+    'correcoes': benchmark_correcoes,
+    'falantes': benchmark_falantes,
+    'importacao': benchmark_importacao,
+    'downloads': benchmark_downloads,
+    'consultas': benchmark_consultas,
+    'detalhes': benchmark_detalhes,
+    'detalhes_em_lote': benchmark_detalhes_em_lote,
+}
+
+if __name__ == '__main__':
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        BENCHMARKS[nome]()
@@ -0,0 +1,215 @@
+"""
+Busca textual nas transcrições.
+
+transcricoes.conteudo é gravado compactado (transcricoes_compactadas), então o
+texto pesquisável fica numa tabela própria com índice FULLTEXT, junto dos
+campos usados nos filtros:
+
+    busca_transcricoes (avaliacao_id) -> carteira, agent_id, data_ligacao, texto
+
+A linha é gravada na mesma transação que grava cada avaliação
+(indexar_transcricao). Para criar a tabela e indexar o histórico:
+
+    python busca_transcricoes.py reconstruir
+    python busca_transcricoes.py reconstruir --carteira AGUAS --lote 200
+
+Sintaxe das buscas (buscar_transcricoes): palavras e "frases entre aspas"
+precisam aparecer todas; termos com '-' na frente não podem aparecer, por
+exemplo: acordo "Portes Advogados" -boleto. Só com termos negativos a busca
+lista as ligações do filtro em que nenhum deles foi dito.
+"""
+import argparse
+import re
+import time
+
+from banco import get_connection
+from transcricoes_compactadas import descompactar_transcricao
+
+SQL_CRIAR_BUSCA = """
+CREATE TABLE IF NOT EXISTS busca_transcricoes (
+    avaliacao_id INT NOT NULL PRIMARY KEY,
+    carteira VARCHAR(50) NOT NULL,
+    agent_id INT NULL,
+    data_ligacao DATETIME NOT NULL,
+    texto MEDIUMTEXT NOT NULL,
+    KEY idx_busca_carteira_data (carteira, data_ligacao),
+    KEY idx_busca_agente_data (agent_id, data_ligacao),
+    FULLTEXT KEY ft_busca_texto (texto)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+TAMANHO_TRECHO = 300
+TAMANHO_LOTE_RECONSTRUCAO = 500
+# innodb_ft_min_token_size padrão: palavras menores não são indexadas, e exigi-las
+# com '+' esvaziaria o resultado
+TAMANHO_MINIMO_PALAVRA = 3
+
+# Mesma política de rollups.py: nas buscas, a ausência da tabela é verificada
+# de novo após este intervalo; na indexação ela nunca fica em cache, para não
+# perder as transcrições gravadas logo depois da reconstrução
+INTERVALO_VERIFICACAO_TABELA = 300
+_DISPONIVEL = {'valor': None, 'verificado_em': 0.0}
+
+# "frase entre aspas" ou palavra, com '-' opcional na frente
+_TERMO = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+# Caracteres com significado no modo booleano do MATCH ... AGAINST
+_OPERADORES = re.compile(r'[+\-<>()~*"@]+')
+
+
+def busca_disponivel(cursor, gravacao=False) -> bool:
+    """
+    Indica se a tabela de busca existe (resultado em cache). Com `gravacao`,
+    só a presença da tabela vem do cache; a ausência é sempre consultada de novo.
+    """
+    agora = time.monotonic()
+    if _DISPONIVEL['valor'] or (_DISPONIVEL['valor'] is False and not gravacao
+                                 and agora - _DISPONIVEL['verificado_em'] < INTERVALO_VERIFICACAO_TABELA):
+        return _DISPONIVEL['valor']
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'busca_transcricoes'
+    """)
+    linha = cursor.fetchone()
+    quantidade = linha[0] if not isinstance(linha, dict) else next(iter(linha.values()))
+    _DISPONIVEL['valor'] = quantidade == 1
+    _DISPONIVEL['verificado_em'] = agora
+    return _DISPONIVEL['valor']
+
+
+def indexar_transcricao(cursor, avaliacao_id, carteira, agent_id, data_ligacao, texto):
+    """Grava (ou substitui) o texto pesquisável da avaliação, sem commit."""
+    if not texto or not busca_disponivel(cursor, gravacao=True):
+        return
+    cursor.execute("""
+        INSERT INTO busca_transcricoes (avaliacao_id, carteira, agent_id, data_ligacao, texto)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE carteira = VALUES(carteira), agent_id = VALUES(agent_id),
+            data_ligacao = VALUES(data_ligacao), texto = VALUES(texto)
+    """, (avaliacao_id, carteira, agent_id, data_ligacao, texto))
+
+
+def separar_termos(consulta):
+    """
+    Retorna (positivos, negativos): termos e frases da consulta, sem
+    operadores. Palavras soltas com menos de TAMANHO_MINIMO_PALAVRA letras são
+    ignoradas.
+    """
+    positivos, negativos = [], []
+    for m in _TERMO.finditer(consulta or ''):
+        negado = bool(m.group(1) or m.group(3))
+        termo = m.group(2) if m.group(2) is not None else m.group(4)
+        termo = ' '.join(_OPERADORES.sub(' ', termo).split())
+        if m.group(4) is not None and len(termo) < TAMANHO_MINIMO_PALAVRA:
+            continue
+        if termo:
+            (negativos if negado else positivos).append(termo)
+    return positivos, negativos
+
+
+def _expressao_booleana(termos, operador=''):
+    # Termos com pontuação ("1.500,00", "e-mail") viram frase, como o parser os divide
+    return ' '.join(operador + (f'"{t}"' if re.search(r'\W', t) else t) for t in termos)
+
+
+def buscar_transcricoes(cursor, consulta, carteira, agent_id=None, inicio=None, fim=None, limite=LIMITE_PADRAO):
+    """
+    Retorna as avaliações da carteira cujas transcrições atendem à consulta,
+    das mais relevantes para as menos (e, no empate, das mais recentes), com
+    um trecho do texto em volta do primeiro termo buscado.
+    """
+    positivos, negativos = separar_termos(consulta)
+    if not positivos and not negativos:
+        return []
+    filtros = ["b.carteira = %s"]
+    parametros_filtro = [carteira]
+    for condicao, valor in (("b.agent_id = %s", agent_id), ("b.data_ligacao >= %s", inicio),
+                            ("b.data_ligacao < %s", fim)):
+        if valor is not None:
+            filtros.append(condicao)
+            parametros_filtro.append(valor)
+
+    if positivos:
+        expressao = _expressao_booleana(positivos, '+') + ' ' + _expressao_booleana(negativos, '-')
+        colunas = f"""MATCH(b.texto) AGAINST (%s IN BOOLEAN MODE) as relevancia,
+            SUBSTRING(b.texto, GREATEST(LOCATE(%s, b.texto) - {TAMANHO_TRECHO // 3}, 1), {TAMANHO_TRECHO}) as trecho"""
+        parametros_colunas = [expressao, positivos[0]]
+        filtros.insert(0, "MATCH(b.texto) AGAINST (%s IN BOOLEAN MODE)")
+        parametros_filtro.insert(0, expressao)
+    else:
+        # Só termos negativos: não há o que ranquear, percorre o filtro por data
+        colunas = f"0 as relevancia, SUBSTRING(b.texto, 1, {TAMANHO_TRECHO}) as trecho"
+        parametros_colunas = []
+        filtros.insert(0, "NOT MATCH(b.texto) AGAINST (%s IN BOOLEAN MODE)")
+        parametros_filtro.insert(0, _expressao_booleana(negativos))
+
+    cursor.execute(f"""
+        SELECT b.avaliacao_id, b.carteira, b.agent_id, ag.name, b.data_ligacao, {colunas}
+        FROM busca_transcricoes b
+        LEFT JOIN agents ag ON ag.id = b.agent_id
+        WHERE {' AND '.join(filtros)}
+        ORDER BY relevancia DESC, b.data_ligacao DESC
+        LIMIT %s
+    """, parametros_colunas + parametros_filtro + [max(1, min(limite, LIMITE_MAXIMO))])
+    return cursor.fetchall()
+
+
+def reconstruir_indice(carteira=None, tamanho_lote=TAMANHO_LOTE_RECONSTRUCAO):
+    """
+    Cria a tabela, se necessário, e (re)indexa as transcrições gravadas, em
+    lotes por avaliacao_id com um commit por lote; pode ser interrompido e
+    executado de novo.
+    """
+    filtro_carteira = " AND av.carteira = %s" if carteira else ""
+    conn = get_connection()
+    cursor = conn.cursor()
+    ultimo_id = 0
+    indexadas = 0
+    try:
+        cursor.execute(SQL_CRIAR_BUSCA)
+        while True:
+            cursor.execute(f"""
+                SELECT av.id, av.carteira, av.agent_id, av.data_ligacao, t.conteudo
+                FROM avaliacoes av
+                JOIN transcricoes t ON t.avaliacao_id = av.id
+                WHERE av.id > %s{filtro_carteira}
+                ORDER BY av.id
+                LIMIT %s
+            """, (ultimo_id,) + ((carteira,) if carteira else ()) + (tamanho_lote,))
+            linhas = cursor.fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+            valores = [(avaliacao_id, carteira_linha, agent_id, data_ligacao, descompactar_transcricao(conteudo))
+                       for avaliacao_id, carteira_linha, agent_id, data_ligacao, conteudo in linhas if conteudo]
+            if valores:
+                cursor.executemany("""
+                    INSERT INTO busca_transcricoes (avaliacao_id, carteira, agent_id, data_ligacao, texto)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE carteira = VALUES(carteira), agent_id = VALUES(agent_id),
+                        data_ligacao = VALUES(data_ligacao), texto = VALUES(texto)
+                """, valores)
+                indexadas += len(valores)
+            conn.commit()
+            print(f"Até avaliacao_id {ultimo_id}: {indexadas} transcrições indexadas.")
+        _DISPONIVEL['valor'] = True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"Índice de busca reconstruído{' para ' + carteira if carteira else ''}: {indexadas} transcrições.")
+    return indexadas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manutenção do índice de busca das transcrições.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    reconstruir = sub.add_parser('reconstruir', help='cria a tabela e indexa as transcrições gravadas')
+    reconstruir.add_argument('--carteira')
+    reconstruir.add_argument('--lote', type=int, default=TAMANHO_LOTE_RECONSTRUCAO, help='linhas por transação')
+    args = parser.parse_args()
+    if args.comando == 'reconstruir':
+        reconstruir_indice(args.carteira, args.lote)
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """
+    Cache em memória com limite de tamanho (LRU), validade por entrada (TTL)
+    e contadores de acertos/falhas. Seguro para uso entre threads.
+
+    Valores None também são guardados (cache negativo) e podem ter uma
+    validade própria, `ttl_negativo`, normalmente mais curta.
+    """
+
+    def __init__(self, tamanho_maximo: int = 1024, ttl: float = None, ttl_negativo: float = None):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self.ttl_negativo = ttl if ttl_negativo is None else ttl_negativo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def buscar(self, chave, padrao=_AUSENTE):
+        """
+        Retorna o valor guardado para `chave`. Se não houver valor válido,
+        retorna `padrao` (ou levanta KeyError quando `padrao` não é informado).
+        """
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None:
+                valor, expira_em = item
+                if expira_em is None or expira_em > time.monotonic():
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._dados[chave]
+            self.falhas += 1
+        if padrao is _AUSENTE:
+            raise KeyError(chave)
+        return padrao
+
+    def guardar(self, chave, valor):
+        ttl = self.ttl_negativo if valor is None else self.ttl
+        expira_em = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self.remocoes += 1
+
+    def invalidar(self, chave=None, filtro=None):
+        """Remove uma chave, as chaves em que `filtro(chave)` é verdadeiro ou, sem argumentos, tudo."""
+        with self._lock:
+            if chave is not None:
+                self._dados.pop(chave, None)
+            elif filtro is not None:
+                for k in [k for k in self._dados if filtro(k)]:
+                    del self._dados[k]
+            else:
+                self._dados.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'tamanho': len(self._dados),
+                'tamanho_maximo': self.tamanho_maximo,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'taxa_acerto': round(self.acertos / total, 4) if total else 0.0,
+            }
+
+
+class CacheDisco:
+    """
+    Cache persistente em disco: cada entrada é um arquivo JSON nomeado pelo
+    hash da chave (ou, com buscar_arquivo/guardar_arquivo, um arquivo
+    qualquer, como um áudio convertido). Entradas sem uso há mais de `idade_maxima` segundos são
+    ignoradas e removidas; quando o diretório passa de `tamanho_maximo_bytes`,
+    as entradas usadas há mais tempo são apagadas primeiro.
+    """
+
+    def __init__(self, diretorio: str, tamanho_maximo_bytes: int = None, idade_maxima: float = None):
+        self.diretorio = diretorio
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self.idade_maxima = idade_maxima
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._bytes_estimados = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    @staticmethod
+    def chave(*partes) -> str:
+        """Monta uma chave estável (sha256) a partir das partes informadas."""
+        h = hashlib.sha256()
+        for parte in partes:
+            h.update(str(parte).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _caminho(self, chave: str, extensao: str = '.json') -> str:
+        return os.path.join(self.diretorio, chave[:2], chave + extensao)
+
+    def buscar(self, chave: str, padrao=None):
+        caminho = self._caminho(chave)
+        try:
+            idade = time.time() - os.path.getmtime(caminho)
+            if self.idade_maxima is not None and idade > self.idade_maxima:
+                os.remove(caminho)
+                raise FileNotFoundError(caminho)
+            with open(caminho, 'r', encoding='utf-8') as f:
+                valor = json.load(f)['valor']
+            os.utime(caminho)  # Marca como usado recentemente
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.falhas += 1
+            return padrao
+        with self._lock:
+            self.acertos += 1
+        return valor
+
+    def guardar(self, chave: str, valor):
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'valor': valor, 'criado_em': time.time()}, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        self._contabilizar(caminho)
+
+    def _contabilizar(self, caminho: str):
+        if self.tamanho_maximo_bytes is not None:
+            with self._lock:
+                if self._bytes_estimados is None:
+                    self._bytes_estimados = sum(tamanho for _, tamanho, _ in self._entradas())
+                else:
+                    self._bytes_estimados += os.path.getsize(caminho)
+                excedeu = self._bytes_estimados > self.tamanho_maximo_bytes
+            # Só percorre o diretório quando a estimativa passa do limite
+            if excedeu:
+                self._aplicar_limite_tamanho()
+
+    def buscar_arquivo(self, chave: str, extensao: str):
+        """Retorna o caminho do arquivo guardado para `chave`, ou None."""
+        caminho = self._caminho(chave, extensao)
+        try:
+            idade = time.time() - os.path.getmtime(caminho)
+            if self.idade_maxima is not None and idade > self.idade_maxima:
+                os.remove(caminho)
+                raise FileNotFoundError(caminho)
+            os.utime(caminho)
+        except OSError:
+            with self._lock:
+                self.falhas += 1
+            return None
+        with self._lock:
+            self.acertos += 1
+        return caminho
+
+    def guardar_arquivo(self, chave: str, caminho_origem: str, extensao: str) -> str:
+        """Move `caminho_origem` para dentro do cache e retorna o novo caminho."""
+        caminho = self._caminho(chave, extensao)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.move(caminho_origem, temporario)
+        os.replace(temporario, caminho)
+        self._contabilizar(caminho)
+        return caminho
+
+    def remover(self, chave: str, extensao: str = '.json'):
+        try:
+            os.remove(self._caminho(chave, extensao))
+        except FileNotFoundError:
+            pass
+
+    def _entradas(self):
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if not nome.endswith('.tmp'):
+                    caminho = os.path.join(raiz, nome)
+                    try:
+                        info = os.stat(caminho)
+                    except FileNotFoundError:
+                        continue
+                    yield caminho, info.st_size, info.st_mtime
+
+    def _aplicar_limite_tamanho(self):
+        with self._lock:
+            entradas = sorted(self._entradas(), key=lambda e: e[2])
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            agora = time.time()
+            for caminho, tamanho, mtime in entradas:
+                expirada = self.idade_maxima is not None and agora - mtime > self.idade_maxima
+                if total <= self.tamanho_maximo_bytes and not expirada:
+                    break
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+                self.remocoes += 1
+            self._bytes_estimados = total
+
+    def estatisticas(self) -> dict:
+        entradas = list(self._entradas())
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'entradas': len(entradas),
+                'bytes': sum(tamanho for _, tamanho, _ in entradas),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'taxa_acerto': round(self.acertos / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+from pathlib import Path
+
+# Arquivo com as variações de transcrição por termo correto.
+# Novas variações podem ser adicionadas ao JSON sem alterar o código.
+ARQUIVO_CORRECOES = os.getenv(
+    'CORRECOES_TRANSCRICAO_PATH',
+    str(Path(__file__).parent / 'correcoes_transcricao.json')
+)
+
+
+def _regex_trie(chaves) -> str:
+    """
+    Monta uma regex em forma de árvore de prefixos a partir das variações,
+    para que o motor de regex teste cada posição do texto uma única vez.
+    """
+    trie = {}
+    for chave in chaves:
+        no = trie
+        for caractere in chave:
+            no = no.setdefault(caractere, {})
+        no[''] = {}
+
+    def montar(no):
+        alternativas = [re.escape(c) + montar(filho) for c, filho in sorted(no.items()) if c]
+        if not alternativas:
+            return ''
+        corpo = alternativas[0] if len(alternativas) == 1 else '(?:' + '|'.join(alternativas) + ')'
+        if '' in no:
+            return '(?:' + corpo + ')?'
+        return corpo
+
+    return montar(trie)
+
+
+class CorretorTranscricao:
+    """
+    Aplica as correções de termos com o mesmo resultado da cadeia antiga de
+    re.sub (um por variação, na ordem do arquivo, sem diferenciar maiúsculas
+    de minúsculas), sem percorrer o texto inteiro uma vez por variação.
+
+    Uma regex em árvore de prefixos encontra numa só varredura todas as
+    posições em que alguma variação começa, inclusive sobrepostas. A cadeia de re.sub roda só em janelas em volta desses
+    trechos, e em cada janela só com as variações presentes; como uma troca
+    pode criar ou desfazer ocorrências de outras variações ("cartão vuan
+    card"), a busca na janela é refeita após cada substituição que a altera.
+
+    As variações são literais, então o resultado de uma janela só difere do
+    da cadeia no texto inteiro se alguma troca chegar perto da borda; nesse
+    caso as janelas são alargadas e o trecho é refeito.
+    """
+
+    def __init__(self, correcoes: dict):
+        self.padroes = []
+        self.substitutos = []
+        for correto, variantes in correcoes.items():
+            for variante in variantes:
+                self.padroes.append(re.compile(re.escape(variante), re.IGNORECASE))
+                self.substitutos.append(correto)
+        # variação em minúsculas -> índices das variações iguais a ela (sem caixa)
+        self.indices_por_chave = {}
+        for indice, variante in enumerate(v for variantes in correcoes.values() for v in variantes):
+            self.indices_por_chave.setdefault(variante.lower(), []).append(indice)
+        self.regex = None
+        self.tamanho_maximo = 0
+        if self.padroes:
+            chaves = {variante.lower() for variantes in correcoes.values() for variante in variantes}
+            self.regex = re.compile(_regex_trie(chaves), re.IGNORECASE)
+            self.tamanho_maximo = max(len(chave) for chave in chaves)
+
+    def _ocorrencias(self, texto: str):
+        """
+        Gera cada posição em que alguma variação começa, inclusive sobrepostas,
+        com o trecho da variação mais longa que começa ali.
+        """
+        match = self.regex.search(texto)
+        while match:
+            yield match
+            match = self.regex.search(texto, match.start() + 1)
+
+    def _presentes(self, texto: str, a_partir: int) -> list:
+        """Índices (a partir de `a_partir`) das variações que ocorrem no texto, em ordem."""
+        presentes = set()
+        restantes = range(a_partir, len(self.padroes))
+        for match in self._ocorrencias(texto):
+            # As variações que começam aqui são prefixos da mais longa encontrada
+            chave = match.group().lower()
+            if len(chave) == len(match.group()) and chave in self.indices_por_chave:
+                for tamanho in range(1, len(chave) + 1):
+                    presentes.update(self.indices_por_chave.get(chave[:tamanho], ()))
+            else:
+                posicao = match.start()
+                presentes.update(i for i in restantes if self.padroes[i].match(texto, posicao))
+        return sorted(i for i in presentes if i >= a_partir)
+
+    def _corrigir_trecho(self, trecho: str, borda_inicio: bool, borda_fim: bool):
+        """
+        Aplica a cadeia ao trecho. Retorna None se alguma troca chegar a menos
+        de `tamanho_maximo` caracteres de uma borda marcada (o trecho precisa
+        de mais contexto).
+        """
+        pendentes = self._presentes(trecho, 0)
+        while pendentes:
+            indice = pendentes.pop(0)
+            proximo_borda = []
+
+            def trocar(match):
+                if ((borda_inicio and match.start() < self.tamanho_maximo)
+                        or (borda_fim and len(trecho) - match.end() < self.tamanho_maximo)):
+                    proximo_borda.append(match)
+                return self.substitutos[indice]
+
+            corrigido = self.padroes[indice].sub(trocar, trecho)
+            if proximo_borda:
+                return None
+            if corrigido != trecho:
+                trecho = corrigido
+                pendentes = self._presentes(trecho, indice + 1)
+        return trecho
+
+    def corrigir(self, texto: str) -> str:
+        if not texto or self.regex is None:
+            return texto
+        ocorrencias = [match.span() for match in self._ocorrencias(texto)]
+        if not ocorrencias:
+            return texto
+        folga = 2 * self.tamanho_maximo
+        while True:
+            # Janelas: ocorrências com `folga` de cada lado, unidas quando se encostam
+            janelas = []
+            for inicio, fim in ocorrencias:
+                inicio, fim = max(inicio - folga, 0), min(fim + folga, len(texto))
+                if janelas and inicio <= janelas[-1][1]:
+                    janelas[-1][1] = max(janelas[-1][1], fim)
+                else:
+                    janelas.append([inicio, fim])
+            partes = []
+            ultimo = 0
+            for inicio, fim in janelas:
+                corrigido = self._corrigir_trecho(texto[inicio:fim], inicio > 0, fim < len(texto))
+                if corrigido is None:
+                    break
+                partes.append(texto[ultimo:inicio])
+                partes.append(corrigido)
+                ultimo = fim
+            else:
+                partes.append(texto[ultimo:])
+                return ''.join(partes)
+            # Com o texto inteiro numa janela não há bordas, e a cadeia sempre termina
+            folga *= 4
+
+
+def carregar_correcoes(caminho: str = None) -> dict:
+    """Lê o arquivo JSON de correções ({termo correto: [variações]}, na ordem de aplicação)."""
+    with open(caminho or ARQUIVO_CORRECOES, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_CORRETORES = {}
+
+
+def obter_corretor(termo: str = None) -> CorretorTranscricao:
+    """
+    Retorna o corretor compilado (com todos os termos, ou só com `termo`).
+    A compilação acontece na primeira chamada e é reaproveitada depois.
+    """
+    if termo not in _CORRETORES:
+        correcoes = carregar_correcoes()
+        if termo is not None:
+            correcoes = {termo: correcoes.get(termo, [])}
+        _CORRETORES[termo] = CorretorTranscricao(correcoes)
+    return _CORRETORES[termo]
+
+
+def recarregar_correcoes():
+    """Descarta os corretores compilados para reler o arquivo de correções."""
+    _CORRETORES.clear()
+
+
+def corrigir_termos_transcricao(texto: str) -> str:
+    """
+    Corrige as variações de 'Portes Advogados', 'VUON CARD', 'Águas Guariroba'
+    e 'assessoria jurídica' (e qualquer termo do arquivo de correções).
+    """
+    return obter_corretor().corrigir(texto)
@@ -0,0 +1,97 @@
+import re
+
+FALANTE_DESCONHECIDO = "Desconhecido"
+
+
+def parse_vtt(vtt_text):
+    """
+    Analisa o texto VTT e retorna uma lista de segmentos.
+    Cada segmento é um dicionário com 'start', 'end' (em segundos) e 'text'.
+    """
+    segments = []
+    time_pattern = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) --> (\d{2}:\d{2}:\d{2}\.\d{3})')
+    lines = vtt_text.splitlines()
+    idx = 0
+    while idx < len(lines):
+        line = lines[idx].strip()
+        match = time_pattern.match(line)
+        if match:
+            start_str, end_str = match.groups()
+            start = sum(float(x) * 60 ** i for i, x in enumerate(reversed(start_str.split(":"))))
+            end = sum(float(x) * 60 ** i for i, x in enumerate(reversed(end_str.split(":"))))
+            text_lines = []
+            idx += 1
+            while idx < len(lines) and lines[idx].strip() != "":
+                text_lines.append(lines[idx].strip())
+                idx += 1
+            text = " ".join(text_lines)
+            segments.append({"start": start, "end": end, "text": text})
+        else:
+            idx += 1
+    return segments
+
+
+def assign_speaker_to_segment(segment, diarization):
+    """
+    Retorna o falante com maior sobreposição com o segmento (o primeiro em caso
+    de empate) ou 'Desconhecido' se nenhum trecho da diarização se sobrepõe.
+    """
+    return assign_speakers_to_segments([segment], diarization)[0]
+
+
+def assign_speakers_to_segments(segments, diarization):
+    """
+    Atribui um falante a cada segmento com uma varredura ordenada.
+
+    Segmentos e trechos da diarização são ordenados pelo início; os trechos
+    entram no conjunto ativo quando começam antes do fim do segmento e saem
+    quando terminam antes do seu início, então cada segmento só compara com
+    os trechos que realmente o cruzam. O resultado é o mesmo da comparação
+    de todos contra todos: maior sobreposição, empate resolvido pela ordem
+    de itertracks e 'Desconhecido' quando não há sobreposição.
+    """
+    tracks = sorted(
+        (d_segment.start, d_segment.end, ordem, speaker)
+        for ordem, (d_segment, _, speaker) in enumerate(diarization.itertracks(yield_label=True))
+    )
+    ordem_segmentos = sorted(range(len(segments)), key=lambda i: segments[i]["start"])
+    speakers = [FALANTE_DESCONHECIDO] * len(segments)
+
+    ativos = []
+    proximo = 0
+    for i in ordem_segmentos:
+        seg_start = segments[i]["start"]
+        seg_end = segments[i]["end"]
+        # Trechos que terminam antes deste segmento não cruzam nenhum dos próximos
+        ativos = [t for t in ativos if t[1] > seg_start]
+        while proximo < len(tracks) and tracks[proximo][0] < seg_end:
+            if tracks[proximo][1] > seg_start:
+                ativos.append(tracks[proximo])
+            proximo += 1
+
+        max_overlap = 0.0
+        melhor_ordem = None
+        for t_start, t_end, ordem, speaker in ativos:
+            overlap = max(0, min(seg_end, t_end) - max(seg_start, t_start))
+            if overlap > max_overlap or (overlap == max_overlap and overlap > 0 and ordem < melhor_ordem):
+                max_overlap = overlap
+                melhor_ordem = ordem
+                speakers[i] = speaker
+    return speakers
+
+
+def merge_transcript_and_diarization(vtt_text, diarization):
+    segments = parse_vtt(vtt_text)
+    speakers = assign_speakers_to_segments(segments, diarization)
+    final_lines = []
+    for seg, speaker in zip(segments, speakers):
+        start_time = seg["start"]
+        end_time = seg["end"]
+        def format_time(s):
+            hrs = int(s // 3600)
+            mins = int((s % 3600) // 60)
+            secs = s % 60
+            return f"{hrs:02d}:{mins:02d}:{secs:05.2f}"
+        time_str = f"[{format_time(start_time)} - {format_time(end_time)}]"
+        final_lines.append(f"{time_str} {speaker}: {seg['text']}")
+    return "\n".join(final_lines)
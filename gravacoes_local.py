@@ -0,0 +1,141 @@
+"""
+Servidor local que imita o login e o download de gravações do Vonix, para
+testar baixar_audios_http sem acessar o site real.
+
+Rotas:
+    POST /login/signin          (username/password) -> cookie de sessão
+    GET  /recordings/<call_id>  com sessão válida -> áudio com Content-Disposition;
+                                sem sessão -> 302 para /login/signin
+
+Exemplo:
+    with ServidorGravacoesLocal({'123': ('20250730_101010_Agente_1_Fila_aguas.mp3', b'...')}) as servidor:
+        baixar_audios_http(['123'], pasta, cookies=servidor.cookies,
+                           url_download=servidor.url_download)
+"""
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+NOME_COOKIE = 'PHPSESSID'
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Permite keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.conexoes += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _sessao_valida(self):
+        for parte in self.headers.get('Cookie', '').split(';'):
+            nome, _, valor = parte.strip().partition('=')
+            if nome == NOME_COOKIE and valor in self.server.sessoes:
+                return True
+        return False
+
+    def _responder(self, status, corpo=b'', cabecalhos=None):
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        if self.path != '/login/signin':
+            return self._responder(404)
+        tamanho = int(self.headers.get('Content-Length', 0))
+        dados = parse_qs(self.rfile.read(tamanho).decode('utf-8'))
+        if dados.get('username', [''])[0] != self.server.usuario or dados.get('password', [''])[0] != self.server.senha:
+            return self._responder(401)
+        sessao = self.server.nova_sessao()
+        self._responder(302, cabecalhos={'Location': '/', 'Set-Cookie': f'{NOME_COOKIE}={sessao}; Path=/'})
+
+    def do_GET(self):
+        if not self.path.startswith('/recordings/'):
+            return self._responder(404)
+        with self.server.lock:
+            self.server.requisicoes += 1
+        if not self._sessao_valida():
+            return self._responder(302, cabecalhos={'Location': '/login/signin'})
+        call_id = self.path[len('/recordings/'):]
+        gravacao = self.server.gravacoes.get(call_id)
+        if gravacao is None:
+            return self._responder(404)
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+        nome_arquivo, conteudo = gravacao
+        self._responder(200, conteudo, {
+            'Content-Type': 'audio/mpeg',
+            'Content-Disposition': f'attachment; filename="{nome_arquivo}"',
+        })
+
+
+class ServidorGravacoesLocal:
+    def __init__(self, gravacoes, latencia=0.0, usuario='usuario', senha='senha'):
+        """
+        `gravacoes` mapeia call_id -> (nome_arquivo, conteúdo em bytes);
+        `latencia` é o atraso, em segundos, de cada download.
+        """
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Manipulador)
+        self._servidor.daemon_threads = True
+        self._servidor.gravacoes = {str(k): v for k, v in gravacoes.items()}
+        self._servidor.latencia = latencia
+        self._servidor.usuario = usuario
+        self._servidor.senha = senha
+        self._servidor.lock = threading.Lock()
+        self._servidor.sessoes = set()
+        self._servidor.conexoes = 0
+        self._servidor.requisicoes = 0
+        self._servidor.nova_sessao = self._nova_sessao
+        self._thread = None
+
+    def _nova_sessao(self):
+        sessao = secrets.token_hex(16)
+        with self._servidor.lock:
+            self._servidor.sessoes.add(sessao)
+        return sessao
+
+    @property
+    def url(self):
+        host, porta = self._servidor.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    @property
+    def url_download(self):
+        return self.url + '/recordings/{}'
+
+    @property
+    def cookies(self):
+        """Cookies de uma sessão já autenticada, no formato de context.cookies() do Playwright."""
+        host = self._servidor.server_address[0]
+        return [{'name': NOME_COOKIE, 'value': self._nova_sessao(), 'domain': host, 'path': '/'}]
+
+    @property
+    def conexoes(self):
+        return self._servidor.conexoes
+
+    @property
+    def requisicoes(self):
+        return self._servidor.requisicoes
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
@@ -30,7 +30,7 @@ from transcrever_audios import (
 class TestDatabaseFunctions:
     """Test database-related functions"""
     
-    @patch('transcrever_audios.mysql.connector.connect')
+    @patch('transcrever_audios.get_connection')
     def test_get_db_connection_success(self, mock_connect):
         """Test successful database connection"""
         mock_conn = Mock()
@@ -39,9 +39,9 @@ class TestDatabaseFunctions:
         result = get_db_connection()
         
         assert result == mock_conn
-        mock_connect.assert_called_once_with(**DB_CONFIG)
+        mock_connect.assert_called_once_with()
     
-    @patch('transcrever_audios.mysql.connector.connect')
+    @patch('transcrever_audios.get_connection')
     def test_get_db_connection_failure(self, mock_connect):
         """Test database connection failure"""
         mock_connect.side_effect = mysql.connector.Error("Connection failed")
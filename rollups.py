@@ -0,0 +1,227 @@
+"""
+Tabelas de agregados diários das avaliações, lidas pelo dashboard no lugar de
+AVG/COUNT sobre avaliacoes ⋈ itens_avaliados:
+
+    rollup_avaliacoes_dia (carteira, dia, agent_id)            -> qtd, soma_pontuacao
+    rollup_itens_dia      (carteira, dia, agent_id, categoria) -> conforme, nao_conforme, total
+
+e um contador de versão por carteira (dashboard_versoes), usado pelo
+dashboard para descartar respostas em cache quando chegam avaliações novas.
+
+As linhas são incrementadas na mesma transação que grava cada avaliação
+(atualizar_rollups). Para criar as tabelas e preenchê-las com o histórico:
+
+    python rollups.py backfill                                  # todo o histórico
+    python rollups.py backfill --inicio 2025-08-01 --fim 2025-09-01 --carteira AGUAS
+
+O backfill apaga e recalcula o intervalo, então pode ser repetido sem duplicar
+valores. Enquanto as tabelas não existem, o pipeline não grava agregados e o
+dashboard consulta as tabelas brutas.
+"""
+import argparse
+import time
+from datetime import date, datetime
+
+from banco import get_connection
+
+# agent_id desconhecido (avaliação gravada sem agente) é agregado como 0
+AGENTE_DESCONHECIDO = 0
+
+SQL_CRIAR_ROLLUP_AVALIACOES = """
+CREATE TABLE IF NOT EXISTS rollup_avaliacoes_dia (
+    carteira VARCHAR(50) NOT NULL,
+    dia DATE NOT NULL,
+    agent_id INT NOT NULL,
+    qtd INT NOT NULL DEFAULT 0,
+    soma_pontuacao DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (carteira, dia, agent_id)
+)
+"""
+
+SQL_CRIAR_ROLLUP_ITENS = """
+CREATE TABLE IF NOT EXISTS rollup_itens_dia (
+    carteira VARCHAR(50) NOT NULL,
+    dia DATE NOT NULL,
+    agent_id INT NOT NULL,
+    categoria VARCHAR(255) NOT NULL,
+    conforme INT NOT NULL DEFAULT 0,
+    nao_conforme INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (carteira, dia, agent_id, categoria)
+)
+"""
+
+SQL_CRIAR_VERSOES = """
+CREATE TABLE IF NOT EXISTS dashboard_versoes (
+    carteira VARCHAR(50) NOT NULL PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0
+)
+"""
+TABELAS = ('rollup_avaliacoes_dia', 'rollup_itens_dia', 'dashboard_versoes')
+
+# Nas leituras, a ausência das tabelas é verificada de novo após este
+# intervalo, para que um processo já em execução passe a usá-las depois do
+# backfill. Nas gravações ela não fica em cache: uma avaliação gravada entre o
+# backfill e a nova verificação ficaria fora dos agregados
+INTERVALO_VERIFICACAO_TABELAS = 300
+_DISPONIVEIS = {'valor': None, 'verificado_em': 0.0}
+
+
+def rollups_disponiveis(cursor, gravacao=False) -> bool:
+    """
+    Indica se as tabelas de agregados existem (resultado em cache). Com
+    `gravacao`, só a presença das tabelas vem do cache; a ausência é sempre
+    consultada de novo.
+    """
+    agora = time.monotonic()
+    if _DISPONIVEIS['valor'] or (_DISPONIVEIS['valor'] is False and not gravacao
+                                  and agora - _DISPONIVEIS['verificado_em'] < INTERVALO_VERIFICACAO_TABELAS):
+        return _DISPONIVEIS['valor']
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name IN ({', '.join(['%s'] * len(TABELAS))})
+    """, TABELAS)
+    linha = cursor.fetchone()
+    quantidade = linha[0] if not isinstance(linha, dict) else next(iter(linha.values()))
+    _DISPONIVEIS['valor'] = quantidade == len(TABELAS)
+    _DISPONIVEIS['verificado_em'] = agora
+    return _DISPONIVEIS['valor']
+
+
+def atualizar_rollups(cursor, carteira, data_ligacao, agent_id, pontuacao, resultados):
+    """
+    Soma uma avaliação aos agregados do dia e incrementa a versão da
+    carteira, sem commit. `resultados` é a lista de (categoria, resultado)
+    dos itens avaliados.
+    """
+    if not rollups_disponiveis(cursor, gravacao=True):
+        return
+    dia = str(data_ligacao)[:10]
+    agente = int(agent_id) if agent_id else AGENTE_DESCONHECIDO
+    cursor.execute("""
+        INSERT INTO rollup_avaliacoes_dia (carteira, dia, agent_id, qtd, soma_pontuacao)
+        VALUES (%s, %s, %s, 1, %s)
+        ON DUPLICATE KEY UPDATE qtd = qtd + 1, soma_pontuacao = soma_pontuacao + VALUES(soma_pontuacao)
+    """, (carteira, dia, agente, pontuacao))
+    contagens = {}
+    for categoria, resultado in resultados:
+        conforme, nao_conforme, total = contagens.get(categoria, (0, 0, 0))
+        contagens[categoria] = (conforme + (resultado == 'CONFORME'),
+                                nao_conforme + (resultado == 'NAO CONFORME'),
+                                total + 1)
+    if contagens:
+        cursor.executemany("""
+            INSERT INTO rollup_itens_dia (carteira, dia, agent_id, categoria, conforme, nao_conforme, total)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE conforme = conforme + VALUES(conforme),
+                nao_conforme = nao_conforme + VALUES(nao_conforme), total = total + VALUES(total)
+        """, [(carteira, dia, agente, categoria, c, nc, t) for categoria, (c, nc, t) in contagens.items()])
+    cursor.execute("""
+        INSERT INTO dashboard_versoes (carteira, versao) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE versao = versao + 1
+    """, (carteira,))
+
+
+def versao_carteira(cursor, carteira):
+    """Versão atual dos dados da carteira (muda a cada avaliação gravada), ou None sem as tabelas."""
+    if not rollups_disponiveis(cursor):
+        return None
+    cursor.execute("SELECT versao FROM dashboard_versoes WHERE carteira = %s", (carteira,))
+    linha = cursor.fetchone()
+    if linha is None:
+        return 0
+    return linha[0] if not isinstance(linha, dict) else linha['versao']
+
+
+def intervalo_em_dias(inicio, fim):
+    """
+    Converte `inicio`/`fim` dos endpoints em datas, se ambos caírem à
+    meia-noite (só então os agregados diários respondem exatamente ao
+    filtro data_ligacao >= inicio AND data_ligacao < fim). Caso contrário, None.
+    """
+    datas = []
+    for valor in (inicio, fim):
+        if not valor:
+            return None
+        for formato in ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M'):
+            try:
+                instante = datetime.strptime(valor, formato)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+        if instante.time() != datetime.min.time():
+            return None
+        datas.append(instante.date())
+    return tuple(datas)
+
+
+def reconstruir_rollups(inicio=None, fim=None, carteira=None):
+    """
+    Cria as tabelas, se necessário, e recalcula os agregados de [inicio, fim)
+    a partir de avaliacoes/itens_avaliados numa única transação.
+    """
+    inicio = inicio or date(1970, 1, 1)
+    fim = fim or date(9999, 12, 31)
+    filtro_carteira = " AND carteira = %s" if carteira else ""
+    parametros = (inicio, fim) + ((carteira,) if carteira else ())
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # DDL faz commit implícito: fica fora da transação do recálculo
+        cursor.execute(SQL_CRIAR_ROLLUP_AVALIACOES)
+        cursor.execute(SQL_CRIAR_ROLLUP_ITENS)
+        cursor.execute(SQL_CRIAR_VERSOES)
+        cursor.execute("DELETE FROM rollup_avaliacoes_dia WHERE dia >= %s AND dia < %s" + filtro_carteira, parametros)
+        cursor.execute("DELETE FROM rollup_itens_dia WHERE dia >= %s AND dia < %s" + filtro_carteira, parametros)
+        cursor.execute(f"""
+            INSERT INTO rollup_avaliacoes_dia (carteira, dia, agent_id, qtd, soma_pontuacao)
+            SELECT carteira, DATE(data_ligacao), COALESCE(agent_id, {AGENTE_DESCONHECIDO}), COUNT(*), SUM(pontuacao)
+            FROM avaliacoes
+            WHERE data_ligacao >= %s AND data_ligacao < %s{filtro_carteira}
+            GROUP BY carteira, DATE(data_ligacao), COALESCE(agent_id, {AGENTE_DESCONHECIDO})
+        """, parametros)
+        avaliacoes = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO rollup_itens_dia (carteira, dia, agent_id, categoria, conforme, nao_conforme, total)
+            SELECT av.carteira, DATE(av.data_ligacao), COALESCE(av.agent_id, {AGENTE_DESCONHECIDO}), ia.categoria,
+                SUM(CASE WHEN ia.resultado = 'CONFORME' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN ia.resultado = 'NAO CONFORME' THEN 1 ELSE 0 END),
+                COUNT(*)
+            FROM itens_avaliados ia
+            JOIN avaliacoes av ON av.id = ia.avaliacao_id
+            WHERE av.data_ligacao >= %s AND av.data_ligacao < %s{filtro_carteira.replace('carteira', 'av.carteira')}
+            GROUP BY av.carteira, DATE(av.data_ligacao), COALESCE(av.agent_id, {AGENTE_DESCONHECIDO}), ia.categoria
+        """, parametros)
+        itens = cursor.rowcount
+        # Os dados do dashboard mudaram: invalida as respostas em cache
+        if carteira:
+            cursor.execute("""
+                INSERT INTO dashboard_versoes (carteira, versao) VALUES (%s, 1)
+                ON DUPLICATE KEY UPDATE versao = versao + 1
+            """, (carteira,))
+        else:
+            cursor.execute("UPDATE dashboard_versoes SET versao = versao + 1")
+        conn.commit()
+        _DISPONIVEIS['valor'] = True
+        print(f"Agregados recalculados de {inicio} a {fim}{' para ' + carteira if carteira else ''}: "
+              f"{avaliacoes} linhas de avaliações, {itens} linhas de itens.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manutenção dos agregados diários do dashboard.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    backfill = sub.add_parser('backfill', help='cria as tabelas e recalcula os agregados')
+    backfill.add_argument('--inicio', type=date.fromisoformat, help='primeiro dia (AAAA-MM-DD)')
+    backfill.add_argument('--fim', type=date.fromisoformat, help='dia seguinte ao último (AAAA-MM-DD)')
+    backfill.add_argument('--carteira')
+    args = parser.parse_args()
+    if args.comando == 'backfill':
+        reconstruir_rollups(args.inicio, args.fim, args.carteira)
@@ -0,0 +1,139 @@
+"""
+Preparação dos áudios para a API de transcrição: conversão para um formato
+compacto de voz, divisão de ligações longas em partes com cortes nos
+silêncios e junção das transcrições das partes removendo o texto repetido
+nas sobreposições.
+"""
+import os
+import re
+import unicodedata
+
+# Formato enviado à API: mono, 16 kHz, Opus em modo voz (suficiente para telefonia)
+FORMATO_COMPACTO = 'ogg'
+EXTENSAO_COMPACTA = '.ogg'
+PARAMETROS_COMPACTO = {
+    'codec': 'libopus',
+    'bitrate': '24k',
+    'parameters': ['-application', 'voip'],
+}
+TAXA_AMOSTRAGEM_COMPACTA = 16000
+
+# Parâmetros padrão da divisão (em milissegundos)
+DURACAO_ALVO_PARTE_MS = 5 * 60 * 1000      # Tamanho desejado de cada parte
+TOLERANCIA_CORTE_MS = 60 * 1000            # Distância máxima do alvo para procurar um silêncio
+SOBREPOSICAO_MS = 2000                     # Sobreposição usada quando não há silêncio para cortar
+SILENCIO_MINIMO_MS = 700                   # Duração mínima de um silêncio candidato a corte
+LIMIAR_SILENCIO_DB = -16                   # Silêncio = abaixo de (volume médio + limiar) dBFS
+
+# Tamanho máximo (em palavras) da sobreposição procurada ao juntar as partes
+MAX_PALAVRAS_SOBREPOSICAO = 40
+
+
+def calcular_partes(duracao_ms, silencios, alvo_ms=DURACAO_ALVO_PARTE_MS,
+                    tolerancia_ms=TOLERANCIA_CORTE_MS, sobreposicao_ms=SOBREPOSICAO_MS):
+    """
+    Retorna a lista de partes [(inicio_ms, fim_ms, sobreposta), ...] que
+    cobrem o áudio; `sobreposta` indica que a parte começa antes do fim da
+    anterior.
+
+    Cada corte é feito no meio do silêncio mais próximo de `alvo_ms` após o
+    corte anterior (até `tolerancia_ms` de distância). Sem silêncio nessa
+    janela, o corte cai exatamente no alvo e as duas partes vizinhas avançam
+    `sobreposicao_ms` uma sobre a outra, para que nenhuma palavra se perca.
+    """
+    meios = sorted((inicio + fim) // 2 for inicio, fim in silencios)
+    partes = []
+    inicio = 0
+    sobreposta = False
+    while duracao_ms - inicio > alvo_ms + tolerancia_ms:
+        alvo = inicio + alvo_ms
+        candidatos = [m for m in meios if abs(m - alvo) <= tolerancia_ms and m > inicio]
+        if candidatos:
+            corte = min(candidatos, key=lambda m: abs(m - alvo))
+            partes.append((inicio, corte, sobreposta))
+            inicio = corte
+            sobreposta = False
+        else:
+            partes.append((inicio, min(alvo + sobreposicao_ms // 2, duracao_ms), sobreposta))
+            inicio = max(alvo - sobreposicao_ms // 2, 0)
+            sobreposta = sobreposicao_ms > 0
+    partes.append((inicio, duracao_ms, sobreposta))
+    return partes
+
+
+def compactar_audio(caminho_audio, caminho_destino):
+    """Converte o áudio para mono 16 kHz em Opus de baixa taxa e salva em `caminho_destino`."""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(caminho_audio)
+    audio = audio.set_channels(1).set_frame_rate(TAXA_AMOSTRAGEM_COMPACTA)
+    audio.export(caminho_destino, format=FORMATO_COMPACTO, **PARAMETROS_COMPACTO)
+    return caminho_destino
+
+
+def dividir_audio(caminho_audio, pasta_destino, alvo_ms=DURACAO_ALVO_PARTE_MS,
+                  tolerancia_ms=TOLERANCIA_CORTE_MS, sobreposicao_ms=SOBREPOSICAO_MS):
+    """
+    Exporta as partes do áudio para `pasta_destino`, já no formato compacto,
+    e retorna (caminhos, sobreposicoes), em ordem: sobreposicoes[i] indica se
+    a parte i repete o fim da parte anterior (corte fora de silêncio).
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+
+    audio = AudioSegment.from_file(caminho_audio).set_channels(1).set_frame_rate(TAXA_AMOSTRAGEM_COMPACTA)
+    silencios = detect_silence(audio, min_silence_len=SILENCIO_MINIMO_MS,
+                               silence_thresh=audio.dBFS + LIMIAR_SILENCIO_DB, seek_step=10)
+    partes = calcular_partes(len(audio), silencios, alvo_ms, tolerancia_ms, sobreposicao_ms)
+
+    nome_base = os.path.splitext(os.path.basename(caminho_audio))[0]
+    caminhos = []
+    for i, (inicio, fim, _) in enumerate(partes):
+        caminho_parte = os.path.join(pasta_destino, f"{nome_base}_parte{i:03d}{EXTENSAO_COMPACTA}")
+        audio[inicio:fim].export(caminho_parte, format=FORMATO_COMPACTO, **PARAMETROS_COMPACTO)
+        caminhos.append(caminho_parte)
+    return caminhos, [sobreposta for _, _, sobreposta in partes]
+
+
+def _normalizar_palavra(palavra):
+    palavra = unicodedata.normalize('NFKD', palavra.lower())
+    palavra = ''.join(c for c in palavra if not unicodedata.combining(c))
+    return re.sub(r'\W', '', palavra)
+
+
+def unir_transcricoes(textos, sobreposicoes=None, max_palavras=MAX_PALAVRAS_SOBREPOSICAO):
+    """
+    Junta as transcrições das partes, em ordem. Quando o fim de uma parte e o
+    começo da seguinte trazem as mesmas palavras (ignorando caixa, acentos e
+    pontuação), a repetição é removida da parte seguinte.
+
+    `sobreposicoes` (de dividir_audio) limita essa remoção às partes que
+    realmente repetem áudio da anterior; num corte em silêncio a repetição
+    foi dita de novo na ligação e é mantida. Sem ela, todas as junções são
+    verificadas.
+    """
+    resultado = []
+    cauda = []  # Últimas palavras já incluídas, para comparar com a parte seguinte
+    for i, texto in enumerate(textos):
+        texto = (texto or '').strip()
+        if not texto:
+            continue
+        palavras = texto.split(None, max_palavras)[:max_palavras]
+        if cauda and (sobreposicoes is None or sobreposicoes[i]):
+            anteriores = [_normalizar_palavra(p) for p in cauda]
+            seguintes = [_normalizar_palavra(p) for p in palavras]
+            repetidas = 0
+            for n in range(min(len(anteriores), len(seguintes)), 0, -1):
+                if anteriores[-n:] == seguintes[:n] and any(anteriores[-n:]):
+                    repetidas = n
+                    break
+            # Uma única palavra coincidente é comum por acaso ("o", "de"): só conta
+            # como sobreposição a partir de duas palavras
+            if repetidas >= 2:
+                restante = texto.split(None, repetidas)
+                texto = restante[repetidas] if len(restante) > repetidas else ''
+                if not texto:
+                    continue
+        resultado.append(texto)
+        cauda = (cauda + texto.split())[-max_palavras:]
+    return ' '.join(resultado)
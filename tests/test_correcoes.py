@@ -0,0 +1,242 @@
+"""
+A correção de termos precisa dar o mesmo resultado da cadeia original de
+re.sub. As funções abaixo são cópias literais das de transcrever_audios.py
+antes de as variações irem para correcoes_transcricao.json.
+"""
+import random
+import re
+
+import pytest
+
+from benchmarks import PALAVRAS_FILLER, _cadeia_legada, _gerar_transcricao
+from correcoes import CorretorTranscricao, carregar_correcoes
+
+
+def corrigir_portes_advogados(texto):
+    """
+    Corrige variações comuns de transcrição para 'Portes Advogados'.
+    """
+    padroes = [
+        r'partes de advogados',
+        r'porta de advogados',
+        r'parte de advogados',
+        r'portas de advogados',
+        r'portas advogados',
+        r'porta advogados',
+        r'partes advogados',
+        r'porta dos advogados',
+        r'portas dos advogados',
+        r'parte dos advogados',
+        r'partes dos advogados',
+        r'parte da advogados',
+        r'portas da advogados',
+        r'porta da advogados',
+        r'porta advogada',
+        r'portas advogadas',
+        r'parte advogada',
+        r'porta de advogado',
+        r'portas de advogado',
+        r'parte de advogado',
+        r'pai dos advogados',
+        r'porto advogados',
+        r'porta de jogados',
+        r'parque dos advogados',
+        r'portas de vogadas',
+        r'porta advogado',
+        r'poisa advogados',
+        r'porto de advogados'
+    ]
+    for padrao in padroes:
+        texto = re.sub(padrao, 'Portes Advogados', texto, flags=re.IGNORECASE)
+    return texto
+
+def corrigir_vuon_card(texto):
+    """
+    Corrige variações comuns de transcrição para 'VUON CARD'.
+    """
+    padroes = [
+        r'vuom card',
+        r'voom card',
+        r'von card',
+        r'vuan card',
+        r'buon card',
+        r'buan card',
+        r'buom card',
+        r'bom card',
+        r'vu on card',
+        r'vo on card',
+        r'voom car',
+        r'vuom car',
+        r'von car',
+        r'vuan car',
+        r'vu on',
+        r'vuon carde',
+        r'vuom carde',
+        r'vuan carde',
+        r'cartão vuon',
+        r'cartão vão',
+        r'cartão vuan',
+        r'cartão vuom',
+        r'cartão vom',
+        r'cartão von',
+        r'cartão bom',
+        r'voncard',
+        r'blomcard',
+        r'von card',
+        r'vamoCard',
+        r'vonkaj'
+
+    ]
+    for padrao in padroes:
+        texto = re.sub(padrao, 'VUON CARD', texto, flags=re.IGNORECASE)
+    return texto
+
+def corrigir_aguas_guariroba(texto):
+    """
+    Corrige variações comuns de transcrição para 'Águas Guariroba'.
+    """
+    padroes = [
+        r'águas guariroba',
+        r'aguas guariroba',
+        r'água guariroba',
+        r'agua guariroba',
+        r'águas guari roba',
+        r'aguas guari roba',
+        r'águas gari roba',
+        r'aguas gari roba',
+        r'águas guarirouba',
+        r'aguas guarirouba',
+        r'águas guari rouba',
+        r'aguas guari rouba',
+        r'águas guari robo',
+        r'aguas guari robo',
+        r'águas gariroba',
+        r'aguas gariroba',
+        r'águas guarirobo',
+        r'aguas guarirobo',
+        r'água gariroba',
+        r'águas claridobas',
+        r'águas do aeroba',
+        r'agua gariroba',
+        r'águas do Aliróba',
+        r'aguas do Aliróba',
+        r'aguas do aeroba',
+        r'Águas Guaridó',
+        r'águas aeróbicas',
+        r'Águas Marirobas',
+        r'águas de Badirobas',
+        r'águas Larirobas',
+        r'Água do Loro de Oba',
+        r'águas do guarda-roupa',
+        r'água saíroba',
+        r'armas guariloba',
+        r'armas guariroba'
+    ]
+    for padrao in padroes:
+        texto = re.sub(padrao, 'Águas Guariroba', texto, flags=re.IGNORECASE)
+    return texto
+
+def corrigir_assessoria_juridica(texto):
+    """
+    Corrige variações comuns de transcrição para 'assessoria jurídica'.
+    """
+    padroes = [
+        r'turia jurídica',
+        r'Seria Jurídica',
+        r'Sereia Juridica'
+    ]
+    for padrao in padroes:
+        texto = re.sub(padrao, 'assessoria jurídica', texto, flags=re.IGNORECASE)
+    return texto
+
+
+def corrigir_legado(texto):
+    texto = corrigir_portes_advogados(texto)
+    texto = corrigir_vuon_card(texto)
+    texto = corrigir_aguas_guariroba(texto)
+    return corrigir_assessoria_juridica(texto)
+
+
+@pytest.fixture(scope='module')
+def corretor():
+    return CorretorTranscricao(carregar_correcoes())
+
+
+@pytest.mark.parametrize('texto', [
+    'cartão cartão vuan',
+    'cartão vuan car',
+    'cartão vuan carde',
+    'cartão vuan card',
+    'cartão von card',
+    'von carde',
+    'vu on card vu on',
+    'CARTÃO VUON CARD',
+    'cartao vuan car',
+    'aguas guariroba e Águas Guariroba',
+    'porta de advogados da porta dos advogados',
+    'Sereia Juridica da turia jurídica',
+    '',
+])
+def test_casos_conhecidos(corretor, texto):
+    assert corretor.corrigir(texto) == corrigir_legado(texto)
+
+
+def _texto_aleatorio(rng, variantes):
+    # Variações coladas umas nas outras, pedaços de variações e caixa trocada
+    pedacos = []
+    for _ in range(rng.randint(1, 12)):
+        sorteio = rng.random()
+        if sorteio < 0.5:
+            pedaco = rng.choice(variantes)
+        elif sorteio < 0.75:
+            variante = rng.choice(variantes)
+            pedaco = variante[:rng.randint(1, len(variante))] if rng.random() < 0.5 else variante.split()[-1]
+        else:
+            pedaco = rng.choice(PALAVRAS_FILLER + ['cartão', 'card', 'car', 'carde', 'vu', 'on', 'de'])
+        if rng.random() < 0.2:
+            pedaco = pedaco.upper()
+        pedacos.append(pedaco)
+    return rng.choice([' ', '', ', ']).join(pedacos)
+
+
+def test_aleatorio_igual_a_cadeia_original(corretor):
+    rng = random.Random(3)
+    correcoes = carregar_correcoes()
+    variantes = [v for lista in correcoes.values() for v in lista]
+    cadeia_benchmark = _cadeia_legada(correcoes)
+    for _ in range(5_000):
+        texto = _texto_aleatorio(rng, variantes)
+        esperado = corrigir_legado(texto)
+        assert corretor.corrigir(texto) == esperado, texto
+        assert cadeia_benchmark(texto) == esperado, texto
+
+
+def test_corretor_por_termo_igual_a_funcao_original():
+    rng = random.Random(4)
+    correcoes = carregar_correcoes()
+    variantes = [v for lista in correcoes.values() for v in lista]
+    funcoes = {'Portes Advogados': corrigir_portes_advogados, 'VUON CARD': corrigir_vuon_card,
+               'Águas Guariroba': corrigir_aguas_guariroba, 'assessoria jurídica': corrigir_assessoria_juridica}
+    for termo, funcao in funcoes.items():
+        corretor = CorretorTranscricao({termo: correcoes[termo]})
+        for _ in range(1_000):
+            texto = _texto_aleatorio(rng, variantes)
+            assert corretor.corrigir(texto) == funcao(texto), texto
+
+
+def test_transcricao_longa_igual_a_cadeia_original(corretor):
+    # Janelas vizinhas e trocas perto das bordas (que exigem janelas maiores)
+    correcoes = carregar_correcoes()
+    for seed in range(5):
+        texto = _gerar_transcricao(correcoes, 3_000, seed=seed)
+        assert corretor.corrigir(texto) == corrigir_legado(texto)
+    texto = ' '.join(['cartão'] * 50 + ['vuan card'] + ['bom dia'] * 30)
+    assert corretor.corrigir(texto) == corrigir_legado(texto)
+
+
+def test_trocas_em_cascata_alem_da_janela():
+    # Cada troca cria uma ocorrência da variação seguinte um caractere à
+    # esquerda, até passar da folga da janela
+    correcoes = {'Z': ['ab'] + [letra + 'z' for letra in 'cdefghijkl']}
+    texto = 'x' * 30 + 'lkjihgfedcab' + 'x' * 30 + ' ab ' + 'y' * 30
+    assert CorretorTranscricao(correcoes).corrigir(texto) == _cadeia_legada(correcoes)(texto)
@@ -0,0 +1,70 @@
+"""
+Endpoints do dashboard sobre o banco SQLite sintético de benchmarks.py
+(consultas nas tabelas brutas, sem os agregados).
+"""
+import pytest
+
+import app_dashboard
+import rollups
+from benchmarks import _ConexaoSQLite, _banco_avaliacoes
+
+FILTRO = 'inicio=2025-08-01&fim=2025-09-01&carteira=AGUAS'
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    conn = _banco_avaliacoes(300, n_agentes=5)
+    # SQLite não tem information_schema: o dashboard consulta as tabelas brutas
+    monkeypatch.setitem(rollups._DISPONIVEIS, 'valor', False)
+    monkeypatch.setitem(rollups._DISPONIVEIS, 'verificado_em', float('inf'))
+    monkeypatch.setattr(app_dashboard, 'INTERVALO_VERSAO_CACHE', float('inf'))
+    monkeypatch.setattr(app_dashboard, 'get_db', lambda: _ConexaoSQLite(conn))
+    app_dashboard.CACHE_RESPOSTAS.invalidar()
+    yield conn
+    app_dashboard.CACHE_RESPOSTAS.invalidar()
+
+
+def _avaliacao_sem_agente(conn, avaliacao_id, itens=('Abordagem', 'Script')):
+    conn.execute("INSERT INTO avaliacoes VALUES (?, ?, NULL, '2025-08-10 10:00:00', 'APROVADA', 80, 'AGUAS')",
+                 (avaliacao_id, str(avaliacao_id)))
+    conn.executemany("INSERT INTO itens_avaliados (avaliacao_id, categoria, descricao, resultado) "
+                     "VALUES (?, ?, '', 'CONFORME')", [(avaliacao_id, categoria) for categoria in itens])
+    conn.commit()
+
+
+def test_detalhes_em_lote_ignora_avaliacoes_sem_agente(banco):
+    cliente = app_dashboard.app.test_client()
+    antes = cliente.get(f'/api/agentes/detalhes?{FILTRO}').get_json()
+    _avaliacao_sem_agente(banco, 10_000)
+    app_dashboard.CACHE_RESPOSTAS.invalidar()
+
+    resposta = cliente.get(f'/api/agentes/detalhes?{FILTRO}')
+    assert resposta.status_code == 200
+    assert resposta.get_json() == antes
+    agentes = cliente.get(f'/api/agentes?{FILTRO}').get_json()
+    assert sorted(resposta.get_json()) == sorted(str(a['agent_id']) for a in agentes)
+
+
+def test_historico_paginado_ignora_avaliacoes_sem_itens(banco):
+    # Avaliações com erro são gravadas sem itens; intercaladas com as demais
+    agente = banco.execute("SELECT agent_id FROM avaliacoes WHERE carteira = 'AGUAS' LIMIT 1").fetchone()[0]
+    for i in range(6):
+        banco.execute("INSERT INTO avaliacoes VALUES (?, ?, ?, ?, 'ERRO', 0, 'AGUAS')",
+                      (20_000 + i, str(20_000 + i), agente, f'2025-08-{i + 2:02d} 12:00:00'))
+    banco.commit()
+    cliente = app_dashboard.app.test_client()
+    completo = cliente.get(f'/api/agente/{agente}/historico?{FILTRO}').get_json()
+    ids_completo = list(dict.fromkeys(linha['avaliacao_id'] for linha in completo))
+    assert len(ids_completo) > 3
+
+    for limite in (1, 2, 3):
+        paginas, token = [], None
+        while True:
+            url = f'/api/agente/{agente}/historico?{FILTRO}&limite={limite}' + (f'&cursor={token}' if token else '')
+            resposta = cliente.get(url).get_json()
+            assert resposta['historico']
+            paginas.extend(resposta['historico'])
+            token = resposta['proximo_cursor']
+            if token is None:
+                break
+        assert paginas == completo
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import re
@@ -5,32 +6,47 @@ import sys
 import time
 import csv
 import glob
+import hashlib
 import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydub.utils import mediainfo
-import mysql.connector
 from mysql.connector import Error as MySQLError
 
-# Configuração do banco de dados
-DB_CONFIG = {
-    'host': '10.100.10.57',
-    'port': 3306,
-    'user': 'user_automacao',
-    'password': 'G5T82ZWMr',
-    'database': 'vonix',
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci',
-}
+from banco import DB_CONFIG, get_connection
+from cache import CacheDisco, CacheLRU
+from correcoes import corrigir_termos_transcricao, obter_corretor
+from rollups import atualizar_rollups
+from busca_transcricoes import indexar_transcricao
+from transcricoes_compactadas import compactar_transcricao
+from segmentacao_audio import (
+    EXTENSAO_COMPACTA,
+    FORMATO_COMPACTO,
+    PARAMETROS_COMPACTO,
+    TAXA_AMOSTRAGEM_COMPACTA,
+    compactar_audio,
+    dividir_audio,
+    unir_transcricoes,
+)
+from diarizacao import (
+    assign_speaker_to_segment,
+    assign_speakers_to_segments,
+    merge_transcript_and_diarization,
+    parse_vtt,
+)
 
 def get_db_connection():
+    """Empresta uma conexão do pool compartilhado; `close()` a devolve ao pool."""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = get_connection()
         return conn
     except MySQLError as e:
         print(f"Erro ao conectar ao banco de dados: {e}")
@@ -55,24 +71,29 @@ def carregar_mapeamento_call_ids(pasta_audios: str) -> dict:
 # Variável global para armazenar o mapeamento
 mapeamento_call_ids = {}
 
-def extrair_call_id_original(nome_arquivo: str) -> str:
+# Cache compartilhado das buscas de call_id por data/hora (acertos e falhas).
+# As falhas expiram antes, pois a chamada pode ser registrada depois no banco.
+CACHE_CALL_ID_TAMANHO = 20000
+CACHE_CALL_ID_TTL = 24 * 3600
+CACHE_CALL_ID_TTL_NEGATIVO = 10 * 60
+cache_call_ids = CacheLRU(CACHE_CALL_ID_TAMANHO, ttl=CACHE_CALL_ID_TTL, ttl_negativo=CACHE_CALL_ID_TTL_NEGATIVO)
+_NAO_ENCONTRADO = object()
+
+def _buscar_call_id_no_banco(nome_arquivo: str) -> Optional[str]:
     """
-    Obtém o call_id original usando o mapeamento ou, se não disponível,
-    busca no banco de dados com base na data e hora.
+    Busca no banco o call_id mais próximo da data/hora do nome do arquivo.
+    Retorna None se não houver chamada; erros de banco são propagados.
     """
-    # Primeiro tenta usar o mapeamento
-    if nome_arquivo in mapeamento_call_ids:
-        return mapeamento_call_ids[nome_arquivo]
+    match = re.match(r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})_Agente_(\d+)', nome_arquivo)
+    if not match:
+        return None
     
-    # Se não encontrou no mapeamento, usa o método antigo
+    year, month, day, hour, minute, second, agent_id = match.groups()
+    data_hora = f"{year}-{month}-{day} {hour}:{minute}:{second}"
+    
+    conn = None
+    cursor = None
     try:
-        match = re.match(r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})_Agente_(\d+)', nome_arquivo)
-        if not match:
-            return None
-        
-        year, month, day, hour, minute, second, agent_id = match.groups()
-        data_hora = f"{year}-{month}-{day} {hour}:{minute}:{second}"
-        
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -91,16 +112,188 @@ def extrair_call_id_original(nome_arquivo: str) -> str:
         if resultado:
             return resultado[0]
         return None
-        
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:  # Devolve ao pool mesmo se a conexão caiu
+            conn.close()
+
+def extrair_call_id_original(nome_arquivo: str) -> str:
+    """
+    Obtém o call_id original usando o mapeamento ou, se não disponível,
+    busca no banco de dados com base na data e hora.
+    O resultado da busca (inclusive quando não encontra) fica em cache_call_ids.
+    """
+    # Primeiro tenta usar o mapeamento
+    if nome_arquivo in mapeamento_call_ids:
+        return mapeamento_call_ids[nome_arquivo]
+    
+    call_id = cache_call_ids.buscar(nome_arquivo, padrao=_NAO_ENCONTRADO)
+    if call_id is not _NAO_ENCONTRADO:
+        return call_id
+    
+    # Se não encontrou no mapeamento, usa o método antigo
+    try:
+        call_id = _buscar_call_id_no_banco(nome_arquivo)
     except Exception as e:
+        # Erros de banco não são guardados no cache
         print(f"Erro ao buscar call_id original: {e}")
         return None
+    cache_call_ids.guardar(nome_arquivo, call_id)
+    return call_id
+
+# Índice em memória {nome do arquivo: dados da chamada}, preenchido em lote antes
+# de avaliar uma pasta para evitar consultas ao banco por arquivo. Vale só para
+# a pasta em andamento e guarda apenas as chamadas encontradas: as não
+# encontradas ficam em cache_call_ids, cuja validade curta permite achá-las depois.
+indice_chamadas = {}
+
+# Margem (em segundos) para associar um arquivo a uma chamada pela data/hora
+MARGEM_BUSCA_CALL_ID = 300
+# Quantidade máxima de valores por cláusula IN
+TAMANHO_LOTE_CONSULTA = 500
+
+def _dados_do_nome_arquivo(nome_arquivo: str):
+    """Extrai (data/hora, agent_id) do nome do arquivo, ou None se não seguir o padrão."""
+    match = re.match(r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})_Agente_(\d+)', nome_arquivo)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, agent_id = match.groups()
+    data_hora = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    return data_hora, agent_id
+
+def resolver_chamadas_em_lote(nomes_arquivos) -> dict:
+    """
+    Resolve call_id, start_time e agent_id de vários arquivos de uma vez e
+    guarda os encontrados em `indice_chamadas`, que passa a valer só para
+    estes arquivos.
+
+    Arquivos presentes no mapeamento (ou em cache_call_ids) são buscados com
+    uma consulta por lote de call_ids; os demais são associados pela data/hora do nome do arquivo, com
+    uma consulta por dia que traz as chamadas dos agentes envolvidos. O custo
+    passa a depender da quantidade de dias, não da quantidade de arquivos.
+    """
+    resolvidos = {}
+    por_call_id = {}
+    por_dia = {}
+    for nome in nomes_arquivos:
+        call_id = mapeamento_call_ids.get(nome) or cache_call_ids.buscar(nome, padrao=_NAO_ENCONTRADO)
+        if call_id is None:
+            # Busca já feita recentemente sem encontrar a chamada
+            resolvidos[nome] = {'call_id': None, 'start_time': None, 'agent_id': extrair_agent_id(nome)}
+            continue
+        if call_id is not _NAO_ENCONTRADO:
+            por_call_id.setdefault(str(call_id), []).append(nome)
+            continue
+        dados = _dados_do_nome_arquivo(nome)
+        if dados is None:
+            resolvidos[nome] = {'call_id': None, 'start_time': None, 'agent_id': extrair_agent_id(nome)}
+            continue
+        por_dia.setdefault(dados[0].date(), []).append((nome, dados[0], dados[1]))
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        call_ids = list(por_call_id)
+        for i in range(0, len(call_ids), TAMANHO_LOTE_CONSULTA):
+            lote = call_ids[i:i + TAMANHO_LOTE_CONSULTA]
+            marcadores = ', '.join(['%s'] * len(lote))
+            cursor.execute(f"""
+                SELECT call_id, start_time, agent_id
+                FROM vonix.calls
+                WHERE call_id IN ({marcadores})
+                """, tuple(lote))
+            for call_id, start_time, agent_id_banco in cursor.fetchall():
+                for nome in por_call_id.pop(str(call_id), []):
+                    resolvidos[nome] = {
+                        'call_id': call_id,
+                        'start_time': start_time,
+                        'agent_id': extrair_agent_id(nome) or (str(agent_id_banco) if agent_id_banco is not None else None),
+                    }
+        # call_ids do mapeamento que não existem em vonix.calls
+        for call_id, nomes in por_call_id.items():
+            for nome in nomes:
+                resolvidos[nome] = {'call_id': call_id, 'start_time': None, 'agent_id': extrair_agent_id(nome)}
+
+        margem = timedelta(seconds=MARGEM_BUSCA_CALL_ID)
+        for dia, arquivos in por_dia.items():
+            agentes = sorted({agent_id for _, _, agent_id in arquivos})
+            inicio = min(data_hora for _, data_hora, _ in arquivos) - margem
+            fim = max(data_hora for _, data_hora, _ in arquivos) + margem
+            marcadores = ', '.join(['%s'] * len(agentes))
+            cursor.execute(f"""
+                SELECT call_id, agent_id, start_time
+                FROM vonix.calls
+                WHERE agent_id IN ({marcadores})
+                AND start_time > %s AND start_time < %s
+                """, (*agentes, inicio, fim))
+            chamadas_por_agente = {}
+            for call_id, agent_id_banco, start_time in cursor.fetchall():
+                chamadas_por_agente.setdefault(str(agent_id_banco), []).append((start_time, call_id))
+
+            for nome, data_hora, agent_id in arquivos:
+                melhor = None
+                for start_time, call_id in chamadas_por_agente.get(agent_id, []):
+                    diferenca = abs((start_time - data_hora).total_seconds())
+                    if diferenca < MARGEM_BUSCA_CALL_ID and (melhor is None or diferenca < melhor[0]):
+                        melhor = (diferenca, call_id, start_time)
+                resolvidos[nome] = {
+                    'call_id': melhor[1] if melhor else None,
+                    'start_time': melhor[2] if melhor else None,
+                    'agent_id': agent_id,
+                }
+                cache_call_ids.guardar(nome, resolvidos[nome]['call_id'])
+    except Exception as e:
+        print(f"Erro ao resolver call_ids em lote: {e}")
     finally:
         if cursor:
             cursor.close()
-        if conn and conn.is_connected():
+        if conn:  # Devolve ao pool mesmo se a conexão caiu
             conn.close()
 
+    indice_chamadas.clear()
+    indice_chamadas.update((nome, dados) for nome, dados in resolvidos.items() if dados['call_id'])
+    encontrados = len(indice_chamadas)
+    print(f"call_ids resolvidos em lote: {encontrados} de {len(nomes_arquivos)} arquivos.")
+    print(f"Cache de call_ids: {cache_call_ids.estatisticas()}")
+    return resolvidos
+
+def obter_dados_chamada(nome_arquivo: str) -> dict:
+    """
+    Retorna call_id, start_time e agent_id do arquivo, usando o índice em lote
+    quando disponível e as consultas individuais caso contrário.
+    """
+    if nome_arquivo in indice_chamadas:
+        return indice_chamadas[nome_arquivo]
+
+    call_id = extrair_call_id_original(nome_arquivo)
+    start_time = None
+    if call_id:
+        conn = None
+        cursor = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT start_time 
+                FROM vonix.calls 
+                WHERE call_id = %s
+                """, (call_id,))
+            resultado = cursor.fetchone()
+            if resultado:
+                start_time = resultado[0]
+        except Exception as e:
+            print(f"Erro ao buscar data da ligação: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:  # Devolve ao pool mesmo se a conexão caiu
+                conn.close()
+    return {'call_id': call_id, 'start_time': start_time, 'agent_id': extrair_agent_id(nome_arquivo)}
+
 def map_resultado_value(status: str) -> str:
     """Maps the status values to database-compatible resultado values"""
     status_map = {
@@ -141,150 +334,147 @@ def extrair_descricao_e_peso(categoria: str, arquivo_resumo: str) -> tuple:
     
     return '', 0.0
 
+def _gravar_avaliacao(cursor, avaliacao: dict, transcricao_texto: str, carteira: str):
+    """
+    Executa os INSERTs de uma avaliação (avaliacoes, itens_avaliados,
+    agregados diários, transcricoes e índice de busca) no cursor informado,
+    sem commit.
+    Retorna o call_id gravado.
+    """
+    # Obter o nome base do arquivo
+    id_chamada = avaliacao['id_chamada']
+    nome_base = os.path.splitext(os.path.basename(id_chamada))[0]
+    
+    # Obter call_id, data da ligação e agente (do índice em lote, se disponível)
+    dados_chamada = obter_dados_chamada(os.path.basename(id_chamada))
+    if dados_chamada['start_time']:
+        data_ligacao = dados_chamada['start_time'].strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        data_ligacao = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print("AVISO: Não foi possível encontrar a data da ligação no banco, usando data atual.")
+    
+    # Calcular a pontuação total baseado nos itens
+    total_validos = 0
+    total_conforme = 0
+    for item in avaliacao.get('itens', {}).values():
+        if isinstance(item, dict):
+            status = item.get('status', 'NA')
+        else:
+            status = item if isinstance(item, str) else 'NA'
+            
+        resultado = map_resultado_value(status)
+        if resultado != 'NAO SE APLICA':
+            total_validos += 1
+            if resultado == 'CONFORME':
+                total_conforme += 1
+    
+    pontuacao = (total_conforme / total_validos * 100) if total_validos > 0 else 0
+    status_avaliacao = 'APROVADA' if pontuacao >= 70 else 'REPROVADA'
+    
+    # Debug dos dados que serão salvos
+    print("\n============ DADOS PARA INSERÇÃO NO BANCO ============")
+    print(f"TABELA avaliacoes:")
+    print(f"- call_id: {dados_chamada['call_id']}")
+    print(f"- agent_id: {dados_chamada['agent_id']}")
+    print(f"- data_ligacao: {data_ligacao}")
+    print(f"- status_avaliacao: {status_avaliacao}")
+    print(f"- pontuacao: {pontuacao}")
+    print(f"- carteira: {carteira}")
+    
+    print("\nTABELA itens_avaliados:")
+    for categoria, item in avaliacao.get('itens', {}).items():
+        print(f"- categoria: {categoria}")
+        if isinstance(item, dict):
+            status = item.get('status', 'NA')
+            observacao = item.get('observacao', '')
+            peso = 1.0  # Peso base, será redistribuído depois
+        else:
+            status = item if isinstance(item, str) else 'NA'
+            observacao = ''
+            peso = 1.0
+            
+        resultado = map_resultado_value(status)
+        print(f"  descricao: {observacao}")
+        print(f"  resultado: {resultado}")
+        print(f"  peso: {peso}")
+        print("  ---")
+            
+    print("====================================================\n")
+
+    # Obter o call_id original
+    call_id_original = dados_chamada['call_id']
+    
+    if not call_id_original:
+        raise ValueError(f"Não foi possível encontrar o call_id original para {id_chamada}")
+    
+    agent_id = dados_chamada['agent_id']
+    # carteira agora é parâmetro
+
+    # Inserir na tabela avaliacoes
+    sql_avaliacao = """
+    INSERT INTO avaliacoes (call_id, agent_id, data_ligacao, status_avaliacao, pontuacao, carteira)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    cursor.execute(sql_avaliacao, (call_id_original, agent_id, data_ligacao, status_avaliacao, pontuacao, carteira))
+    id_avaliacao = cursor.lastrowid
+
+    # Calcular o total de itens não-NA para redistribuir os pesos
+    itens_validos = sum(1 for item in avaliacao.get('itens', {}).values() 
+                      if isinstance(item, dict) and map_resultado_value(item.get('status', 'NA')) != 'NAO SE APLICA')
+    peso_por_item = round(1.0 / itens_validos if itens_validos > 0 else 0.0, 4)
+
+    # Inserir os itens avaliados
+    sql_itens = """
+    INSERT INTO itens_avaliados (avaliacao_id, categoria, descricao, resultado, peso)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    
+    valores_itens = []
+    for categoria, item in avaliacao.get('itens', {}).items():
+        if isinstance(item, dict):
+            resultado = map_resultado_value(item.get('status', 'NA'))
+            observacao = item.get('observacao', '')
+        else:
+            resultado = map_resultado_value(item if isinstance(item, str) else 'NA')
+            observacao = ''
+            
+        peso = peso_por_item if resultado != 'NAO SE APLICA' else 0.0
+        valores_itens.append((id_avaliacao, categoria, observacao, resultado, peso))
+    # executemany envia todos os itens num único INSERT de várias linhas
+    if valores_itens:
+        cursor.executemany(sql_itens, valores_itens)
+    # Agregados diários do dashboard, na mesma transação da avaliação
+    atualizar_rollups(cursor, carteira, data_ligacao, agent_id, pontuacao,
+                      [(categoria, resultado) for _, categoria, _, resultado, _ in valores_itens])
+
+    # Buscar e inserir o conteúdo da transcrição
+    # Usa apenas a transcrição passada pela variável, não lê mais o arquivo txt
+    conteudo_transcricao = transcricao_texto
+    if conteudo_transcricao:
+        # Um único upsert no lugar de SELECT seguido de INSERT/UPDATE
+        sql_transcricao = """
+        INSERT INTO transcricoes (avaliacao_id, conteudo)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE conteudo = VALUES(conteudo)
+        """
+        if _configuracao('COMPACTAR_TRANSCRICOES', '1') != '0':
+            conteudo_transcricao = compactar_transcricao(conteudo_transcricao)
+        cursor.execute(sql_transcricao, (id_avaliacao, conteudo_transcricao))
+        # Texto pesquisável, em claro, na mesma transação
+        indexar_transcricao(cursor, id_avaliacao, carteira, agent_id, data_ligacao, transcricao_texto)
+        print(f"Transcrição gravada com sucesso para avaliacao_id: {id_avaliacao}")
+    else:
+        print(f"AVISO: Conteúdo da transcrição vazio, não foi possível inserir no banco. Valor recebido: {repr(transcricao_texto)}")
+
+    return call_id_original
+
 def salvar_avaliacao_no_banco(avaliacao: dict, transcricao_texto: str = None, carteira: str = 'AGUAS'):
     conn = None
     cursor = None
     try:        
-        # Obter o nome base do arquivo
-        id_chamada = avaliacao['id_chamada']
-        nome_base = os.path.splitext(os.path.basename(id_chamada))[0]
-        
-        # Obter a data do arquivo usando a data associada ao call_id
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT start_time 
-                FROM vonix.calls 
-                WHERE call_id = %s
-                """, (extrair_call_id_original(os.path.basename(id_chamada)),))
-            resultado = cursor.fetchone()
-            if resultado:
-                data_ligacao = resultado[0].strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                data_ligacao = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                print("AVISO: Não foi possível encontrar a data da ligação no banco, usando data atual.")
-        except Exception as e:
-            print(f"Erro ao buscar data da ligação: {e}")
-            data_ligacao = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
-        
-        # Calcular a pontuação total baseado nos itens
-        total_validos = 0
-        total_conforme = 0
-        for item in avaliacao.get('itens', {}).values():
-            if isinstance(item, dict):
-                status = item.get('status', 'NA')
-            else:
-                status = item if isinstance(item, str) else 'NA'
-                
-            resultado = map_resultado_value(status)
-            if resultado != 'NAO SE APLICA':
-                total_validos += 1
-                if resultado == 'CONFORME':
-                    total_conforme += 1
-        
-        pontuacao = (total_conforme / total_validos * 100) if total_validos > 0 else 0
-        status_avaliacao = 'APROVADA' if pontuacao >= 70 else 'REPROVADA'
-        
-        # Debug dos dados que serão salvos
-        print("\n============ DADOS PARA INSERÇÃO NO BANCO ============")
-        print(f"TABELA avaliacoes:")
-        print(f"- call_id: {extrair_call_id_original(os.path.basename(avaliacao['id_chamada']))}")
-        print(f"- agent_id: {extrair_agent_id(avaliacao['id_chamada'])}")
-        print(f"- data_ligacao: {data_ligacao}")
-        print(f"- status_avaliacao: {status_avaliacao}")
-        print(f"- pontuacao: {pontuacao}")
-        print(f"- carteira: {carteira}")
-        
-        print("\nTABELA itens_avaliados:")
-        for categoria, item in avaliacao.get('itens', {}).items():
-            print(f"- categoria: {categoria}")
-            if isinstance(item, dict):
-                status = item.get('status', 'NA')
-                observacao = item.get('observacao', '')
-                peso = 1.0  # Peso base, será redistribuído depois
-            else:
-                status = item if isinstance(item, str) else 'NA'
-                observacao = ''
-                peso = 1.0
-                
-            resultado = map_resultado_value(status)
-            print(f"  descricao: {observacao}")
-            print(f"  resultado: {resultado}")
-            print(f"  peso: {peso}")
-            print("  ---")
-                
-        print("====================================================\n")
-
         conn = get_db_connection()
         cursor = conn.cursor()
-
-        # Obter o call_id original
-        call_id_original = extrair_call_id_original(os.path.basename(id_chamada))
-        
-        if not call_id_original:
-            raise ValueError(f"Não foi possível encontrar o call_id original para {id_chamada}")
-        
-        agent_id = extrair_agent_id(id_chamada)
-        # carteira agora é parâmetro
-
-        # Inserir na tabela avaliacoes
-        sql_avaliacao = """
-        INSERT INTO avaliacoes (call_id, agent_id, data_ligacao, status_avaliacao, pontuacao, carteira)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(sql_avaliacao, (call_id_original, agent_id, data_ligacao, status_avaliacao, pontuacao, carteira))
-        id_avaliacao = cursor.lastrowid
-
-        # Calcular o total de itens não-NA para redistribuir os pesos
-        itens_validos = sum(1 for item in avaliacao.get('itens', {}).values() 
-                          if isinstance(item, dict) and map_resultado_value(item.get('status', 'NA')) != 'NAO SE APLICA')
-        peso_por_item = round(1.0 / itens_validos if itens_validos > 0 else 0.0, 4)
-
-        # Inserir os itens avaliados
-        sql_itens = """
-        INSERT INTO itens_avaliados (avaliacao_id, categoria, descricao, resultado, peso)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        
-        for categoria, item in avaliacao.get('itens', {}).items():
-            if isinstance(item, dict):
-                resultado = map_resultado_value(item.get('status', 'NA'))
-                observacao = item.get('observacao', '')
-            else:
-                resultado = map_resultado_value(item if isinstance(item, str) else 'NA')
-                observacao = ''
-                
-            peso = peso_por_item if resultado != 'NAO SE APLICA' else 0.0
-            cursor.execute(sql_itens, (id_avaliacao, categoria, observacao, resultado, peso))
-
-        # Buscar e inserir o conteúdo da transcrição
-        # Usa apenas a transcrição passada pela variável, não lê mais o arquivo txt
-        conteudo_transcricao = transcricao_texto
-        if conteudo_transcricao:
-            # Verifica se já existe transcrição para este avaliacao_id
-            sql_check = "SELECT id FROM transcricoes WHERE avaliacao_id = %s"
-            cursor.execute(sql_check, (id_avaliacao,))
-            existe = cursor.fetchone()
-            if existe:
-                sql_update = "UPDATE transcricoes SET conteudo = %s WHERE avaliacao_id = %s"
-                cursor.execute(sql_update, (conteudo_transcricao, id_avaliacao))
-                print(f"Transcrição atualizada para avaliacao_id: {id_avaliacao}")
-            else:
-                sql_transcricao = """
-                INSERT INTO transcricoes (avaliacao_id, conteudo)
-                VALUES (%s, %s)
-                """
-                cursor.execute(sql_transcricao, (id_avaliacao, conteudo_transcricao))
-                print(f"Transcrição inserida com sucesso para avaliacao_id: {id_avaliacao}")
-        else:
-            print(f"AVISO: Conteúdo da transcrição vazio, não foi possível inserir no banco. Valor recebido: {repr(transcricao_texto)}")
-
+        call_id_original = _gravar_avaliacao(cursor, avaliacao, transcricao_texto, carteira)
         conn.commit()
         print(f"Avaliação do call_id {call_id_original} salva no banco com sucesso!")
         
@@ -296,7 +486,34 @@ def salvar_avaliacao_no_banco(avaliacao: dict, transcricao_texto: str = None, ca
     finally:
         if cursor:
             cursor.close()
+        if conn:  # Devolve ao pool mesmo se a conexão caiu
+            conn.close()
+
+def salvar_avaliacoes_em_lote(registros):
+    """
+    Grava várias avaliações numa única transação. `registros` é uma lista de
+    tuplas (avaliacao, transcricao_texto, carteira). Se qualquer avaliação
+    falhar, a transação inteira é desfeita e o erro é propagado.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        call_ids = [_gravar_avaliacao(cursor, avaliacao, transcricao_texto, carteira)
+                    for avaliacao, transcricao_texto, carteira in registros]
+        conn.commit()
+        print(f"{len(call_ids)} avaliações salvas no banco numa única transação.")
+        return call_ids
+    except Exception as e:
+        print(f"Erro ao salvar lote de avaliações no banco: {e}")
         if conn and conn.is_connected():
+            conn.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:  # Devolve ao pool mesmo se a conexão caiu
             conn.close()
 
 def extrair_agent_id(id_chamada: str) -> str:
@@ -305,65 +522,147 @@ def extrair_agent_id(id_chamada: str) -> str:
     match = re.search(r'Agente_(\d+)', id_chamada)
     return match.group(1) if match else None
 
-# Definir todas as variáveis de ambiente possíveis para evitar symlinks
-os.environ["SPEECHBRAIN_DIALOG_STRATEGY"] = "copy"
-os.environ["SPEECHBRAIN_LOCAL_FILE_STRATEGY"] = "copy"
-os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-os.environ["TRANSFORMERS_OFFLINE"] = "0"
-os.environ["HF_HUB_CACHE"] = os.path.join(os.path.expanduser("~"), ".cache", "huggingface", "no_symlinks")
-
-# Hack para forçar SpeechBrain a usar cópia em vez de symlinks
-try:
-    import speechbrain as sb
-    import speechbrain.utils.fetching as fetching
-    original_link_strategy = fetching.link_with_strategy
-    
-    def safe_link_strategy(src, dst, strategy):
+# ─── INICIALIZAÇÃO SOB DEMANDA ───────────────────────────────────────────────────────
+# Importar este módulo não carrega o .env, não altera o SpeechBrain, não baixa o
+# modelo de diarização e não exige OPENAI_API_KEY: cada recurso é inicializado
+# na primeira vez em que é usado.
+_LOCK_INICIALIZACAO = threading.RLock()
+_ENV_CARREGADO = False
+_SPEECHBRAIN_CONFIGURADO = False
+_PIPELINE_CARREGADO = False
+_PIPELINE = None
+
+def _carregar_env():
+    """Carrega as variáveis do arquivo .env (uma única vez)."""
+    global _ENV_CARREGADO
+    if _ENV_CARREGADO:
+        return
+    with _LOCK_INICIALIZACAO:
+        if _ENV_CARREGADO:
+            return
+        dotenv_path = Path(__file__).parent / '.env'
+        load_dotenv(dotenv_path, override=True)  # override=True para garantir que nossas variáveis tenham prioridade
+        print(f"OPENAI_API_KEY configurada: {'Sim' if os.getenv('OPENAI_API_KEY') else 'Não'}")
+        print(f"HUGGINGFACE_TOKEN configurado: {'Sim' if os.getenv('HUGGINGFACE_TOKEN') else 'Não'}")
+        _ENV_CARREGADO = True
+
+# Configurações lidas do ambiente/.env no momento do uso:
+# - MAX_WORKERS_TRANSCRICAO: áudios transcritos simultaneamente por carteira (padrão 4)
+# - MODO_AVALIACAO: 'sync' (uma avaliação por vez), 'async' (concorrente) ou 'batch' (Batch API, noturno)
+# - INTERVALO_POLLING_BATCH: segundos entre consultas ao status do lote no modo batch (padrão 60)
+# - PRAZO_POLLING_BATCH: segundos máximos aguardando o lote numa execução; depois é retomado na próxima (padrão 90000)
+# - MAX_CONCORRENCIA_AVALIACAO: chamadas simultâneas ao LLM no modo assíncrono (padrão 8)
+# - CACHE_TRANSCRICOES_DIR: diretório do cache de transcrições por hash do áudio
+# - CACHE_AVALIACOES_DIR: diretório do cache de avaliações (transcrição + prompt + modelo)
+# - COMPACTAR_AUDIO: '0' envia o áudio original em vez da versão mono 16 kHz Opus (padrão '1')
+# - CACHE_AUDIOS_DIR: diretório do cache dos áudios compactados
+# - DURACAO_MINIMA_PARTES: ligações acima desta duração (s) são transcritas em partes; 0 desativa (padrão 600)
+# - MAX_WORKERS_PARTES: partes de uma mesma ligação transcritas em paralelo (padrão 4)
+# - TAMANHO_LOTE_GRAVACAO: avaliações gravadas por transação no modo assíncrono (padrão 1)
+# - COMPACTAR_TRANSCRICOES: '0' grava transcricoes.conteudo em texto puro em vez de zlib (padrão '1')
+def _configuracao(nome: str, padrao: str = None) -> Optional[str]:
+    """Lê uma configuração do ambiente, garantindo que o .env já foi carregado."""
+    _carregar_env()
+    return os.getenv(nome, padrao)
+
+def _get_openai_api_key() -> str:
+    api_key = _configuracao('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY não foi configurada. Verifique o arquivo .env")
+    return api_key
+
+def _configurar_speechbrain():
+    """
+    Força o SpeechBrain a copiar arquivos em vez de criar symlinks.
+    Executado apenas antes de carregar o pipeline de diarização.
+    """
+    global _SPEECHBRAIN_CONFIGURADO
+    with _LOCK_INICIALIZACAO:
+        if _SPEECHBRAIN_CONFIGURADO:
+            return
+        _SPEECHBRAIN_CONFIGURADO = True
+
+        # Definir todas as variáveis de ambiente possíveis para evitar symlinks
+        os.environ["SPEECHBRAIN_DIALOG_STRATEGY"] = "copy"
+        os.environ["SPEECHBRAIN_LOCAL_FILE_STRATEGY"] = "copy"
+        os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "0"
+        os.environ["HF_HUB_CACHE"] = os.path.join(os.path.expanduser("~"), ".cache", "huggingface", "no_symlinks")
+
+        # Hack para forçar SpeechBrain a usar cópia em vez de symlinks
         try:
-            return original_link_strategy(src, dst, strategy)
-        except OSError:
-            print(f"Erro ao criar link simbólico. Usando cópia em vez disso.")
-            import shutil
-            shutil.copy(src, dst)
-            return dst
+            import speechbrain.utils.fetching as fetching
+            original_link_strategy = fetching.link_with_strategy
             
-    fetching.link_with_strategy = safe_link_strategy
-    print("Configuração do SpeechBrain modificada para evitar erros de symlink")
-except ImportError:
-    print("SpeechBrain não está instalado. Algumas funcionalidades podem não estar disponíveis.")
-
-
-# Carrega as variáveis de ambiente do arquivo .env
-dotenv_path = Path(__file__).parent / '.env'
-load_dotenv(dotenv_path, override=True)  # override=True para garantir que nossas variáveis tenham prioridade
-
-# Verifica se as chaves foram carregadas corretamente
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-HUGGINGFACE_TOKEN = os.getenv('HUGGINGFACE_TOKEN')
-
-print(f"OPENAI_API_KEY configurada: {'Sim' if OPENAI_API_KEY else 'Não'}")
-print(f"HUGGINGFACE_TOKEN configurado: {'Sim' if HUGGINGFACE_TOKEN else 'Não'}")
-
-# Verificar se a chave da API foi carregada corretamente
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY não foi configurada. Verifique o arquivo .env")
-
-# Inicializa a API do Whisper da OpenAI (para transcrição)
-openai.api_key = OPENAI_API_KEY
-
-# ─── CONFIGURAÇÃO DO CLIENTE OPENAI PARA AVALIAÇÃO ────────────────────────────────────
+            def safe_link_strategy(src, dst, strategy):
+                try:
+                    return original_link_strategy(src, dst, strategy)
+                except OSError:
+                    print(f"Erro ao criar link simbólico. Usando cópia em vez disso.")
+                    shutil.copy(src, dst)
+                    return dst
+                    
+            fetching.link_with_strategy = safe_link_strategy
+            print("Configuração do SpeechBrain modificada para evitar erros de symlink")
+        except ImportError:
+            print("SpeechBrain não está instalado. Algumas funcionalidades podem não estar disponíveis.")
+
+def get_diarization_pipeline():
+    """
+    Retorna o pipeline de diarização do Pyannote.audio, carregando-o na primeira
+    chamada. Retorna None se nenhuma das formas de inicialização funcionar.
+    """
+    global _PIPELINE, _PIPELINE_CARREGADO
+    if _PIPELINE_CARREGADO:
+        return _PIPELINE
+    with _LOCK_INICIALIZACAO:
+        if _PIPELINE_CARREGADO:
+            return _PIPELINE
+        _configurar_speechbrain()
+        try:
+            from pyannote.audio import Pipeline
+            _PIPELINE = Pipeline.from_pretrained("pyannote/speaker-diarization", use_auth_token=_configuracao('HUGGINGFACE_TOKEN'))
+            print("Pipeline de diarização inicializado com sucesso!")
+        except Exception as e:
+            print(f"Erro ao inicializar pipeline de diarização: {e}")
+            print("Tentando solução alternativa...")
+            try:
+                from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
+                
+                os.makedirs(os.path.join(os.path.expanduser("~"), ".cache", "torch", "pyannote", "speechbrain"), exist_ok=True)
+                
+                _PIPELINE = SpeakerDiarization(segmentation="pyannote/segmentation")
+                print("Pipeline alternativo inicializado!")
+            except Exception as e2:
+                print(f"Erro na solução alternativa: {e2}")
+                print("AVISO: A diarização não funcionará. O script continuará apenas com transcrição.")
+                _PIPELINE = None
+        _PIPELINE_CARREGADO = True
+    return _PIPELINE
+
+# ─── CONFIGURAÇÃO DO CLIENTE OPENAI ───────────────────────────────────────────────────
 _CLIENT: Optional[OpenAI] = None
 
 def _get_client() -> OpenAI:
     global _CLIENT
     if _CLIENT is None:
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY não foi configurada. Verifique o arquivo .env")
-        _CLIENT = OpenAI(
-            api_key=OPENAI_API_KEY  # Usa a mesma chave já configurada para o projeto
-        )
+        with _LOCK_INICIALIZACAO:
+            if _CLIENT is None:
+                api_key = _get_openai_api_key()
+                openai.api_key = api_key
+                _CLIENT = OpenAI(
+                    api_key=api_key  # Usa a mesma chave já configurada para o projeto
+                )
     return _CLIENT
 
+def _criar_async_client() -> AsyncOpenAI:
+    """
+    Novo cliente assíncrono. O cliente fica preso ao event loop em que foi
+    usado, então cada asyncio.run cria o seu (async with) em vez de reaproveitar
+    um global entre carteiras.
+    """
+    return AsyncOpenAI(api_key=_get_openai_api_key())
+
 MAX_SEM_GSS = 9.60 #Trocar para 10 no prompt quando a pontuação do GSS for inserida
 # ─── PROMPTS DE AVALIAÇÃO POR CARTEIRA ──────────────────────────────────────────────
 PROMPTS_AVALIACAO = {
@@ -618,226 +917,33 @@ CHECKLIST DE AVALIAÇÃO (12 sub‑itens)
 # Definir SYSTEM_PROMPT padrão para fallback legacy
 SYSTEM_PROMPT = PROMPTS_AVALIACAO.get('aguas_guariroba', '')
 
-# Inicializa o pipeline de Diarização do Pyannote.audio com tratamento de erros
-try:
-    from pyannote.audio import Pipeline
-    pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization", use_auth_token=HUGGINGFACE_TOKEN)
-    print("Pipeline de diarização inicializado com sucesso!")
-except Exception as e:
-    print(f"Erro ao inicializar pipeline de diarização: {e}")
-    print("Tentando solução alternativa...")
-    try:
-        import tempfile
-        import torch
-        
-        from pyannote.audio.pipelines.utils import get_model
-        from pyannote.audio.pipelines.speaker_diarization import SpeakerDiarization
-        
-        os.makedirs(os.path.join(os.path.expanduser("~"), ".cache", "torch", "pyannote", "speechbrain"), exist_ok=True)
-        
-        pipeline = SpeakerDiarization(segmentation="pyannote/segmentation")
-        print("Pipeline alternativo inicializado!")
-    except Exception as e2:
-        print(f"Erro na solução alternativa: {e2}")
-        print("AVISO: A diarização não funcionará. O script continuará apenas com transcrição.")
-        pipeline = None
-
 def corrigir_portes_advogados(texto):
     """
     Corrige variações comuns de transcrição para 'Portes Advogados'.
     """
-    padroes = [
-        r'partes de advogados',
-        r'porta de advogados',
-        r'parte de advogados',
-        r'portas de advogados',
-        r'portas advogados',
-        r'porta advogados',
-        r'partes advogados',
-        r'porta dos advogados',
-        r'portas dos advogados',
-        r'parte dos advogados',
-        r'partes dos advogados',
-        r'parte da advogados',
-        r'portas da advogados',
-        r'porta da advogados',
-        r'porta advogada',
-        r'portas advogadas',
-        r'parte advogada',
-        r'porta de advogado',
-        r'portas de advogado',
-        r'parte de advogado',
-        r'pai dos advogados',
-        r'porto advogados',
-        r'porta de jogados',
-        r'parque dos advogados',
-        r'portas de vogadas',
-        r'porta advogado',
-        r'poisa advogados',
-        r'porto de advogados'
-    ]
-    for padrao in padroes:
-        texto = re.sub(padrao, 'Portes Advogados', texto, flags=re.IGNORECASE)
-    return texto
+    return obter_corretor('Portes Advogados').corrigir(texto)
 
 def corrigir_vuon_card(texto):
     """
     Corrige variações comuns de transcrição para 'VUON CARD'.
     """
-    padroes = [
-        r'vuom card',
-        r'voom card',
-        r'von card',
-        r'vuan card',
-        r'buon card',
-        r'buan card',
-        r'buom card',
-        r'bom card',
-        r'vu on card',
-        r'vo on card',
-        r'voom car',
-        r'vuom car',
-        r'von car',
-        r'vuan car',
-        r'vu on',
-        r'vuon carde',
-        r'vuom carde',
-        r'vuan carde',
-        r'cartão vuon',
-        r'cartão vão',
-        r'cartão vuan',
-        r'cartão vuom',
-        r'cartão vom',
-        r'cartão von',
-        r'cartão bom',
-        r'voncard',
-        r'blomcard',
-        r'von card',
-        r'vamoCard',
-        r'vonkaj'
-
-    ]
-    for padrao in padroes:
-        texto = re.sub(padrao, 'VUON CARD', texto, flags=re.IGNORECASE)
-    return texto
+    return obter_corretor('VUON CARD').corrigir(texto)
 
 def corrigir_aguas_guariroba(texto):
     """
     Corrige variações comuns de transcrição para 'Águas Guariroba'.
     """
-    padroes = [
-        r'águas guariroba',
-        r'aguas guariroba',
-        r'água guariroba',
-        r'agua guariroba',
-        r'águas guari roba',
-        r'aguas guari roba',
-        r'águas gari roba',
-        r'aguas gari roba',
-        r'águas guarirouba',
-        r'aguas guarirouba',
-        r'águas guari rouba',
-        r'aguas guari rouba',
-        r'águas guari robo',
-        r'aguas guari robo',
-        r'águas gariroba',
-        r'aguas gariroba',
-        r'águas guarirobo',
-        r'aguas guarirobo',
-        r'água gariroba',
-        r'águas claridobas',
-        r'águas do aeroba',
-        r'agua gariroba',
-        r'águas do Aliróba',
-        r'aguas do Aliróba',
-        r'aguas do aeroba',
-        r'Águas Guaridó',
-        r'águas aeróbicas',
-        r'Águas Marirobas',
-        r'águas de Badirobas',
-        r'águas Larirobas',
-        r'Água do Loro de Oba',
-        r'águas do guarda-roupa',
-        r'água saíroba',
-        r'armas guariloba',
-        r'armas guariroba'
-    ]
-    for padrao in padroes:
-        texto = re.sub(padrao, 'Águas Guariroba', texto, flags=re.IGNORECASE)
-    return texto
+    return obter_corretor('Águas Guariroba').corrigir(texto)
 
 def corrigir_assessoria_juridica(texto):
     """
     Corrige variações comuns de transcrição para 'assessoria jurídica'.
     """
-    padroes = [
-        r'turia jurídica',
-        r'Seria Jurídica',
-        r'Sereia Juridica'
-    ]
-    for padrao in padroes:
-        texto = re.sub(padrao, 'assessoria jurídica', texto, flags=re.IGNORECASE)
-    return texto
-
-def parse_vtt(vtt_text):
-    """
-    Analisa o texto VTT e retorna uma lista de segmentos.
-    Cada segmento é um dicionário com 'start', 'end' (em segundos) e 'text'.
-    """
-    segments = []
-    time_pattern = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3}) --> (\d{2}:\d{2}:\d{2}\.\d{3})')
-    lines = vtt_text.splitlines()
-    idx = 0
-    while idx < len(lines):
-        line = lines[idx].strip()
-        match = time_pattern.match(line)
-        if match:
-            start_str, end_str = match.groups()
-            start = sum(float(x) * 60 ** i for i, x in enumerate(reversed(start_str.split(":"))))
-            end = sum(float(x) * 60 ** i for i, x in enumerate(reversed(end_str.split(":"))))
-            text_lines = []
-            idx += 1
-            while idx < len(lines) and lines[idx].strip() != "":
-                text_lines.append(lines[idx].strip())
-                idx += 1
-            text = " ".join(text_lines)
-            segments.append({"start": start, "end": end, "text": text})
-        else:
-            idx += 1
-    return segments
-
-def assign_speaker_to_segment(segment, diarization):
-    seg_start = segment["start"]
-    seg_end = segment["end"]
-    max_overlap = 0.0
-    speaker_assigned = "Desconhecido"
-    
-    for d_segment, _, speaker in diarization.itertracks(yield_label=True):
-        overlap = max(0, min(seg_end, d_segment.end) - max(seg_start, d_segment.start))
-        if overlap > max_overlap:
-            max_overlap = overlap
-            speaker_assigned = speaker
-    return speaker_assigned
-
-def merge_transcript_and_diarization(vtt_text, diarization):
-    segments = parse_vtt(vtt_text)
-    final_lines = []
-    for seg in segments:
-        speaker = assign_speaker_to_segment(seg, diarization)
-        start_time = seg["start"]
-        end_time = seg["end"]
-        def format_time(s):
-            hrs = int(s // 3600)
-            mins = int((s % 3600) // 60)
-            secs = s % 60
-            return f"{hrs:02d}:{mins:02d}:{secs:05.2f}"
-        time_str = f"[{format_time(start_time)} - {format_time(end_time)}]"
-        final_lines.append(f"{time_str} {speaker}: {seg['text']}")
-    return "\n".join(final_lines)
+    return obter_corretor('assessoria jurídica').corrigir(texto)
 
 def classificar_falantes_com_gpt(texto_transcricao):
     try:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        client = _get_client()
         prompt = f"""
         Analise esta transcrição de uma ligação de cobrança e identifique quem está falando em cada momento.
         
@@ -878,32 +984,174 @@ def classificar_falantes_com_gpt(texto_transcricao):
         print(f"Erro ao classificar falantes com GPT-4.1-mini: {e}")
         return texto_transcricao
 
+# Parâmetros da transcrição (fazem parte da chave do cache de transcrições)
+MODELO_TRANSCRICAO = "gpt-4o-transcribe"
+PROMPT_TRANSCRICAO = "Transcreva esta chamada completa entre um agente da Portes Advogados e um cliente"
+TEMPERATURA_TRANSCRICAO = 0.0  # Mais consistente
+
+# Cache em disco das transcrições, endereçado pelo conteúdo do áudio
+CACHE_TRANSCRICOES_DIR = os.path.join(os.path.expanduser("~"), ".cache", "monitoria", "transcricoes")
+CACHE_TRANSCRICOES_MAX_BYTES = 500 * 1024 * 1024
+CACHE_TRANSCRICOES_IDADE_MAXIMA = 90 * 24 * 3600
+_CACHE_TRANSCRICOES: Optional[CacheDisco] = None
+
+def _get_cache_transcricoes() -> CacheDisco:
+    global _CACHE_TRANSCRICOES
+    if _CACHE_TRANSCRICOES is None:
+        with _LOCK_INICIALIZACAO:
+            if _CACHE_TRANSCRICOES is None:
+                _CACHE_TRANSCRICOES = CacheDisco(
+                    _configuracao('CACHE_TRANSCRICOES_DIR', CACHE_TRANSCRICOES_DIR),
+                    tamanho_maximo_bytes=CACHE_TRANSCRICOES_MAX_BYTES,
+                    idade_maxima=CACHE_TRANSCRICOES_IDADE_MAXIMA
+                )
+    return _CACHE_TRANSCRICOES
+
+def hash_arquivo(caminho: str) -> str:
+    """Calcula o sha256 do conteúdo do arquivo, lendo em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+# Cache em disco dos áudios convertidos para o formato compacto de envio
+CACHE_AUDIOS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "monitoria", "audios_compactos")
+CACHE_AUDIOS_MAX_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_AUDIOS_IDADE_MAXIMA = 30 * 24 * 3600
+_CACHE_AUDIOS: Optional[CacheDisco] = None
+_LOCK_ESTATISTICAS_ENVIO = threading.Lock()
+_ESTATISTICAS_ENVIO = {'arquivos': 0, 'bytes_originais': 0, 'bytes_enviados': 0}
+
+def _get_cache_audios() -> CacheDisco:
+    global _CACHE_AUDIOS
+    if _CACHE_AUDIOS is None:
+        with _LOCK_INICIALIZACAO:
+            if _CACHE_AUDIOS is None:
+                _CACHE_AUDIOS = CacheDisco(
+                    _configuracao('CACHE_AUDIOS_DIR', CACHE_AUDIOS_DIR),
+                    tamanho_maximo_bytes=CACHE_AUDIOS_MAX_BYTES,
+                    idade_maxima=CACHE_AUDIOS_IDADE_MAXIMA
+                )
+    return _CACHE_AUDIOS
+
+def _compactacao_ativa() -> bool:
+    return _configuracao('COMPACTAR_AUDIO', '1') != '0'
+
+def preparar_audio_para_envio(caminho_audio, hash_audio=None):
+    """
+    Retorna o caminho do áudio a enviar à API: a versão mono 16 kHz em Opus
+    (do cache ou recém-convertida) ou o original, se a conversão falhar ou não
+    reduzir o tamanho.
+    """
+    if not _compactacao_ativa():
+        return caminho_audio
+    cache = _get_cache_audios()
+    chave = cache.chave(hash_audio or hash_arquivo(caminho_audio), FORMATO_COMPACTO,
+                        TAXA_AMOSTRAGEM_COMPACTA, PARAMETROS_COMPACTO)
+    caminho_compacto = cache.buscar_arquivo(chave, EXTENSAO_COMPACTA)
+    if caminho_compacto is None:
+        fd, temporario = tempfile.mkstemp(suffix=EXTENSAO_COMPACTA)
+        os.close(fd)
+        try:
+            compactar_audio(caminho_audio, temporario)
+            caminho_compacto = cache.guardar_arquivo(chave, temporario, EXTENSAO_COMPACTA)
+        except Exception as e:
+            print(f"Falha ao compactar {caminho_audio}; o áudio original será enviado: {e}")
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return caminho_audio
+    
+    bytes_originais = os.path.getsize(caminho_audio)
+    bytes_compactos = os.path.getsize(caminho_compacto)
+    caminho_envio = caminho_compacto if bytes_compactos < bytes_originais else caminho_audio
+    bytes_enviados = min(bytes_compactos, bytes_originais)
+    with _LOCK_ESTATISTICAS_ENVIO:
+        _ESTATISTICAS_ENVIO['arquivos'] += 1
+        _ESTATISTICAS_ENVIO['bytes_originais'] += bytes_originais
+        _ESTATISTICAS_ENVIO['bytes_enviados'] += bytes_enviados
+    print(f"Áudio para envio: {bytes_originais / 1024:.0f} KB -> {bytes_enviados / 1024:.0f} KB "
+          f"({100 * (1 - bytes_enviados / bytes_originais) if bytes_originais else 0:.0f}% menor)")
+    return caminho_envio
+
+def estatisticas_envio_audio() -> dict:
+    """Totais de bytes originais x enviados desde o início do processo."""
+    with _LOCK_ESTATISTICAS_ENVIO:
+        estatisticas = dict(_ESTATISTICAS_ENVIO)
+    estatisticas['bytes_economizados'] = estatisticas['bytes_originais'] - estatisticas['bytes_enviados']
+    return estatisticas
+
+def _transcrever_com_api(caminho_audio):
+    """Envia o áudio para a API de transcrição e retorna o texto bruto (ou None)."""
+    client = _get_client()
+    with open(caminho_audio, 'rb') as audio_file:
+        transcription_response = client.audio.transcriptions.create(
+            model=MODELO_TRANSCRICAO,
+            file=audio_file,
+            response_format="text",
+            prompt=PROMPT_TRANSCRICAO,
+            temperature=TEMPERATURA_TRANSCRICAO
+        )
+    if hasattr(transcription_response, 'text'):
+        return transcription_response.text
+    if isinstance(transcription_response, str):
+        return transcription_response
+    print(f"Formato de resposta desconhecido: {type(transcription_response)}")
+    print(f"Conteúdo: {transcription_response}")
+    return None
+
+def _transcrever_em_partes(caminho_audio, max_workers=None):
+    """
+    Divide o áudio nos silêncios, transcreve as partes em paralelo e junta os
+    textos na ordem original (retorna None se alguma parte falhar).
+    """
+    if max_workers is None:
+        max_workers = int(_configuracao('MAX_WORKERS_PARTES', '4'))
+    with tempfile.TemporaryDirectory(prefix='partes_') as pasta_partes:
+        partes, sobreposicoes = dividir_audio(caminho_audio, pasta_partes)
+        print(f"Áudio dividido em {len(partes)} partes: {caminho_audio}")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partes)))) as executor:
+            textos = list(executor.map(_transcrever_com_api, partes))
+    if any(texto is None for texto in textos):
+        print(f"Falha na transcrição de {textos.count(None)} parte(s) de {caminho_audio}")
+        return None
+    return unir_transcricoes(textos, sobreposicoes)
+
 def process_audio_file(caminho_audio):
-    print(f"Transcrevendo com gpt-4o-transcribe: {caminho_audio}...")
+    """
+    Transcreve o áudio. Um áudio com o mesmo conteúdo já transcrito com o mesmo
+    modelo/prompt é lido do cache em disco, sem nova chamada à API. Antes do
+    envio, o áudio é convertido para o formato compacto (COMPACTAR_AUDIO=0 desativa).
+
+    Ligações mais longas que DURACAO_MINIMA_PARTES segundos (padrão 600; 0
+    desativa) são divididas nos silêncios e as partes transcritas em paralelo,
+    o que reduz a latência e evita respostas truncadas.
+    """
+    print(f"Transcrevendo com {MODELO_TRANSCRICAO}: {caminho_audio}...")
     try:
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY não foi configurada. Verifique o arquivo .env")
-            
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        with open(caminho_audio, 'rb') as audio_file:
-            transcription_response = client.audio.transcriptions.create(
-                model="gpt-4o-transcribe",
-                file=audio_file,
-                response_format="text",
-                prompt="Transcreva esta chamada completa entre um agente da Portes Advogados e um cliente",
-                temperature=0.0  # Mais consistente
-            )
-        if hasattr(transcription_response, 'text'):
-            text = transcription_response.text
-        elif isinstance(transcription_response, str):
-            text = transcription_response
+        duracao = calcular_duracao_audio_robusto(caminho_audio)
+        duracao_minima_partes = float(_configuracao('DURACAO_MINIMA_PARTES', '600'))
+        em_partes = duracao_minima_partes > 0 and duracao > duracao_minima_partes
+        
+        cache = _get_cache_transcricoes()
+        hash_audio = hash_arquivo(caminho_audio)
+        partes_chave = [hash_audio, MODELO_TRANSCRICAO, PROMPT_TRANSCRICAO, TEMPERATURA_TRANSCRICAO]
+        if em_partes:
+            partes_chave.append('partes')
+        if _compactacao_ativa():
+            partes_chave.append(FORMATO_COMPACTO)
+        chave = cache.chave(*partes_chave)
+        text = cache.buscar(chave)
+        if text is not None:
+            print(f"Transcrição obtida do cache: {caminho_audio}")
         else:
-            print(f"Formato de resposta desconhecido: {type(transcription_response)}")
-            print(f"Conteúdo: {transcription_response}")
-            return None
+            caminho_envio = preparar_audio_para_envio(caminho_audio, hash_audio)
+            text = _transcrever_em_partes(caminho_envio) if em_partes else _transcrever_com_api(caminho_envio)
+            if text is None:
+                return None
+            cache.guardar(chave, text)
         
         # Verificar se a transcrição parece muito curta em relação ao áudio
-        duracao = calcular_duracao_audio_robusto(caminho_audio)
         if duracao > 60:  # Só verifica áudios com mais de 1 minuto
             n_palavras = len(text.split())
             taxa_palavras = n_palavras / duracao
@@ -916,7 +1164,67 @@ def process_audio_file(caminho_audio):
         print(f"Erro na transcrição: {e}")
         return None
 
-def process_audio_folder(pasta, carteira='AGUAS'):
+def _processar_arquivo_audio(arquivo, pasta, pasta_audios_transcritos, pasta_transcricoes, pasta_erros):
+    """
+    Transcreve, corrige e classifica os falantes de um único áudio, movendo-o
+    para Audios_transcritos ou Audios_erros ao final. Cada chamada manipula
+    apenas o próprio arquivo, o que permite executá-la em paralelo.
+    """
+    caminho_audio = os.path.join(pasta, arquivo)
+    print(f"Processando: {arquivo}")
+    tempo_inicio = time.time()  # Marca o início do processamento do áudio
+    final_text = process_audio_file(caminho_audio)
+    nome_base = os.path.splitext(arquivo)[0]
+    caminho_destino = os.path.join(pasta_audios_transcritos, arquivo)
+    try:            
+        if final_text:
+            # Corrigir variações de "Portes Advogados", "VUON CARD" e "Águas Guariroba" antes da classificação dos falantes
+            final_text_corrigido = corrigir_termos_transcricao(final_text)
+            try:
+                final_text_identificado = classificar_falantes_com_gpt(final_text_corrigido)
+            except Exception as e:
+                print(f"Erro ao identificar falantes com gpt-4.1-nano: {e}")
+                final_text_identificado = final_text_corrigido
+
+            # Depois salva no arquivo
+            nome_txt = nome_base + '_diarizado.txt'
+            caminho_txt = os.path.join(pasta_transcricoes, nome_txt)
+            try:
+                with open(caminho_txt, 'w', encoding='utf-8') as f:
+                    f.write(final_text_identificado)
+                print(f"Transcrição salva em arquivo: {caminho_txt}")
+                # Salva o tempo de início do processamento para uso posterior
+                with open(caminho_txt + '.start', 'w') as f:
+                    f.write(str(tempo_inicio))
+            except Exception as e:
+                print(f"Erro ao salvar transcrição em arquivo: {e}")
+        else:
+            caminho_erro = os.path.join(pasta_erros, arquivo)
+            try:
+                shutil.move(caminho_audio, caminho_erro)
+                print(f"Falha ao processar {arquivo} - Arquivo movido para pasta de erros: {caminho_erro}")
+                log_path = os.path.join(pasta_erros, f"{os.path.splitext(arquivo)[0]}_erro.txt")
+                with open(log_path, 'w', encoding='utf-8') as log_file:
+                    log_file.write(f"Erro ao processar o arquivo {arquivo}\n")
+                    log_file.write(f"Data/hora: {format_time_now()}\n")
+                    log_file.write(f"Falha na transcrição ou identificação de falantes")
+            except Exception as move_error:
+                print(f"Erro ao mover o arquivo com falha: {move_error}")
+            return  # Não tenta mover para transcritos se falhou
+    finally:
+        # Garante que o áudio seja movido para a pasta de transcritos se não foi movido para erros
+        if os.path.exists(caminho_audio):
+            try:
+                shutil.move(caminho_audio, caminho_destino)
+                print(f"Arquivo de áudio movido para: {caminho_destino}")
+            except Exception as e:
+                print(f"Erro ao mover o arquivo de áudio: {e}")
+
+def process_audio_folder(pasta, carteira='AGUAS', max_workers=None):
+    """
+    Processa todos os áudios da pasta com até `max_workers` arquivos em
+    andamento ao mesmo tempo (transcrição, correção e identificação de falantes).
+    """
     global mapeamento_call_ids
     extensoes_audio = ['.mp3', '.wav', '.m4a', '.ogg', '.flac']
     arquivos = [f for f in os.listdir(pasta) if os.path.splitext(f)[1].lower() in extensoes_audio]
@@ -944,80 +1252,43 @@ def process_audio_folder(pasta, carteira='AGUAS'):
     # Carrega o mapeamento de call_ids
     mapeamento_call_ids = carregar_mapeamento_call_ids(pasta)
     
-    for arquivo in arquivos:
-        caminho_audio = os.path.join(pasta, arquivo)
-        print(f"Processando: {arquivo}")
-        tempo_inicio = time.time()  # Marca o início do processamento do áudio
-        final_text = process_audio_file(caminho_audio)
-        nome_base = os.path.splitext(arquivo)[0]
-        caminho_destino = os.path.join(pasta_audios_transcritos, arquivo)
-        try:            
-            if final_text:
-                # Corrigir variações de "Portes Advogados", "VUON CARD" e "Águas Guariroba" antes da classificação dos falantes
-                final_text_corrigido = corrigir_portes_advogados(final_text)
-                final_text_corrigido = corrigir_vuon_card(final_text_corrigido)
-                final_text_corrigido = corrigir_aguas_guariroba(final_text_corrigido)
-                final_text_corrigido = corrigir_assessoria_juridica(final_text_corrigido)
-                try:
-                    final_text_identificado = classificar_falantes_com_gpt(final_text_corrigido)
-                except Exception as e:
-                    print(f"Erro ao identificar falantes com gpt-4.1-nano: {e}")
-                    final_text_identificado = final_text_corrigido
-
-                try:
-                    avaliacao_simples = {
-                        "id_chamada": nome_base,
-                        "avaliador": "MonitorGPT",
-                        "falha_critica": False,
-                        "itens": {}
-                    }
-
-                except Exception as e:
-                    print(f"Erro ao preparar avaliação simples: {e}")
-
-                # Depois salva no arquivo
-                nome_txt = nome_base + '_diarizado.txt'
-                caminho_txt = os.path.join(pasta_transcricoes, nome_txt)
-                try:
-                    with open(caminho_txt, 'w', encoding='utf-8') as f:
-                        f.write(final_text_identificado)
-                    print(f"Transcrição salva em arquivo: {caminho_txt}")
-                    # Salva o tempo de início do processamento para uso posterior
-                    with open(caminho_txt + '.start', 'w') as f:
-                        f.write(str(tempo_inicio))
-                except Exception as e:
-                    print(f"Erro ao salvar transcrição em arquivo: {e}")
-            else:
-                caminho_erro = os.path.join(pasta_erros, arquivo)
-                try:
-                    shutil.move(caminho_audio, caminho_erro)
-                    print(f"Falha ao processar {arquivo} - Arquivo movido para pasta de erros: {caminho_erro}")
-                    log_path = os.path.join(pasta_erros, f"{os.path.splitext(arquivo)[0]}_erro.txt")
-                    with open(log_path, 'w', encoding='utf-8') as log_file:
-                        log_file.write(f"Erro ao processar o arquivo {arquivo}\n")
-                        log_file.write(f"Data/hora: {format_time_now()}\n")
-                        log_file.write(f"Falha na transcrição ou identificação de falantes")
-                except Exception as move_error:
-                    print(f"Erro ao mover o arquivo com falha: {move_error}")
-                return  # Não tenta mover para transcritos se falhou
-        finally:
-            # Garante que o áudio seja movido para a pasta de transcritos se não foi movido para erros
-            if os.path.exists(caminho_audio):
-                try:
-                    shutil.move(caminho_audio, caminho_destino)
-                    print(f"Arquivo de áudio movido para: {caminho_destino}")
-                except Exception as e:
-                    print(f"Erro ao mover o arquivo de áudio: {e}")
+    if max_workers is None:
+        max_workers = int(_configuracao('MAX_WORKERS_TRANSCRICAO', '4'))
+    max_workers = max(1, min(max_workers, len(arquivos)))
+    print(f"Transcrevendo {len(arquivos)} áudios com {max_workers} workers em paralelo.")
+    
+    # Cada arquivo é submetido uma única vez; a lista é fixada antes de iniciar o pool
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {
+            executor.submit(_processar_arquivo_audio, arquivo, pasta, pasta_audios_transcritos, pasta_transcricoes, pasta_erros): arquivo
+            for arquivo in arquivos
+        }
+        for futuro in as_completed(futuros):
+            try:
+                futuro.result()
+            except Exception as e:
+                print(f"Erro inesperado ao processar {futuros[futuro]}: {e}")
+    
+    print(f"Cache de transcrições: {_get_cache_transcricoes().estatisticas()}")
+    envio = estatisticas_envio_audio()
+    if envio['arquivos']:
+        print(f"Compactação de áudio: {envio['arquivos']} arquivos, "
+              f"{envio['bytes_economizados'] / (1024 * 1024):.1f} MB economizados no envio "
+              f"({envio['bytes_originais'] / (1024 * 1024):.1f} MB -> {envio['bytes_enviados'] / (1024 * 1024):.1f} MB)")
 
 
 def format_time_now():
     from datetime import datetime
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def process_transcription_folder(pasta_transcricoes, prompt_avaliacao=None, carteira='AGUAS'):
+def _listar_transcricoes_pendentes(pasta_transcricoes):
+    """
+    Prepara as pastas de avaliadas/erros e lista as transcrições pendentes.
+    Retorna (arquivos_txt, pasta_avaliadas, pasta_erros) ou None se não houver o que avaliar.
+    """
     if not os.path.exists(pasta_transcricoes):
         print(f"Pasta de transcrições não encontrada: {pasta_transcricoes}")
-        return
+        return None
     
     pasta_transcricoes_avaliadas = os.path.join(pasta_transcricoes, 'Transcrições_avaliadas')
     pasta_transcricoes_erros = os.path.join(pasta_transcricoes, 'Transcrições_erros')
@@ -1032,9 +1303,113 @@ def process_transcription_folder(pasta_transcricoes, prompt_avaliacao=None, cart
     
     if not arquivos_txt:
         print("Nenhuma transcrição encontrada para avaliação.")
-        return
+        return None
     
     print(f"Encontradas {len(arquivos_txt)} transcrições para avaliar.")
+    return arquivos_txt, pasta_transcricoes_avaliadas, pasta_transcricoes_erros
+
+def _normalizar_avaliacao(avaliacao, id_chamada):
+    """Garante que a avaliação seja um dicionário com os campos mínimos esperados."""
+    if isinstance(avaliacao, str):
+        try:
+            avaliacao = json.loads(avaliacao)
+        except json.JSONDecodeError:
+            avaliacao = {
+                "id_chamada": id_chamada,
+                "avaliador": "MonitorGPT",
+                "falha_critica": True,
+                "itens": {},
+                "erro_processamento": "Falha ao decodificar JSON da avaliação",
+                "pontuacao_total": 0,
+                "pontuacao_percentual": 0
+            }
+    avaliacao['id_chamada'] = avaliacao.get('id_chamada', id_chamada)
+    avaliacao['itens'] = avaliacao.get('itens', {})
+    avaliacao['pontuacao_percentual'] = avaliacao.get('pontuacao_percentual', 0)
+    return avaliacao
+
+def _persistir_avaliacao(avaliacao, conteudo_transcricao, arquivo, pasta_transcricoes, pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira):
+    """
+    Salva a avaliação (com a transcrição) no banco e move o arquivo para
+    Transcrições_avaliadas, ou para Transcrições_erros com log em caso de falha.
+    """
+    caminho_transcricao = os.path.join(pasta_transcricoes, arquivo)
+    id_chamada = os.path.splitext(arquivo)[0]
+    try:
+        salvar_avaliacao_no_banco(avaliacao, transcricao_texto=conteudo_transcricao, carteira=carteira)
+        print(f"[DEBUG] Inserção no banco concluída para {id_chamada} (com transcrição)")
+        caminho_destino = os.path.join(pasta_transcricoes_avaliadas, arquivo)
+        shutil.copy2(caminho_transcricao, caminho_destino)
+        os.remove(caminho_transcricao)
+        print(f"Transcrição movida para: {caminho_destino}")
+    except Exception as db_exc:
+        print(f"[ERRO] Falha ao inserir avaliação no banco: {db_exc}")
+        log_path = os.path.join(pasta_transcricoes_erros, f"{id_chamada}_db_erro.txt")
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            log_file.write(f"Erro ao inserir avaliação no banco para {arquivo}\n")
+            log_file.write(f"Data/hora: {format_time_now()}\n")
+            log_file.write(f"Erro: {str(db_exc)}\n")
+            log_file.write(f"Conteúdo da avaliação: {json.dumps(avaliacao, ensure_ascii=False)[:2000]}\n")
+        print(f"Log de erro de banco criado em: {log_path}")
+        # Move a transcrição para a pasta de erros em caso de falha
+        caminho_destino_erro = os.path.join(pasta_transcricoes_erros, arquivo)
+        shutil.copy2(caminho_transcricao, caminho_destino_erro)
+        os.remove(caminho_transcricao)
+        print(f"Transcrição movida para pasta de erros: {caminho_destino_erro}")
+
+def _persistir_lote_avaliacoes(lote, pasta_transcricoes, pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira):
+    """
+    Grava um lote de (arquivo, avaliacao, conteudo_transcricao) numa única
+    transação. Se o lote falhar, cada avaliação é gravada individualmente para
+    que só as problemáticas acabem em Transcrições_erros.
+    """
+    if len(lote) > 1:
+        try:
+            salvar_avaliacoes_em_lote([(avaliacao, conteudo, carteira) for _, avaliacao, conteudo in lote])
+        except Exception as e:
+            print(f"[ERRO] Falha ao gravar lote de {len(lote)} avaliações, gravando individualmente: {e}")
+        else:
+            for arquivo, _, _ in lote:
+                try:
+                    caminho_destino = os.path.join(pasta_transcricoes_avaliadas, arquivo)
+                    shutil.copy2(os.path.join(pasta_transcricoes, arquivo), caminho_destino)
+                    os.remove(os.path.join(pasta_transcricoes, arquivo))
+                    print(f"Transcrição movida para: {caminho_destino}")
+                except Exception as e:
+                    print(f"Erro ao mover a transcrição avaliada {arquivo}: {e}")
+            return
+    for arquivo, avaliacao, conteudo in lote:
+        try:
+            _persistir_avaliacao(avaliacao, conteudo, arquivo, pasta_transcricoes,
+                                 pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira)
+        except Exception as e:
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
+
+def _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, erro):
+    """Move a transcrição que falhou na avaliação para Transcrições_erros e grava o log."""
+    caminho_transcricao = os.path.join(pasta_transcricoes, arquivo)
+    id_chamada = os.path.splitext(arquivo)[0]
+    print(f"Erro ao processar {arquivo}: {erro}")
+    try:
+        caminho_destino_erro = os.path.join(pasta_transcricoes_erros, arquivo)
+        shutil.copy2(caminho_transcricao, caminho_destino_erro)
+        os.remove(caminho_transcricao)
+        print(f"Transcrição movida para pasta de erros: {caminho_destino_erro}")
+        log_path = os.path.join(pasta_transcricoes_erros, f"{id_chamada}_erro.txt")
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            log_file.write(f"Erro ao avaliar a transcrição {arquivo}\n")
+            log_file.write(f"Data/hora: {format_time_now()}\n")
+            log_file.write(f"Erro: {str(erro)}")
+        print(f"Log de erro criado em: {log_path}")
+    except Exception as move_error:
+        print(f"Erro ao mover a transcrição com falha: {move_error}")
+
+def process_transcription_folder(pasta_transcricoes, prompt_avaliacao=None, carteira='AGUAS'):
+    pendentes = _listar_transcricoes_pendentes(pasta_transcricoes)
+    if not pendentes:
+        return
+    arquivos_txt, pasta_transcricoes_avaliadas, pasta_transcricoes_erros = pendentes
+    resolver_chamadas_em_lote([os.path.splitext(arquivo)[0] for arquivo in arquivos_txt])
     
     for arquivo in arquivos_txt:
         caminho_transcricao = os.path.join(pasta_transcricoes, arquivo)
@@ -1048,123 +1423,466 @@ def process_transcription_folder(pasta_transcricoes, prompt_avaliacao=None, cart
             
             # Garantir que a avaliação retorne um dicionário
             avaliacao = avaliar_ligacao(conteudo_transcricao, id_chamada=id_chamada, prompt_avaliacao=prompt_avaliacao)
-            if isinstance(avaliacao, str):
-                try:
-                    avaliacao = json.loads(avaliacao)
-                except json.JSONDecodeError:
-                    avaliacao = {
-                        "id_chamada": id_chamada,
-                        "avaliador": "MonitorGPT",
-                        "falha_critica": True,
-                        "itens": {},
-                        "erro_processamento": "Falha ao decodificar JSON da avaliação",
-                        "pontuacao_total": 0,
-                        "pontuacao_percentual": 0
-                    }
-            avaliacao['id_chamada'] = avaliacao.get('id_chamada', id_chamada)
-            avaliacao['itens'] = avaliacao.get('itens', {})
-            avaliacao['pontuacao_percentual'] = avaliacao.get('pontuacao_percentual', 0)
+            avaliacao = _normalizar_avaliacao(avaliacao, id_chamada)
             # Salva transcrição no banco junto com a avaliação!
-            try:
-                salvar_avaliacao_no_banco(avaliacao, transcricao_texto=conteudo_transcricao, carteira=carteira)
-                print(f"[DEBUG] Inserção no banco concluída para {id_chamada} (com transcrição)")
-                caminho_destino = os.path.join(pasta_transcricoes_avaliadas, arquivo)
-                shutil.copy2(caminho_transcricao, caminho_destino)
-                os.remove(caminho_transcricao)
-                print(f"Transcrição movida para: {caminho_destino}")
-            except Exception as db_exc:
-                print(f"[ERRO] Falha ao inserir avaliação no banco: {db_exc}")
-                log_path = os.path.join(pasta_transcricoes_erros, f"{id_chamada}_db_erro.txt")
-                with open(log_path, 'w', encoding='utf-8') as log_file:
-                    log_file.write(f"Erro ao inserir avaliação no banco para {arquivo}\n")
-                    log_file.write(f"Data/hora: {format_time_now()}\n")
-                    log_file.write(f"Erro: {str(db_exc)}\n")
-                    log_file.write(f"Conteúdo da avaliação: {json.dumps(avaliacao, ensure_ascii=False)[:2000]}\n")
-                print(f"Log de erro de banco criado em: {log_path}")
-                # Move a transcrição para a pasta de erros em caso de falha
-                caminho_destino_erro = os.path.join(pasta_transcricoes_erros, arquivo)
-                shutil.copy2(caminho_transcricao, caminho_destino_erro)
-                os.remove(caminho_transcricao)
-                print(f"Transcrição movida para pasta de erros: {caminho_destino_erro}")
-                
+            _persistir_avaliacao(avaliacao, conteudo_transcricao, arquivo, pasta_transcricoes,
+                                 pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira)
         except Exception as e:
-            print(f"Erro ao processar {arquivo}: {e}")
-            try:
-                caminho_destino_erro = os.path.join(pasta_transcricoes_erros, arquivo)
-                shutil.copy2(caminho_transcricao, caminho_destino_erro)
-                os.remove(caminho_transcricao)
-                print(f"Transcrição movida para pasta de erros: {caminho_destino_erro}")
-                log_path = os.path.join(pasta_transcricoes_erros, f"{id_chamada}_erro.txt")
-                with open(log_path, 'w', encoding='utf-8') as log_file:
-                    log_file.write(f"Erro ao avaliar a transcrição {arquivo}\n")
-                    log_file.write(f"Data/hora: {format_time_now()}\n")
-                    log_file.write(f"Erro: {str(e)}")
-                print(f"Log de erro criado em: {log_path}")
-            except Exception as move_error:
-                print(f"Erro ao mover a transcrição com falha: {move_error}")
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
 
-def avaliar_ligacao(transcricao: str, *, id_chamada: str = "chamada‑sem‑id", prompt_avaliacao: str = None) -> Dict[str, Any]:
-    client = _get_client()
+async def process_transcription_folder_async(pasta_transcricoes, prompt_avaliacao=None, carteira='AGUAS', max_concorrencia=None, tamanho_lote=None):
+    """
+    Versão assíncrona de process_transcription_folder.
+
+    Até `max_concorrencia` chamadas ao LLM ficam em andamento ao mesmo tempo.
+    Cada avaliação concluída é colocada numa fila consumida por um único
+    gravador, que executa salvar_avaliacao_no_banco em uma thread separada:
+    respostas lentas do LLM não atrasam a gravação e uma lentidão no banco
+    não bloqueia as chamadas ao LLM. Com `tamanho_lote` > 1 o gravador junta
+    as avaliações já prontas e grava até esse número por transação.
+    """
+    pendentes = _listar_transcricoes_pendentes(pasta_transcricoes)
+    if not pendentes:
+        return
+    arquivos_txt, pasta_transcricoes_avaliadas, pasta_transcricoes_erros = pendentes
+    resolver_chamadas_em_lote([os.path.splitext(arquivo)[0] for arquivo in arquivos_txt])
+    
+    if max_concorrencia is None:
+        max_concorrencia = int(_configuracao('MAX_CONCORRENCIA_AVALIACAO', '8'))
+    if tamanho_lote is None:
+        tamanho_lote = int(_configuracao('TAMANHO_LOTE_GRAVACAO', '1'))
+    tamanho_lote = max(1, tamanho_lote)
+    semaforo = asyncio.Semaphore(max(1, max_concorrencia))
+    fila_gravacao = asyncio.Queue()
+    
+    async def avaliar(client, arquivo):
+        caminho_transcricao = os.path.join(pasta_transcricoes, arquivo)
+        id_chamada = os.path.splitext(arquivo)[0]
+        try:
+            with open(caminho_transcricao, 'r', encoding='utf-8') as f:
+                conteudo_transcricao = f.read()
+            async with semaforo:
+                print(f"Avaliando transcrição: {arquivo}")
+                avaliacao = await avaliar_ligacao_async(conteudo_transcricao, id_chamada=id_chamada,
+                                                        prompt_avaliacao=prompt_avaliacao, client=client)
+            avaliacao = _normalizar_avaliacao(avaliacao, id_chamada)
+            await fila_gravacao.put((arquivo, avaliacao, conteudo_transcricao))
+        except Exception as e:
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
+    
+    async def gravador():
+        fim = False
+        while not fim:
+            # Junta o que já estiver na fila (até tamanho_lote) numa única transação
+            lote = [await fila_gravacao.get()]
+            while len(lote) < tamanho_lote and not fila_gravacao.empty():
+                lote.append(fila_gravacao.get_nowait())
+            if None in lote:
+                fim = True
+                lote = [item for item in lote if item is not None]
+            if lote:
+                await asyncio.to_thread(_persistir_lote_avaliacoes, lote, pasta_transcricoes,
+                                        pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira)
+    
+    tarefa_gravador = asyncio.create_task(gravador())
+    # Um cliente por execução: é fechado aqui, antes de o asyncio.run encerrar o loop
+    async with _criar_async_client() as client:
+        await asyncio.gather(*(avaliar(client, arquivo) for arquivo in arquivos_txt))
+    await fila_gravacao.put(None)  # Sinaliza o fim para o gravador
+    await tarefa_gravador
+
+def _ler_resultados_lote(client, file_id) -> dict:
+    """Lê um arquivo de saída/erros da Batch API e retorna {custom_id: linha}."""
+    if not file_id:
+        return {}
+    resultados = {}
+    for linha in client.files.content(file_id).text.splitlines():
+        if linha.strip():
+            registro = json.loads(linha)
+            resultados[registro['custom_id']] = registro
+    return resultados
+
+def _conteudo_resposta_lote(registro) -> str:
+    """Extrai o conteúdo do assistente de uma linha de resultado da Batch API."""
+    if registro is None:
+        raise ValueError("Requisição ausente no resultado do lote")
+    if registro.get('error'):
+        raise ValueError(f"Erro no lote: {registro['error']}")
+    resposta = registro.get('response') or {}
+    if resposta.get('status_code') != 200:
+        raise ValueError(f"Resposta do lote com status {resposta.get('status_code')}: {resposta.get('body')}")
+    return resposta['body']['choices'][0]['message']['content'].strip()
+
+# Códigos de erro da Batch API para requisições que o lote não chegou a
+# processar (lote expirado ou cancelado): ficam na pasta para a próxima execução
+CODIGOS_NAO_PROCESSADAS_LOTE = ('batch_expired', 'batch_cancelled')
+STATUS_FINAIS_LOTE = ('completed', 'failed', 'expired', 'cancelled')
+
+def _caminho_lote_em_andamento(pasta_transcricoes, carteira):
+    return os.path.join(pasta_transcricoes, 'Lotes', f"lote_em_andamento_{carteira}.json")
+
+def _carregar_lote_em_andamento(pasta_transcricoes, carteira):
+    """Lote enviado numa execução anterior e ainda não concluído, ou None."""
+    caminho = _caminho_lote_em_andamento(pasta_transcricoes, carteira)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _salvar_lote_em_andamento(pasta_transcricoes, carteira, batch_id, arquivos):
+    caminho = _caminho_lote_em_andamento(pasta_transcricoes, carteira)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'batch_id': batch_id, 'arquivos': arquivos,
+                   'enviado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+def _concluir_lote(client, lote, arquivos, pasta_transcricoes, pasta_transcricoes_avaliadas, pasta_transcricoes_erros,
+                   carteira, prompt_avaliacao, intervalo_polling, prazo_polling) -> bool:
+    """
+    Aguarda o lote terminar (até `prazo_polling` segundos) e grava os
+    resultados. Retorna False se o prazo acabar antes: o lote continua
+    registrado em Lotes/ e é retomado na próxima execução.
+    """
+    limite = time.monotonic() + prazo_polling
+    while lote.status not in STATUS_FINAIS_LOTE:
+        if time.monotonic() >= limite:
+            print(f"Lote {lote.id} ainda em {lote.status} após {prazo_polling:.0f}s; será retomado na próxima execução.")
+            return False
+        time.sleep(intervalo_polling)
+        lote = client.batches.retrieve(lote.id)
+        print(f"Lote {lote.id}: {lote.status}")
+    
+    resultados = _ler_resultados_lote(client, getattr(lote, 'output_file_id', None))
+    resultados.update(_ler_resultados_lote(client, getattr(lote, 'error_file_id', None)))
+    cache = _get_cache_avaliacoes(prompt_avaliacao)
+    mantidas = 0
+    for arquivo in arquivos:
+        caminho_transcricao = os.path.join(pasta_transcricoes, arquivo)
+        if not os.path.exists(caminho_transcricao):
+            continue  # Já gravada numa execução anterior, interrompida depois
+        registro = resultados.get(arquivo)
+        if registro is None or (registro.get('error') or {}).get('code') in CODIGOS_NAO_PROCESSADAS_LOTE:
+            # Não processada pelo lote: fica na pasta para nova tentativa
+            mantidas += 1
+            continue
+        id_chamada = os.path.splitext(arquivo)[0]
+        try:
+            with open(caminho_transcricao, 'r', encoding='utf-8') as f:
+                conteudo_transcricao = f.read()
+        except Exception as e:
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
+            continue
+        try:
+            avaliacao = _interpretar_resposta_avaliacao(_conteudo_resposta_lote(registro), id_chamada)
+            cache.guardar(_chave_cache_avaliacao(cache, conteudo_transcricao, id_chamada, prompt_avaliacao), avaliacao)
+            print(f"Avaliação concluída para ligação: {id_chamada}")
+        except Exception as e:
+            avaliacao = _avaliacao_com_erro(id_chamada, e)
+        try:
+            _persistir_avaliacao(_normalizar_avaliacao(avaliacao, id_chamada), conteudo_transcricao, arquivo, pasta_transcricoes,
+                                 pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira)
+        except Exception as e:
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
+    if mantidas:
+        print(f"Lote {lote.id} terminou com status {lote.status}; {mantidas} transcrições mantidas para nova tentativa.")
+    os.remove(_caminho_lote_em_andamento(pasta_transcricoes, carteira))
+    return True
+
+def process_transcription_folder_batch(pasta_transcricoes, prompt_avaliacao=None, carteira='AGUAS', client=None,
+                                       intervalo_polling=None, prazo_polling=None):
+    """
+    Avalia as transcrições pendentes pela Batch API da OpenAI (uso noturno, sem
+    exigência de latência).
+
+    Todas as requisições que não estão no cache de avaliações são gravadas num
+    arquivo JSONL em <pasta_transcricoes>/Lotes e enviadas juntas; o lote é
+    consultado a cada `intervalo_polling` segundos até terminar (ou até
+    `prazo_polling` segundos), e os resultados seguem para
+    salvar_avaliacao_no_banco.
+
+    O id do lote enviado fica em Lotes/lote_em_andamento_<carteira>.json até
+    os resultados serem gravados: se a execução for interrompida (ou o prazo
+    acabar), a próxima retoma o mesmo lote em vez de enviar outro. Transcrições
+    que o lote não processou (expirado, cancelado) continuam na pasta.
+    Para testar sem rede, passe `client=batch_local.ClienteBatchLocal(...)`.
+    """
     if prompt_avaliacao is None:
         prompt_avaliacao = SYSTEM_PROMPT  # fallback legacy
+    if intervalo_polling is None:
+        intervalo_polling = float(_configuracao('INTERVALO_POLLING_BATCH', '60'))
+    if prazo_polling is None:
+        prazo_polling = float(_configuracao('PRAZO_POLLING_BATCH', str(25 * 3600)))
+    
+    andamento = _carregar_lote_em_andamento(pasta_transcricoes, carteira)
+    if andamento:
+        client = client or _get_client()
+        print(f"Retomando lote {andamento['batch_id']} enviado em {andamento['enviado_em']}.")
+        pasta_transcricoes_avaliadas = os.path.join(pasta_transcricoes, 'Transcrições_avaliadas')
+        pasta_transcricoes_erros = os.path.join(pasta_transcricoes, 'Transcrições_erros')
+        resolver_chamadas_em_lote([os.path.splitext(arquivo)[0] for arquivo in andamento['arquivos']])
+        if not _concluir_lote(client, client.batches.retrieve(andamento['batch_id']), andamento['arquivos'],
+                              pasta_transcricoes, pasta_transcricoes_avaliadas, pasta_transcricoes_erros,
+                              carteira, prompt_avaliacao, intervalo_polling, prazo_polling):
+            return
+    
+    pendentes = _listar_transcricoes_pendentes(pasta_transcricoes)
+    if not pendentes:
+        return
+    arquivos_txt, pasta_transcricoes_avaliadas, pasta_transcricoes_erros = pendentes
+    resolver_chamadas_em_lote([os.path.splitext(arquivo)[0] for arquivo in arquivos_txt])
+    cache = _get_cache_avaliacoes(prompt_avaliacao)
+    
+    requisicoes = []
+    for arquivo in arquivos_txt:
+        id_chamada = os.path.splitext(arquivo)[0]
+        try:
+            with open(os.path.join(pasta_transcricoes, arquivo), 'r', encoding='utf-8') as f:
+                conteudo_transcricao = f.read()
+        except Exception as e:
+            _registrar_erro_avaliacao(arquivo, pasta_transcricoes, pasta_transcricoes_erros, e)
+            continue
+        
+        avaliacao = cache.buscar(_chave_cache_avaliacao(cache, conteudo_transcricao, id_chamada, prompt_avaliacao))
+        if avaliacao is not None:
+            print(f"Avaliação obtida do cache para ligação: {id_chamada}")
+            _persistir_avaliacao(_normalizar_avaliacao(avaliacao, id_chamada), conteudo_transcricao, arquivo, pasta_transcricoes,
+                                 pasta_transcricoes_avaliadas, pasta_transcricoes_erros, carteira)
+            continue
+        
+        requisicoes.append({
+            "custom_id": arquivo,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODELO_AVALIACAO,
+                "messages": _montar_mensagens_avaliacao(conteudo_transcricao, id_chamada, prompt_avaliacao),
+                "temperature": TEMPERATURA_AVALIACAO,
+                "max_tokens": MAX_TOKENS_AVALIACAO,
+            },
+        })
+    
+    if not requisicoes:
+        print("Todas as avaliações foram obtidas do cache; nenhum lote enviado.")
+        return
+    
+    pasta_lotes = os.path.join(pasta_transcricoes, 'Lotes')
+    os.makedirs(pasta_lotes, exist_ok=True)
+    caminho_lote = os.path.join(pasta_lotes, f"lote_{carteira}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    with open(caminho_lote, 'w', encoding='utf-8') as f:
+        for requisicao in requisicoes:
+            f.write(json.dumps(requisicao, ensure_ascii=False) + '\n')
+    print(f"Arquivo de lote com {len(requisicoes)} avaliações salvo em: {caminho_lote}")
+    
+    client = client or _get_client()
+    with open(caminho_lote, 'rb') as f:
+        arquivo_entrada = client.files.create(file=f, purpose="batch")
+    lote = client.batches.create(input_file_id=arquivo_entrada.id, endpoint="/v1/chat/completions", completion_window="24h")
+    arquivos_lote = [requisicao['custom_id'] for requisicao in requisicoes]
+    _salvar_lote_em_andamento(pasta_transcricoes, carteira, lote.id, arquivos_lote)
+    print(f"Lote enviado: {lote.id}")
+    
+    _concluir_lote(client, lote, arquivos_lote, pasta_transcricoes, pasta_transcricoes_avaliadas, pasta_transcricoes_erros,
+                   carteira, prompt_avaliacao, intervalo_polling, prazo_polling)
 
-    messages = [
+def _montar_mensagens_avaliacao(transcricao, id_chamada, prompt_avaliacao):
+    if prompt_avaliacao is None:
+        prompt_avaliacao = SYSTEM_PROMPT  # fallback legacy
+    return [
         {"role": "system", "content": prompt_avaliacao},
         {"role": "user",
          "content": f"ID_CHAMADA={id_chamada}\n\nTRANSCRICAO:\n{transcricao}"}
     ]
 
+def _interpretar_resposta_avaliacao(assistant_content: str, id_chamada: str) -> Dict[str, Any]:
+    """Extrai e valida o JSON de avaliação retornado pelo modelo."""
+    # Try to extract JSON from the response
+    json_match = re.search(r'\{[\s\S]*\}', assistant_content)
+    if not json_match:
+        raise ValueError(f"No JSON found in response: {assistant_content[:200]}")
+    
+    try:
+        result = json.loads(json_match.group(0))
+    except json.JSONDecodeError:
+        # If direct JSON parse fails, try to clean the string first
+        clean_json = assistant_content.replace('\n', ' ').replace('```json', '').replace('```', '')
+        json_match = re.search(r'\{[\s\S]*\}', clean_json)
+        if not json_match:
+            raise ValueError(f"No JSON found in cleaned response: {clean_json[:200]}")
+        result = json.loads(json_match.group(0))
+
+    # Ensure required fields exist
+    if 'id_chamada' not in result:
+        result['id_chamada'] = id_chamada
+    if 'itens' not in result:
+        raise ValueError("Response JSON missing 'itens' field")
+
+    # Add total field if needed
+    total = result.get("pontuacao_total", 0)
+    result["pontuacao_percentual"] = round((total / MAX_SEM_GSS) * 100, 1)
+    return result
+
+def _avaliacao_com_erro(id_chamada: str, e: Exception) -> Dict[str, Any]:
+    print(f"ERRO: Erro na avaliação da ligação {id_chamada}: {str(e)}")
+    # Return a minimal valid result structure instead of raising
+    return {
+        "id_chamada": id_chamada,
+        "avaliador": "MonitorGPT",
+        "falha_critica": True,
+        "itens": {},
+        "erro_processamento": str(e),
+        "pontuacao_total": 0,
+        "pontuacao_percentual": 0
+    }
+
+# Parâmetros da avaliação (fazem parte da chave do cache de avaliações)
+MODELO_AVALIACAO = "gpt-4.1-mini"
+TEMPERATURA_AVALIACAO = 0.0
+MAX_TOKENS_AVALIACAO = 1024
+
+# Cache em disco das avaliações: um subdiretório por hash de prompt, para que
+# as entradas de um prompt alterado possam ser descartadas de uma vez
+CACHE_AVALIACOES_DIR = os.path.join(os.path.expanduser("~"), ".cache", "monitoria", "avaliacoes")
+CACHE_AVALIACOES_MAX_BYTES = 200 * 1024 * 1024
+CACHE_AVALIACOES_IDADE_MAXIMA = 180 * 24 * 3600
+_CACHES_AVALIACAO: Dict[str, CacheDisco] = {}
+_CACHE_AVALIACOES_SINCRONIZADO = False
+
+def _hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _diretorio_cache_avaliacoes() -> str:
+    return _configuracao('CACHE_AVALIACOES_DIR', CACHE_AVALIACOES_DIR)
+
+def invalidar_cache_avaliacoes(nome_prompt: str = None):
+    """
+    Apaga as avaliações em cache do prompt `nome_prompt` de PROMPTS_AVALIACAO
+    ou, sem argumento, de todos os prompts.
+    """
+    diretorio = _diretorio_cache_avaliacoes()
+    if nome_prompt is None:
+        alvos = [os.path.join(diretorio, d) for d in os.listdir(diretorio)] if os.path.isdir(diretorio) else []
+    else:
+        alvos = [os.path.join(diretorio, _hash_texto(PROMPTS_AVALIACAO[nome_prompt])[:16])]
+    with _LOCK_INICIALIZACAO:
+        for alvo in alvos:
+            if os.path.isdir(alvo):
+                shutil.rmtree(alvo, ignore_errors=True)
+                print(f"Cache de avaliações invalidado: {alvo}")
+        _CACHES_AVALIACAO.clear()
+
+def sincronizar_cache_avaliacoes():
+    """
+    Compara os prompts atuais de PROMPTS_AVALIACAO com os registrados no cache
+    e invalida as entradas dos prompts que mudaram desde a última execução.
+    """
+    global _CACHE_AVALIACOES_SINCRONIZADO
+    diretorio = _diretorio_cache_avaliacoes()
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_registro = os.path.join(diretorio, 'prompts.json')
+    atuais = {nome: _hash_texto(prompt)[:16] for nome, prompt in PROMPTS_AVALIACAO.items()}
+    try:
+        with open(caminho_registro, 'r', encoding='utf-8') as f:
+            registrados = json.load(f)
+    except (OSError, ValueError):
+        registrados = {}
+    with _LOCK_INICIALIZACAO:
+        for nome, hash_antigo in registrados.items():
+            if atuais.get(nome) != hash_antigo and hash_antigo not in atuais.values():
+                shutil.rmtree(os.path.join(diretorio, hash_antigo), ignore_errors=True)
+                print(f"Prompt '{nome}' alterado: avaliações em cache descartadas.")
+        with open(caminho_registro, 'w', encoding='utf-8') as f:
+            json.dump(atuais, f, ensure_ascii=False, indent=2)
+        _CACHE_AVALIACOES_SINCRONIZADO = True
+
+def _get_cache_avaliacoes(prompt_avaliacao: str) -> CacheDisco:
+    if not _CACHE_AVALIACOES_SINCRONIZADO:
+        sincronizar_cache_avaliacoes()
+    hash_prompt = _hash_texto(prompt_avaliacao)[:16]
+    if hash_prompt not in _CACHES_AVALIACAO:
+        with _LOCK_INICIALIZACAO:
+            if hash_prompt not in _CACHES_AVALIACAO:
+                _CACHES_AVALIACAO[hash_prompt] = CacheDisco(
+                    os.path.join(_diretorio_cache_avaliacoes(), hash_prompt),
+                    tamanho_maximo_bytes=CACHE_AVALIACOES_MAX_BYTES,
+                    idade_maxima=CACHE_AVALIACOES_IDADE_MAXIMA
+                )
+    return _CACHES_AVALIACAO[hash_prompt]
+
+def _chave_cache_avaliacao(cache: CacheDisco, transcricao: str, id_chamada: str, prompt_avaliacao: str) -> str:
+    return cache.chave(_hash_texto(transcricao), id_chamada, _hash_texto(prompt_avaliacao),
+                       MODELO_AVALIACAO, TEMPERATURA_AVALIACAO)
+
+def avaliar_ligacao(transcricao: str, *, id_chamada: str = "chamada‑sem‑id", prompt_avaliacao: str = None) -> Dict[str, Any]:
+    if prompt_avaliacao is None:
+        prompt_avaliacao = SYSTEM_PROMPT  # fallback legacy
+    cache = _get_cache_avaliacoes(prompt_avaliacao)
+    chave = _chave_cache_avaliacao(cache, transcricao, id_chamada, prompt_avaliacao)
+    result = cache.buscar(chave)
+    if result is not None:
+        print(f"Avaliação obtida do cache para ligação: {id_chamada}")
+        return result
+
+    client = _get_client()
+    messages = _montar_mensagens_avaliacao(transcricao, id_chamada, prompt_avaliacao)
+
     print(f"Avaliando ligação: {id_chamada}")
     try:
         response = client.chat.completions.create(
-            model="gpt-4.1-mini",  
+            model=MODELO_AVALIACAO,  
             messages=messages,
-            temperature=0.0,
-            max_tokens=1024
+            temperature=TEMPERATURA_AVALIACAO,
+            max_tokens=MAX_TOKENS_AVALIACAO
         )
 
         assistant_content = response.choices[0].message.content.strip()
+        result = _interpretar_resposta_avaliacao(assistant_content, id_chamada)
+        cache.guardar(chave, result)
 
-        # Try to extract JSON from the response
-        json_match = re.search(r'\{[\s\S]*\}', assistant_content)
-        if not json_match:
-            raise ValueError(f"No JSON found in response: {assistant_content[:200]}")
-        
-        try:
-            result = json.loads(json_match.group(0))
-        except json.JSONDecodeError:
-            # If direct JSON parse fails, try to clean the string first
-            clean_json = assistant_content.replace('\n', ' ').replace('```json', '').replace('```', '')
-            json_match = re.search(r'\{[\s\S]*\}', clean_json)
-            if not json_match:
-                raise ValueError(f"No JSON found in cleaned response: {clean_json[:200]}")
-            result = json.loads(json_match.group(0))
-
-        # Ensure required fields exist
-        if 'id_chamada' not in result:
-            result['id_chamada'] = id_chamada
-        if 'itens' not in result:
-            raise ValueError("Response JSON missing 'itens' field")
-
-        # Add total field if needed
-        total = result.get("pontuacao_total", 0)
-        result["pontuacao_percentual"] = round((total / MAX_SEM_GSS) * 100, 1)
+        print(f"Avaliação concluída para ligação: {id_chamada}")
+        return result
+    except Exception as e:
+        return _avaliacao_com_erro(id_chamada, e)
+
+async def avaliar_ligacao_async(transcricao: str, *, id_chamada: str = "chamada‑sem‑id", prompt_avaliacao: str = None, client: AsyncOpenAI = None) -> Dict[str, Any]:
+    """
+    Mesma avaliação de avaliar_ligacao, usando o cliente assíncrono da OpenAI.
+    Sem `client`, cria um cliente só para esta chamada.
+    """
+    if prompt_avaliacao is None:
+        prompt_avaliacao = SYSTEM_PROMPT  # fallback legacy
+    cache = _get_cache_avaliacoes(prompt_avaliacao)
+    chave = _chave_cache_avaliacao(cache, transcricao, id_chamada, prompt_avaliacao)
+    result = cache.buscar(chave)
+    if result is not None:
+        print(f"Avaliação obtida do cache para ligação: {id_chamada}")
+        return result
+
+    if client is None:
+        async with _criar_async_client() as client:
+            return await avaliar_ligacao_async(transcricao, id_chamada=id_chamada,
+                                               prompt_avaliacao=prompt_avaliacao, client=client)
+    messages = _montar_mensagens_avaliacao(transcricao, id_chamada, prompt_avaliacao)
+
+    print(f"Avaliando ligação: {id_chamada}")
+    try:
+        response = await client.chat.completions.create(
+            model=MODELO_AVALIACAO,  
+            messages=messages,
+            temperature=TEMPERATURA_AVALIACAO,
+            max_tokens=MAX_TOKENS_AVALIACAO
+        )
+
+        assistant_content = response.choices[0].message.content.strip()
+        result = _interpretar_resposta_avaliacao(assistant_content, id_chamada)
+        cache.guardar(chave, result)
 
         print(f"Avaliação concluída para ligação: {id_chamada}")
         return result
     except Exception as e:
-        error_msg = f"Erro na avaliação da ligação {id_chamada}: {str(e)}"
-        print(f"ERRO: {error_msg}")
-        # Return a minimal valid result structure instead of raising
-        return {
-            "id_chamada": id_chamada,
-            "avaliador": "MonitorGPT",
-            "falha_critica": True,
-            "itens": {},
-            "erro_processamento": str(e),
-            "pontuacao_total": 0,
-            "pontuacao_percentual": 0
-        }
+        return _avaliacao_com_erro(id_chamada, e)
 
 def redistribuir_pesos_e_pontuacao(itens: dict) -> dict:
     """
@@ -1395,6 +2113,13 @@ class ProcessadorCarteira:
         process_audio_folder(self.config.pasta_audios, carteira=self.config.carteira)
 
     def processar_transcricoes(self):
+        modo = _configuracao('MODO_AVALIACAO', 'sync').lower()
+        if modo == 'async':
+            asyncio.run(process_transcription_folder_async(self.config.pasta_transcricoes, prompt_avaliacao=self.config.prompt_avaliacao, carteira=self.config.carteira))
+            return
+        if modo == 'batch':
+            process_transcription_folder_batch(self.config.pasta_transcricoes, prompt_avaliacao=self.config.prompt_avaliacao, carteira=self.config.carteira)
+            return
         process_transcription_folder(self.config.pasta_transcricoes, prompt_avaliacao=self.config.prompt_avaliacao, carteira=self.config.carteira)
 
     def gerar_relatorio(self):
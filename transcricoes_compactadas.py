@@ -0,0 +1,103 @@
+"""
+Armazenamento compactado de transcricoes.conteudo.
+
+O texto é comprimido com zlib e gravado em base64 depois de um marcador de
+formato, para continuar cabendo na coluna de texto existente:
+
+    #zlib1:<base64 do zlib do texto em UTF-8>
+
+Valores sem o marcador são texto puro (linhas antigas ou curtas demais para
+compensar) e são lidos como estão, então as duas formas convivem na tabela.
+Para compactar as linhas já gravadas:
+
+    python transcricoes_compactadas.py backfill
+    python transcricoes_compactadas.py backfill --lote 200
+"""
+import argparse
+import base64
+import zlib
+
+from banco import get_connection
+
+MARCADOR_ZLIB = '#zlib1:'
+NIVEL_COMPRESSAO = 6
+# Textos menores que isto não ganham com a compressão (base64 + marcador)
+TAMANHO_MINIMO = 256
+TAMANHO_LOTE_BACKFILL = 500
+
+
+def compactar_transcricao(texto):
+    """Retorna o valor a gravar em transcricoes.conteudo (compactado se ficar menor)."""
+    if not texto or len(texto) < TAMANHO_MINIMO or texto.startswith(MARCADOR_ZLIB):
+        return texto
+    compactado = MARCADOR_ZLIB + base64.b64encode(
+        zlib.compress(texto.encode('utf-8'), NIVEL_COMPRESSAO)).decode('ascii')
+    return compactado if len(compactado) < len(texto.encode('utf-8')) else texto
+
+
+def descompactar_transcricao(valor):
+    """Retorna o texto de um valor lido de transcricoes.conteudo, compactado ou não."""
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode('utf-8')
+    if not valor or not valor.startswith(MARCADOR_ZLIB):
+        return valor
+    return zlib.decompress(base64.b64decode(valor[len(MARCADOR_ZLIB):])).decode('utf-8')
+
+
+def compactar_transcricoes_existentes(tamanho_lote=TAMANHO_LOTE_BACKFILL):
+    """
+    Compacta as transcrições gravadas em texto puro, em lotes por avaliacao_id
+    com um commit por lote; pode ser interrompido e executado de novo.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    ultimo_id = 0
+    lidas = compactadas = bytes_antes = bytes_depois = 0
+    try:
+        while True:
+            cursor.execute("""
+                SELECT avaliacao_id, conteudo FROM transcricoes
+                WHERE avaliacao_id > %s AND conteudo NOT LIKE %s
+                ORDER BY avaliacao_id
+                LIMIT %s
+            """, (ultimo_id, MARCADOR_ZLIB + '%', tamanho_lote))
+            linhas = cursor.fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+            atualizacoes = []
+            for avaliacao_id, conteudo in linhas:
+                texto = descompactar_transcricao(conteudo)
+                valor = compactar_transcricao(texto)
+                lidas += 1
+                if valor != texto:
+                    atualizacoes.append((valor, avaliacao_id))
+                    bytes_antes += len(texto.encode('utf-8'))
+                    bytes_depois += len(valor)
+            if atualizacoes:
+                cursor.executemany("UPDATE transcricoes SET conteudo = %s WHERE avaliacao_id = %s", atualizacoes)
+                compactadas += len(atualizacoes)
+            conn.commit()
+            print(f"Até avaliacao_id {ultimo_id}: {compactadas}/{lidas} transcrições compactadas.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    if bytes_antes:
+        print(f"Transcrições compactadas: {compactadas} de {lidas}, "
+              f"{bytes_antes / 1024 / 1024:.1f} MB -> {bytes_depois / 1024 / 1024:.1f} MB.")
+    else:
+        print(f"Nenhuma transcrição a compactar ({lidas} lidas).")
+    return compactadas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compactação das transcrições gravadas no banco.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    backfill = sub.add_parser('backfill', help='compacta as transcrições gravadas em texto puro')
+    backfill.add_argument('--lote', type=int, default=TAMANHO_LOTE_BACKFILL, help='linhas por transação')
+    args = parser.parse_args()
+    if args.comando == 'backfill':
+        compactar_transcricoes_existentes(args.lote)